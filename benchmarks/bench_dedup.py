@@ -0,0 +1,100 @@
+"""アップロード済み判定（重複判定インデックス）のベンチマーク
+
+アップロード済みの SD カードを模した DCIM ツリーを生成し、次の 3 つの場面で
+uploader.skip_uploaded_duplicates が「新しいファイルは無い」と判定するまでの時間を測る。
+
+    cold      指紋キャッシュが空の状態（全ファイルをハッシュする）
+    remount   同じカードが別のマウント先に現れた（指紋キャッシュによりハッシュを省く）
+    same      同じマウント先で再度挿入した（台帳のパスで判定する）
+
+続けて、走査を含めた upload_photos 全体の判定時間を測る。
+
+    reinsert  走査キャッシュが空の状態（全フォルダを読み、全ファイルを stat する）
+    cached    変更の無いカードを挿し直した（フォルダの名前の一覧だけを照合し、ファイルは stat しない）
+
+一時 HOME とデータベースを使うため、実環境の台帳には書き込まない。
+
+使い方:
+    python benchmarks/bench_dedup.py [--files 50000] [--size-kb 4]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+
+def generate_dcim(root: Path, files: int, size_kb: int) -> None:
+    """ダミーの DCIM ツリーを生成（1 フォルダ 1000 件）"""
+    for i in range(files):
+        folder = root / "DCIM" / f"{100 + i // 1000}CANON"
+        if i % 1000 == 0:
+            folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"IMG_{i % 10000:04d}.JPG").write_bytes(os.urandom(size_kb * 1024))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50000, help="生成するファイル数")
+    parser.add_argument("--size-kb", type=int, default=4, help="1 ファイルのサイズ (KB)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        os.environ["HOME"] = str(tmp / "home")
+        from google_photos_uploader import dedup, ledger, scancache, uploader
+
+        dedup._index = dedup.DedupIndex(tmp / "uploader.db")
+        ledger._ledger = ledger.UploadLedger(tmp / "uploader.db")
+        scancache._cache = scancache.ScanCache(tmp / "uploader.db")
+        # 2 つのマウント先を同じボリューム（UUID）として扱う（DCIM の親をマウントポイントとする）
+        def _volume_id(path, mountinfo=None):
+            path = Path(path)
+            while path.name != "DCIM" and path != path.parent:
+                path = path.parent
+            return "uuid:BENCH", path.parent
+
+        dedup.get_volume_id = _volume_id
+        scancache.get_volume_id = _volume_id
+
+        card = tmp / "mnt" / "PHOTO_UPLOAD_SD"
+        print(f"{args.files} 件のファイルを生成中...")
+        generate_dcim(card, args.files, args.size_kb)
+
+        def _run(label: str, dcim: Path) -> None:
+            photo_files = uploader._collect_media_files(dcim)
+            start = time.perf_counter()
+            candidates, _, _ = uploader.skip_uploaded_duplicates(dcim, photo_files)
+            new_files, retry_files, _ = uploader.select_upload_files(candidates)
+            remaining = new_files + retry_files
+            elapsed = time.perf_counter() - start
+            print(f"{label:8s} {elapsed:8.3f} s  未アップロード {len(remaining)} / {len(photo_files)} 件")
+
+        # アップロード済みの状態を作る（内容キーだけを登録）
+        start = time.perf_counter()
+        index = dedup.get_dedup_index()
+        index.add(index.content_keys(uploader._collect_media_files(card / "DCIM")))
+        print(f"{'cold':8s} {time.perf_counter() - start:8.3f} s  （全ファイルのハッシュと登録）")
+
+        remounted = tmp / "mnt" / "disk"
+        card.rename(remounted)
+        _run("remount", remounted / "DCIM")
+        _run("same", remounted / "DCIM")
+
+        # 生成直後のフォルダは mtime が新しすぎて走査キャッシュに記録されないため古くする
+        for folder in [remounted / "DCIM", *(remounted / "DCIM").iterdir()]:
+            st = folder.stat()
+            os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns - 60 * 1_000_000_000))
+        for label in ("reinsert", "cached"):
+            start = time.perf_counter()
+            uploader.upload_photos(remounted / "DCIM")
+            print(f"{label:8s} {time.perf_counter() - start:8.3f} s  （upload_photos 全体）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""メディアファイル検索（DCIM の走査）のベンチマーク
+
+合成した DCIM ツリーに対して、次の検索方法の所要時間と件数を比べる。
+
+    glob        旧実装。拡張子毎に小文字・大文字で計 20 回の再帰 glob を行う
+    scandir-1   utils.scan_media_files を 1 スレッドで実行（フォルダを順に読む）
+    scandir-N   utils.scan_media_files を N スレッドで実行（サブフォルダを並行して読む）
+
+--latency を指定すると、フォルダを開く毎にその秒数だけ待たせて USB 接続の
+exFAT のような読み込み待ちを模擬する（glob も同じ os.scandir を使うため同様に遅くなる）。
+
+ツリーには .Jpg のような大文字・小文字の混ざった拡張子のファイルも含めるため、
+glob 側はそれらを取りこぼした件数になる。
+
+使い方:
+    python benchmarks/bench_scan.py [--files 50000] [--per-folder 1000] [--repeat 3] [--latency 0.02]
+"""
+
+import argparse
+import functools
+import glob
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from google_photos_uploader.utils import SCAN_WORKERS, SUPPORTED_EXTENSIONS, scan_media_files  # noqa: E402
+
+# 生成するファイル名の拡張子（カメラとスマートフォンで見られる表記を混ぜる）
+NAME_EXTENSIONS = (".JPG", ".JPG", ".JPG", ".jpg", ".Jpg", ".MOV", ".mp4", ".PNG")
+
+
+def generate_dcim(root: Path, files: int, per_folder: int) -> None:
+    """空ファイルで DCIM ツリーを生成（サイドカーの .XMP も混ぜる）"""
+    for i in range(files):
+        folder = root / "DCIM" / f"{100 + i // per_folder}CANON"
+        if i % per_folder == 0:
+            folder.mkdir(parents=True, exist_ok=True)
+        ext = NAME_EXTENSIONS[i % len(NAME_EXTENSIONS)]
+        (folder / f"IMG_{i:05d}{ext}").touch()
+        if i % 10 == 0:
+            (folder / f"IMG_{i:05d}.XMP").touch()
+
+
+def glob_media_files(dcim: Path) -> list:
+    """旧実装: 拡張子毎に再帰 glob を行う"""
+    files = []
+    for ext in SUPPORTED_EXTENSIONS:
+        files.extend(glob.glob(str(dcim / "**" / f"*{ext}"), recursive=True))
+        files.extend(glob.glob(str(dcim / "**" / f"*{ext.upper()}"), recursive=True))
+    return files
+
+
+def add_latency(seconds: float) -> None:
+    """os.scandir の呼び出し毎に seconds 秒の待ちを加える"""
+    scandir = os.scandir
+
+    def _slow_scandir(path="."):
+        time.sleep(seconds)
+        return scandir(path)
+
+    os.scandir = _slow_scandir
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50000, help="生成するファイル数")
+    parser.add_argument("--per-folder", type=int, default=1000, help="1 フォルダあたりのファイル数")
+    parser.add_argument("--repeat", type=int, default=3, help="各方法の計測回数（最良値を表示）")
+    parser.add_argument("--latency", type=float, default=0.0, help="フォルダを開く毎に加える待ち時間（秒）")
+    parser.add_argument("--workers", type=int, default=SCAN_WORKERS, help="並行して読み込むスレッド数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dcim = Path(tmp) / "DCIM"
+        print(f"{args.files} 件のファイルを生成中...")
+        generate_dcim(Path(tmp), args.files, args.per_folder)
+        if args.latency:
+            add_latency(args.latency)
+
+        methods = (
+            ("glob", glob_media_files),
+            ("scandir-1", functools.partial(scan_media_files, workers=1)),
+            (f"scandir-{args.workers}", functools.partial(scan_media_files, workers=args.workers)),
+        )
+        for label, search in methods:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                found = search(dcim)
+                best = min(best, time.perf_counter() - start)
+            print(f"{label:10s} {best:8.3f} s  {len(found)} 件")
+
+
+if __name__ == "__main__":
+    main()
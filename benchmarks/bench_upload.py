@@ -0,0 +1,250 @@
+"""uploader.upload_photos のエンドツーエンド・スループットベンチマーク
+
+DCIM 形式のダミーツリーを生成し、別プロセスで起動したテスト用 API
+スタンドイン（tests/fake_photos_api.py）に対して upload_photos を実行する。
+シナリオごとに応答遅延・接続ごとの帯域上限・エラー率を変え、次の値を表示する。
+
+    files/s, MB/s, 1 ファイルあたりのアップロード時間 (p50 / p99), ピーク RSS
+
+各シナリオは新しいプロセスと一時 HOME で実行するため、ログや進捗ファイルは
+実環境に書き込まれない。--output で結果を JSON に保存し、デプロイ前に
+--compare で前回の結果と比べると、劣化がしきい値を超えた場合に終了コード 1 を返す。
+
+使い方:
+    python benchmarks/bench_upload.py [--photos 200] [--videos 4] [--engine thread]
+    python benchmarks/bench_upload.py --output before.json
+    python benchmarks/bench_upload.py --compare before.json --tolerance 0.15
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+# シナリオ名 → スタンドインの起動オプション
+SCENARIOS = {
+    "local": {"latency": 0.0, "bandwidth": None, "error_rate": 0.0},
+    "wan": {"latency": 0.05, "bandwidth": 20.0, "error_rate": 0.0},
+    "flaky": {"latency": 0.05, "bandwidth": 20.0, "error_rate": 0.02},
+}
+
+# 値が大きいほど良い指標（それ以外は小さいほど良い）
+HIGHER_IS_BETTER = {"files_per_sec", "mb_per_sec"}
+COMPARED_METRICS = ("files_per_sec", "mb_per_sec", "p50_sec", "p99_sec", "peak_rss_mb")
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def generate_dcim(root: Path, photos: int, photo_mb: float, videos: int, video_mb: float) -> int:
+    """カメラの DCIM 構成を模したダミーファイルを生成し、合計バイト数を返す"""
+    total = 0
+    per_folder = 100
+    for i in range(photos):
+        folder = root / "DCIM" / f"{100 + i // per_folder}CANON"
+        folder.mkdir(parents=True, exist_ok=True)
+        size = int(photo_mb * 1024 * 1024)
+        (folder / f"IMG_{i:04d}.JPG").write_bytes(os.urandom(size))
+        total += size
+    for i in range(videos):
+        folder = root / "DCIM" / "100CANON"
+        folder.mkdir(parents=True, exist_ok=True)
+        size = int(video_mb * 1024 * 1024)
+        with open(folder / f"MVI_{i:04d}.MP4", "wb") as f:
+            for _ in range(size // (1024 * 1024)):
+                f.write(os.urandom(1024 * 1024))
+            f.write(os.urandom(size % (1024 * 1024)))
+        total += size
+    return total
+
+
+def run_worker(base_url: str, dcim: Path, engine: str, rate_limit: bool) -> dict:
+    """一時 HOME で upload_photos を 1 回実行して計測する（サブプロセス内で呼ばれる）"""
+    from google_photos_uploader import async_engine, ledger, service, uploader
+    from google_photos_uploader.service import ratelimit
+
+    service.API_BASE_URL = base_url
+    # 本番のレート制限はクライアント側の方針なので、既定ではエンジン自体の性能を測るため外す
+    limits = ratelimit.RATE_LIMITS if rate_limit else {name: (1e6, 10 ** 6) for name in ratelimit.RATE_LIMITS}
+    ratelimit._limiter = ratelimit.RateLimiter(limits, quota=None)
+    uploader._cached_creds = SimpleNamespace(token="bench", valid=True, expired=False, refresh_token=None)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def _timed(func):
+        def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with lock:
+                    latencies.append(time.monotonic() - started)
+        return wrapper
+
+    def _timed_async(func):
+        async def wrapper(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                with lock:
+                    latencies.append(time.monotonic() - started)
+        return wrapper
+
+    # 1 ファイル分のバイト送信（トークン取得まで）の所要時間を記録する
+    uploader.gp_upload_media = _timed(uploader.gp_upload_media)
+    service.upload_media = _timed(service.upload_media)
+    async_engine._upload_raw = _timed_async(async_engine._upload_raw)
+
+    started_at = time.time()
+    started = time.monotonic()
+    ok = uploader.upload_photos(dcim / "DCIM", album_name="Benchmark", engine=engine)
+    elapsed = time.monotonic() - started
+    # MB/s は実際にアップロードできたファイルのバイト数だけで計算する
+    uploaded = ledger.get_ledger().recent_uploads(since=started_at)
+
+    progress = json.loads(uploader._PROGRESS_PATH.read_text(encoding="utf-8"))
+    return {
+        "ok": ok,
+        "success": progress.get("success", 0),
+        "failed": progress.get("failed", 0),
+        "uploaded_bytes": sum(os.path.getsize(p) for p in uploaded),
+        "elapsed": elapsed,
+        "p50_sec": _percentile(latencies, 50),
+        "p99_sec": _percentile(latencies, 99),
+        # Linux の ru_maxrss は KiB 単位
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _start_server(options: dict, seed: int):
+    cmd = [sys.executable, str(ROOT / "tests" / "fake_photos_api.py"), "--seed", str(seed)]
+    if options.get("latency"):
+        cmd += ["--latency", str(options["latency"])]
+    if options.get("bandwidth"):
+        cmd += ["--bandwidth", str(options["bandwidth"])]
+    if options.get("error_rate"):
+        # 注入したエラーは短い Retry-After で返し、待ち時間より再送の挙動を測る
+        cmd += ["--error-rate", str(options["error_rate"]), "--retry-after", "0.2"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    return proc, proc.stdout.readline().strip()
+
+
+def run_scenario(name: str, dcim: Path, total_files: int, args) -> dict:
+    proc, base_url = _start_server(SCENARIOS[name], args.seed)
+    try:
+        with tempfile.TemporaryDirectory() as home:
+            cmd = [sys.executable, __file__, "--worker", "--base-url", base_url, "--dcim", str(dcim), "--engine", args.engine]
+            if args.rate_limit:
+                cmd.append("--rate-limit")
+            out = subprocess.run(
+                cmd,
+                check=True,
+                capture_output=True,
+                text=True,
+                env=dict(os.environ, HOME=home),
+            ).stdout
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    r = json.loads(out.strip().splitlines()[-1])
+    r["scenario"] = name
+    r["files"] = total_files
+    r["files_per_sec"] = r["success"] / r["elapsed"] if r["elapsed"] else 0.0
+    r["mb_per_sec"] = r["uploaded_bytes"] / (1024 * 1024) / r["elapsed"] if r["elapsed"] else 0.0
+    return r
+
+
+def compare(results: list, baseline_path: Path, tolerance: float) -> list:
+    """前回の結果と比べ、しきい値を超えて悪化した指標の一覧を返す"""
+    baseline = {r["scenario"]: r for r in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]}
+    regressions = []
+    for r in results:
+        before = baseline.get(r["scenario"])
+        if not before:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), r.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if metric in HIGHER_IS_BETTER else (new - old) / old
+            if change > tolerance:
+                regressions.append(f"{r['scenario']}.{metric}: {old:.3f} -> {new:.3f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="upload_photos のエンドツーエンド・ベンチマーク")
+    parser.add_argument("--photos", type=int, default=200, help="写真の枚数")
+    parser.add_argument("--photo-mb", type=float, default=2.0, help="写真 1 枚のサイズ (MiB)")
+    parser.add_argument("--videos", type=int, default=4, help="動画の本数")
+    parser.add_argument("--video-mb", type=float, default=40.0, help="動画 1 本のサイズ (MiB)")
+    parser.add_argument("--engine", choices=["thread", "async"], default="thread", help="アップロードエンジン")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="実行するシナリオ（複数指定可）")
+    parser.add_argument("--rate-limit", action="store_true", help="本番のレート制限を有効にする")
+    parser.add_argument("--seed", type=int, default=1, help="エラー注入の乱数シード")
+    parser.add_argument("--output", type=Path, help="結果を JSON で保存するパス")
+    parser.add_argument("--compare", type=Path, help="比較対象の結果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="劣化とみなす変化率")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--dcim", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.base_url, args.dcim, args.engine, args.rate_limit)))
+        return 0
+
+    scenarios = args.scenario or list(SCENARIOS)
+    total_files = args.photos + args.videos
+    with tempfile.TemporaryDirectory() as tmp:
+        dcim = Path(tmp)
+        generate_dcim(dcim, args.photos, args.photo_mb, args.videos, args.video_mb)
+        print(
+            f"写真 {args.photos} 枚 x {args.photo_mb} MiB, 動画 {args.videos} 本 x {args.video_mb} MiB, "
+            f"engine={args.engine}"
+        )
+        print(f"{'scenario':<8} {'ok':>5} {'fail':>4} {'sec':>7} {'files/s':>8} {'MB/s':>7} {'p50':>7} {'p99':>7} {'RSS':>8}")
+        results = []
+        for name in scenarios:
+            r = run_scenario(name, dcim, total_files, args)
+            results.append(r)
+            print(
+                f"{name:<8} {r['success']:>5} {r['failed']:>4} {r['elapsed']:>7.2f} {r['files_per_sec']:>8.1f} "
+                f"{r['mb_per_sec']:>7.1f} {r['p50_sec']:>6.3f}s {r['p99_sec']:>6.3f}s {r['peak_rss_mb']:>7.1f}M"
+            )
+
+    if args.output:
+        args.output.write_text(json.dumps({"engine": args.engine, "results": results}, indent=2), encoding="utf-8")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"劣化: {line}")
+        if regressions:
+            return 1
+        print("劣化はありません")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""アップロード時のメモリ使用量（ピーク RSS）を比較するベンチマーク
+
+大きめのダミーファイルを生成し、別プロセスで起動したテスト用 API
+スタンドインに 5 スレッドで並行アップロードする。ファイル全体を
+bytes に読み込んで送る従来方式と、メモリマップのスライスを送る
+現在の service.upload_media を、それぞれ新しいプロセスで実行して比較する。
+
+mmap のページはページキャッシュと共有され ru_maxrss にも計上されるため、
+プロセス固有のメモリとして RssAnon のピークを併せて表示する。
+
+使い方:
+    python benchmarks/bench_upload_memory.py [--files 5] [--size-mb 24]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+WORKERS = 5
+
+
+def _peak_rss_mb() -> float:
+    # Linux の ru_maxrss は KiB 単位。ページキャッシュを共有する mmap のページも含まれる
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _anon_rss_mb() -> float:
+    """プロセス固有の（ファイルに裏付けられていない）常駐メモリ"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class _AnonSampler(threading.Thread):
+    """RssAnon を定期的に読み、ピーク値を記録する"""
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = _anon_rss_mb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, _anon_rss_mb())
+            self._done.wait(self.interval)
+
+    def stop(self) -> float:
+        self._done.set()
+        self.join()
+        return max(self.peak, _anon_rss_mb())
+
+
+def _upload_legacy(session, base_url: str, path: str) -> str:
+    """従来方式: ファイル全体を読み込んでから送信"""
+    with open(path, "rb") as f:
+        data = f.read()
+    response = session.post(
+        base_url + "/uploads",
+        data=data,
+        headers={
+            "Authorization": "Bearer bench",
+            "Content-Type": "application/octet-stream",
+            "X-Goog-Upload-Protocol": "raw",
+        },
+    )
+    response.raise_for_status()
+    return response.text
+
+
+def run_worker(mode: str, base_url: str, files: list) -> dict:
+    from google_photos_uploader import service
+    from google_photos_uploader.service import ratelimit
+    from google_photos_uploader.service.session import configure_session, get_session
+
+    service.API_BASE_URL = base_url
+    ratelimit._limiter = ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=None)
+    configure_session(pool_maxsize=WORKERS)
+    creds = SimpleNamespace(token="bench", valid=True, expired=False, refresh_token=None)
+    session = get_session()
+
+    if mode == "legacy":
+        upload = lambda path: _upload_legacy(session, base_url, path)
+    else:
+        upload = lambda path: service.upload_media(path, creds, token_only=True)
+
+    baseline = _anon_rss_mb()
+    sampler = _AnonSampler()
+    sampler.start()
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        tokens = list(executor.map(upload, files))
+    elapsed = time.monotonic() - start
+    peak_anon = sampler.stop()
+    return {
+        "mode": mode,
+        "ok": sum(1 for t in tokens if t),
+        "elapsed": elapsed,
+        "baseline_anon_mb": baseline,
+        "peak_anon_mb": peak_anon,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _start_server():
+    proc = subprocess.Popen(
+        [sys.executable, str(ROOT / "tests" / "fake_photos_api.py")],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    base_url = proc.stdout.readline().strip()
+    return proc, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="アップロード時のピーク RSS を比較")
+    parser.add_argument("--files", type=int, default=WORKERS, help="生成するファイル数")
+    parser.add_argument("--size-mb", type=int, default=24, help="1 ファイルのサイズ (MiB)")
+    parser.add_argument("--worker", choices=["legacy", "mmap"], help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.base_url, args.paths)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(args.files):
+            path = Path(tmp) / f"IMG_{i:04d}.MP4"
+            with open(path, "wb") as f:
+                for _ in range(args.size_mb):
+                    f.write(os.urandom(1024 * 1024))
+            paths.append(str(path))
+
+        proc, base_url = _start_server()
+        try:
+            print(f"{args.files} ファイル x {args.size_mb} MiB, {WORKERS} スレッド")
+            print(f"{'mode':<8} {'ok':>4} {'sec':>7} {'MB/s':>8} {'anon(start)':>12} {'anon(peak)':>11} {'maxrss':>9}")
+            for mode in ("legacy", "mmap"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--worker", mode, "--base-url", base_url, *paths],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                mbps = args.files * args.size_mb / r["elapsed"] if r["elapsed"] else 0.0
+                print(
+                    f"{r['mode']:<8} {r['ok']:>4} {r['elapsed']:>7.2f} {mbps:>8.1f} "
+                    f"{r['baseline_anon_mb']:>11.1f}M {r['peak_anon_mb']:>10.1f}M {r['peak_rss_mb']:>8.1f}M"
+                )
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
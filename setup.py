@@ -17,6 +17,9 @@ setup(
         "psutil",
     ],
     extras_require={
+        "async": [
+            "aiohttp",
+        ],
         "dev": [
             "black",
             "isort",
@@ -28,6 +31,7 @@ setup(
     entry_points={
         "console_scripts": [
             "google-photos-uploader=google_photos_uploader.cli:main",
+            "google-photos-uploader-daemon=google_photos_uploader.daemon:main",
         ],
     },
     python_requires=">=3.7",
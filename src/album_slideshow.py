@@ -7,7 +7,6 @@ import time
 import random
 import argparse
 import logging
-import requests
 import tkinter as tk
 from tkinter import ttk  # ttk モジュールを明示的にインポート
 from pathlib import Path
@@ -21,6 +20,7 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google_photos_uploader.utils.media import BackgroundMusicPlayer, AUDIO_EXTENSIONS
+from google_photos_uploader.service.session import get_session
 
 # ロギングの設定
 logging.basicConfig(
@@ -95,7 +95,7 @@ def get_albums(creds):
         if page_token:
             params['pageToken'] = page_token
             
-        response = requests.get(url, headers=headers, params=params)
+        response = get_session().get(url, headers=headers, params=params)
         if response.status_code != 200:
             logger.error(f"アルバムリスト取得中にエラーが発生しました: {response.text}")
             break
@@ -133,7 +133,7 @@ def get_album_media_items(album_id, creds):
         if page_token:
             data['pageToken'] = page_token
             
-        response = requests.post(url, headers=headers, data=json.dumps(data))
+        response = get_session().post(url, headers=headers, data=json.dumps(data))
         if response.status_code != 200:
             logger.error(f"メディアアイテム取得中にエラーが発生しました: {response.text}")
             break
@@ -167,7 +167,7 @@ def download_media_item(media_item, size='2048'):
         # 画像の場合はサイズを指定
         download_url = f"{media_item['baseUrl']}=w{size}-h{size}"
     
-    response = requests.get(download_url)
+    response = get_session().get(download_url)
     if response.status_code != 200:
         logger.error(f"メディアダウンロード中にエラーが発生しました: {response.status_code}")
         return None
@@ -298,7 +298,7 @@ class AlbumSlideshowApp:
         # 画像の場合はURLを構築してダウンロード
         download_url = f"{media_item['baseUrl']}=w2048-h2048"
     
-        response = requests.get(download_url)
+        response = get_session().get(download_url)
         if response.status_code != 200:
             logger.error(f"メディアダウンロード中にエラーが発生しました: {response.status_code}")
             return None
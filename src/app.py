@@ -149,7 +149,8 @@ def kill_auto_uploader_processes(force: bool = False):
 def cleanup():
     """アプリケーション終了時に実行される関数"""
     try:
-        # auto_uploader.pyのプロセスを停止
+        # デーモンのジョブと auto_uploader.py のプロセスを停止
+        cancel_daemon_jobs()
         kill_auto_uploader_processes(force=False)
         # 念のため pkill でも補完
         subprocess.run(["pkill", "-f", "python.*auto_uploader.py"], check=False)
@@ -180,134 +181,213 @@ def is_process_running(process_name):
         return False
 
 
-@app.route("/")
-def index():
-    return render_template("index.html")
+# --------------------------------------------------
+# アップロードデーモン連携
+# --------------------------------------------------
 
 
-@app.route("/start_upload", methods=["POST"])
-def start_upload():
+def start_upload_daemon():
+    """常駐アップロードデーモンを起動する（起動済みなら何もしない）"""
     try:
-        # 現在のプロセス状態をチェック
-        uploader_running = is_process_running("auto_uploader.py")
-        if uploader_running:
-            return (
-                jsonify(
-                    {"status": "error", "message": "アップロードは既に実行中です。"}
-                ),
-                400,
-            )
+        from google_photos_uploader import daemon as upload_daemon
 
-        # アプリケーションから送られてきたパラメータを取得
-        data = request.get_json()
-        album_name = data.get("album_name", "")
-        watch = data.get("watch", False)
-        interval = data.get("interval", 0)
-        slideshow = data.get("slideshow", False)
-        fullscreen = data.get("fullscreen", True)
-        all_photos = data.get("all_photos", False)
-        current_only = data.get("current_only", False)
-        slideshow_interval = data.get("slideshow_interval", 5)
-        random = data.get("random", False)
-        no_pending = data.get("no_pending", False)
-        verbose = data.get("verbose", False)
-        bgm = data.get("bgm", False)
+        upload_daemon.ensure_daemon()
+    except Exception as e:
+        logger.error(f"アップロードデーモンの起動に失敗しました: {e}")
 
-        # ---------------------------------------------
-        # SDカードの存在を確認
-        # ---------------------------------------------
-        try:
-            from google_photos_uploader.utils import find_sd_card
-            from auto_uploader import DCIM_PATH  # 定数のみ利用
-        except ImportError as ie:
-            logger.error(f"auto_uploader モジュールの読み込みに失敗しました: {ie}")
-            return (
-                jsonify(
-                    {
-                        "status": "error",
-                        "message": "内部エラー: SDカード検出モジュールの読み込みに失敗しました",
-                    }
-                ),
-                500,
-            )
 
-        sd_path = find_sd_card()
-        if not sd_path or not (sd_path / DCIM_PATH).exists():
-            # SDカードが見つからない
-            return jsonify({"status": "error", "message": "SDカードがありません"}), 400
+def is_upload_running():
+    """アップロードが進行中か（auto_uploader.py またはデーモンのジョブ）"""
+    if is_process_running("auto_uploader.py"):
+        return True
+    try:
+        from google_photos_uploader import daemon as upload_daemon
 
-        # 起動時間を記録
-        global UPLOAD_START_TIME
-        UPLOAD_START_TIME = datetime.now()
+        return upload_daemon.has_active_jobs()
+    except Exception as e:
+        logger.error(f"デーモンの状態取得中にエラーが発生しました: {e}")
+        return False
 
-        # 設定を保存
-        settings = {
-            "album_name": album_name,
-            "watch": watch,
-            "interval": interval,
-            "slideshow": slideshow,
-            "fullscreen": fullscreen,
-            "all_photos": all_photos,
-            "current_only": current_only,
-            "slideshow_interval": slideshow_interval,
-            "random": random,
-            "no_pending": no_pending,
-            "verbose": verbose,
-            "bgm": bgm,
-        }
-        save_settings(settings)
 
-        # auto_uploader.pyのパスを取得
-        uploader_script = Path(__file__).parent / "auto_uploader.py"
+def cancel_daemon_jobs(wait: float = 0.0):
+    """デーモンのアップロードジョブを中止する
 
-        # コマンドを構築
-        command = ["python3", str(uploader_script)]
+    Args:
+        wait: 実行中のジョブが止まるまで待つ最大秒数
+    """
+    try:
+        from google_photos_uploader import daemon as upload_daemon
+
+        if not upload_daemon.cancel_jobs():
+            return
+        logger.info("デーモンのアップロードジョブを中止しました")
+        deadline = time.time() + wait
+        while time.time() < deadline and upload_daemon.has_active_jobs():
+            time.sleep(0.5)
+    except Exception as e:
+        logger.error(f"デーモンのジョブ中止中にエラーが発生しました: {e}")
 
-        # オプションを追加
-        if album_name:
-            command.extend(["--album", album_name])
-        # 監視は使用しないため --watch は付与しない
-        # --interval 0 でポーリングを無効化
-        if slideshow:
-            command.append("--slideshow")
-        # フルスクリーン設定を明示的に指定（どちらかを必ず指定）
-        if fullscreen:
-            command.append("--fullscreen")
-        else:
-            command.append("--no-fullscreen")
-        if all_photos:
-            command.append("--all-photos")
-        if current_only:
-            command.append("--current-only")
-        if slideshow_interval != 5:  # デフォルト値と異なる場合のみ追加
-            command.extend(["--slideshow-interval", str(slideshow_interval)])
-        if random:
-            command.append("--random")
-        if no_pending:
-            command.append("--no-pending")
-        if verbose:
-            command.append("--verbose")
-        if bgm:
-            command.append("--bgm")
 
-        # 環境変数を設定
-        env = os.environ.copy()
-        if "DISPLAY" not in env:
-            env["DISPLAY"] = ":0"
+@app.route("/")
+def index():
+    return render_template("index.html")
 
-        # バックグラウンドで実行
-        subprocess.Popen(command, env=env)
 
-        return jsonify({"status": "success", "message": "起動中"})
+@app.route("/start_upload", methods=["POST"])
+def start_upload():
+    try:
+        result, status = launch_upload(request.get_json())
+        return jsonify(result), status
     except Exception as e:
         logger.error(f"エラーが発生しました: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def launch_upload(data: dict):
+    """auto_uploader.py を起動してアップロードを始める
+
+    /start_upload と、SDカードのマウント時の自動開始（on_card_mounted）から呼ばれる。
+
+    Args:
+        data: アップロードの設定（/start_upload のリクエストまたは保存済みの設定）
+
+    Returns:
+        tuple: (応答の dict, HTTP ステータス)
+    """
+    # 現在のプロセス状態をチェック
+    uploader_running = is_upload_running()
+    if uploader_running:
+        return {"status": "error", "message": "アップロードは既に実行中です。"}, 400
+
+    album_name = data.get("album_name", "")
+    watch = data.get("watch", False)
+    interval = data.get("interval", 0)
+    slideshow = data.get("slideshow", False)
+    fullscreen = data.get("fullscreen", True)
+    all_photos = data.get("all_photos", False)
+    current_only = data.get("current_only", False)
+    slideshow_interval = data.get("slideshow_interval", 5)
+    random = data.get("random", False)
+    no_pending = data.get("no_pending", False)
+    verbose = data.get("verbose", False)
+    bgm = data.get("bgm", False)
+
+    # ---------------------------------------------
+    # SDカードの存在を確認
+    # ---------------------------------------------
+    try:
+        from google_photos_uploader.utils import find_sd_cards
+    except ImportError as ie:
+        logger.error(f"auto_uploader モジュールの読み込みに失敗しました: {ie}")
+        return {
+            "status": "error",
+            "message": "内部エラー: SDカード検出モジュールの読み込みに失敗しました",
+        }, 500
+
+    if not find_sd_cards():
+        # SDカードが見つからない
+        return {"status": "error", "message": "SDカードがありません"}, 400
+
+    # 起動時間を記録
+    global UPLOAD_START_TIME
+    UPLOAD_START_TIME = datetime.now()
+
+    # 設定を保存
+    settings = {
+        "album_name": album_name,
+        "watch": watch,
+        "interval": interval,
+        "slideshow": slideshow,
+        "fullscreen": fullscreen,
+        "all_photos": all_photos,
+        "current_only": current_only,
+        "slideshow_interval": slideshow_interval,
+        "random": random,
+        "no_pending": no_pending,
+        "verbose": verbose,
+        "bgm": bgm,
+        # SDカードのマウント時に自動で開始するか（未指定なら保存済みの値を引き継ぐ）
+        "auto_start": data.get("auto_start", load_settings().get("auto_start", False)),
+    }
+    save_settings(settings)
+
+    # auto_uploader.pyのパスを取得
+    uploader_script = Path(__file__).parent / "auto_uploader.py"
+
+    # コマンドを構築
+    command = ["python3", str(uploader_script)]
+
+    # オプションを追加
+    if album_name:
+        command.extend(["--album", album_name])
+    # 監視は使用しないため --watch は付与しない
+    # --interval 0 でポーリングを無効化
+    if slideshow:
+        command.append("--slideshow")
+    # フルスクリーン設定を明示的に指定（どちらかを必ず指定）
+    if fullscreen:
+        command.append("--fullscreen")
+    else:
+        command.append("--no-fullscreen")
+    if all_photos:
+        command.append("--all-photos")
+    if current_only:
+        command.append("--current-only")
+    if slideshow_interval != 5:  # デフォルト値と異なる場合のみ追加
+        command.extend(["--slideshow-interval", str(slideshow_interval)])
+    if random:
+        command.append("--random")
+    if no_pending:
+        command.append("--no-pending")
+    if verbose:
+        command.append("--verbose")
+    if bgm:
+        command.append("--bgm")
+
+    # 環境変数を設定
+    env = os.environ.copy()
+    if "DISPLAY" not in env:
+        env["DISPLAY"] = ":0"
+
+    # アップロード本体は常駐デーモンが行う。auto_uploader.py は写真の選定と
+    # スライドショーの起動を行い、デーモンへジョブを依頼する
+    start_upload_daemon()
+
+    # バックグラウンドで実行
+    subprocess.Popen(command, env=env)
+
+    return {"status": "success", "message": "起動中"}, 200
+
+
+def on_card_mounted(card: Path):
+    """SDカードがマウントされたら、保存済みの設定でアップロードを始める（auto_start が有効な場合）"""
+    settings = load_settings()
+    if not settings.get("auto_start"):
+        return
+    result, _ = launch_upload(settings)
+    logger.info(f"SDカードのマウントによりアップロードを開始: {card} {result['message']}")
+
+
+def start_mount_monitor():
+    """SDカードのマウントを監視し、マウントされたらすぐに on_card_mounted を呼ぶ（Linux のみ）"""
+    if platform.system() != "Linux":
+        return None
+    try:
+        from google_photos_uploader.mountmonitor import MountMonitor
+
+        monitor = MountMonitor()
+        monitor.register(on_card_mounted)
+        return monitor.start()
+    except Exception as e:
+        logger.error(f"マウントの監視を開始できませんでした: {e}")
+        return None
+
+
 @app.route("/stop_upload", methods=["POST"])
 def stop_upload():
     try:
-        # まず SIGTERM で auto_uploader を停止
+        # デーモンのジョブを中止し、SIGTERM で auto_uploader を停止
+        cancel_daemon_jobs()
         kill_auto_uploader_processes(force=False)
 
         # slideshow 関連プロセスも確実に停止 (SIGTERM)
@@ -361,7 +441,8 @@ def unmount_sd():
         # 1) slideshow / album_slideshow
         kill_slideshow_processes(force=False)
 
-        # 2) auto_uploader
+        # 2) デーモンのジョブ（送信中のファイルが終わるまで待つ）と auto_uploader
+        cancel_daemon_jobs(wait=30.0)
         os.system("pkill -f auto_uploader.py")
 
         # 少し待機して確認
@@ -549,7 +630,7 @@ def get_console_log():
 def check_status():
     """現在のアップロードやスライドショーの状態を取得する"""
     try:
-        uploader_running = is_process_running("auto_uploader.py")
+        uploader_running = is_upload_running()
         slideshow_running = is_process_running("slideshow.py") or is_process_running(
             "album_slideshow.py"
         )
@@ -600,7 +681,7 @@ def get_albums():
 def start_slideshow():
     try:
         # 現在のプロセス状態をチェック
-        uploader_running = is_process_running("auto_uploader.py")
+        uploader_running = is_upload_running()
         slideshow_running = is_process_running("slideshow.py") or is_process_running(
             "album_slideshow.py"
         )
@@ -806,5 +887,13 @@ if __name__ == "__main__":
 
     threading.Timer(2.0, lambda: open_browser(url)).start()
 
+    # 最初のアップロードまでに認証情報や接続を温めておくため、デーモンを先に起動
+    threading.Thread(target=start_upload_daemon, daemon=True).start()
+
+    # SDカードを挿したら、開始ボタンを待たずにアップロードを始められるようにする
+    # （debug=True のリローダーは親プロセスでもここを実行するため、子プロセスでのみ監視する）
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_mount_monitor()
+
     # デバッグモードで起動
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -41,9 +41,13 @@ logger = logging.getLogger(__name__)
 # 遅延インポート — ログ設定後に行うことで FileHandler が有効になる
 from google_photos_uploader.uploader import (
     upload_photos as core_upload_photos,
+    recover_pending_tokens,
+    upload_single_file as core_upload_single_file,
+    batch_create_media_items as core_batch_create_media_items,
 )  # noqa: E402
 from google_photos_uploader.uploader import _collect_media_files  # noqa: E402
-from google_photos_uploader.utils import find_sd_card  # noqa: E402
+from google_photos_uploader import daemon as upload_daemon  # noqa: E402
+from google_photos_uploader.utils import find_sd_cards  # noqa: E402
 from slideshow import load_uploaded_files  # noqa: E402
 
 # 設定値
@@ -63,7 +67,6 @@ SUPPORTED_EXTENSIONS = [
 MAX_RETRIES = 3  # 失敗した場合の最大再試行回数
 RETRY_DELAY = 5  # 再試行までの待機時間（秒）
 DEFAULT_ALBUM = "Photo Uploader"  # デフォルトのアルバム名
-MAX_WORKERS = 5  # 並列アップロードの最大ワーカー数
 MAX_BATCH_SIZE = 50  # 一度に作成できるメディアアイテムの最大数
 
 
@@ -71,6 +74,9 @@ def upload_single_file(file_path, album_name=None, verbose=False):
     """
     単一ファイルをアップロードしてアップロードトークンを取得
 
+    ファイル毎に Python を起動せず、同じプロセス内の uploader エンジンで送信する。
+    認証情報と HTTP 接続はプロセス内でキャッシュされ、2 件目以降も再利用される。
+
     Args:
         file_path (str): アップロードするファイルのパス
         album_name (str): アップロード先のアルバム名（オプション）
@@ -79,41 +85,8 @@ def upload_single_file(file_path, album_name=None, verbose=False):
     Returns:
         str or None: 成功した場合はアップロードトークン、失敗した場合はNone
     """
-    uploader_script = Path(__file__).parent / "google_photos_uploader.py"
-
-    # アップロードコマンドを構築（トークン取得モード）
-    command = [sys.executable, str(uploader_script), "--token-only"]
-    if verbose:
-        command.append("--verbose")
-
-    # ファイルパスを追加
-    command.append(file_path)
-
-    try:
-        logger.info(f"アップロード開始: {file_path}")
-        if verbose:
-            logger.debug(f"実行コマンド: {' '.join(command)}")
-
-        # 標準出力と標準エラー出力の両方をキャプチャ
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-
-        # 出力からトークンを取得
-        token = result.stdout.strip()
-        if token:
-            logger.info(f"ファイルアップロード成功: {file_path}")
-            return token
-        else:
-            logger.error(f"トークンの取得に失敗: {file_path}")
-            return None
-    except subprocess.CalledProcessError as e:
-        logger.error(f"ファイルアップロード中にエラーが発生: {file_path}")
-        logger.error(f"終了コード: {e.returncode}")
-        logger.error(f"標準出力: {e.stdout}")
-        logger.error(f"標準エラー出力: {e.stderr}")
-        return None
-    except Exception as e:
-        logger.error(f"予期せぬエラーが発生: {str(e)}")
-        return None
+    logger.info(f"アップロード開始: {file_path}")
+    return core_upload_single_file(str(file_path), verbose=verbose)
 
 
 def batch_create_media_items(upload_tokens, album_name=None, verbose=False):
@@ -126,57 +99,16 @@ def batch_create_media_items(upload_tokens, album_name=None, verbose=False):
         verbose (bool): 詳細なログを出力するかどうか
 
     Returns:
-        bool: 成功した場合はTrue
+        dict: {"success": [...], "failed": [...]} 形式の結果
     """
-    uploader_script = Path(__file__).parent / "google_photos_uploader.py"
-
-    # バッチ作成コマンドを構築
-    command = [sys.executable, str(uploader_script), "--batch-create"]
-    if album_name:
-        command.extend(["--album", album_name])
-    if verbose:
-        command.append("--verbose")
-
-    # トークンをJSON形式でファイルに保存
-    tokens_file = Path.home() / ".google_photos_uploader" / "temp_tokens.json"
-    try:
-        with open(tokens_file, "w", encoding="utf-8") as f:
-            json.dump(upload_tokens, f)
-
-        # トークンファイルを指定
-        command.extend(["--tokens-file", str(tokens_file)])
-
-        logger.info(f"メディアアイテムのバッチ作成開始: {len(upload_tokens)}個")
-        if verbose:
-            logger.debug(f"実行コマンド: {' '.join(command)}")
-
-        # 実行
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
-
-        # 成功したトークンを解析
-        try:
-            success_data = json.loads(result.stdout)
-            logger.info(
-                f"バッチ作成成功: {len(success_data.get('success', []))}個, 失敗: {len(success_data.get('failed', []))}個"
-            )
-            return success_data
-        except json.JSONDecodeError:
-            logger.warning("バッチ作成結果の解析に失敗しました")
-            return {"success": [], "failed": upload_tokens}
-
-    except subprocess.CalledProcessError as e:
-        logger.error(f"バッチ作成中にエラーが発生")
-        logger.error(f"終了コード: {e.returncode}")
-        logger.error(f"標準出力: {e.stdout}")
-        logger.error(f"標準エラー出力: {e.stderr}")
-        return {"success": [], "failed": upload_tokens}
-    except Exception as e:
-        logger.error(f"予期せぬエラーが発生: {str(e)}")
-        return {"success": [], "failed": upload_tokens}
-    finally:
-        # 一時ファイルを削除
-        if tokens_file.exists():
-            tokens_file.unlink()
+    logger.info(f"メディアアイテムのバッチ作成開始: {len(upload_tokens)}個")
+    result = core_batch_create_media_items(
+        list(upload_tokens), album_name or DEFAULT_ALBUM, verbose=verbose
+    )
+    logger.info(
+        f"バッチ作成成功: {len(result.get('success', []))}個, 失敗: {len(result.get('failed', []))}個"
+    )
+    return result
 
 
 def upload_photos(
@@ -193,12 +125,15 @@ def upload_photos(
     bgm_files=None,
     all_photos=False,
     random_bgm=False,
+    use_daemon=True,
+    watch=False,
+    scan_cache=True,
 ):
     """
     SDカードから写真をアップロードする
 
     Args:
-        dcim_path (str): DCIMディレクトリのパス
+        dcim_path (str | list): DCIMディレクトリのパス。複数のSDカードを取り込む場合はそのリスト
         album_name (str, optional): アップロード先のアルバム名
         show_slideshow (bool, optional): スライドショーを表示するかどうか
         fullscreen (bool, optional): フルスクリーンモードで表示するかどうか
@@ -211,17 +146,23 @@ def upload_photos(
         bgm_files (list, optional): BGMとして再生する音楽ファイルまたはディレクトリのリスト
         all_photos (bool, optional): すべての写真をスライドショーに表示するかどうか
         random_bgm (bool, optional): BGMをランダムに再生するかどうか
+        use_daemon (bool, optional): 常駐デーモンにアップロードを依頼するかどうか
+        watch (bool, optional): SDカードが外れるまで新しく書き込まれたファイルも取り込むかどうか
+        scan_cache (bool, optional): 走査キャッシュを使うかどうか（False の場合はすべてのフォルダを読み直す）
     """
-    from google_photos_uploader.uploader import _collect_media_files, _load_logs
+    from google_photos_uploader.uploader import _dcim_paths, select_upload_files, skip_uploaded_duplicates
 
-    # 1. アップロードする写真を特定
-    photo_files = _collect_media_files(Path(dcim_path))
+    # 1. アップロードする写真を特定（すべてのSDカードから）
+    dcim_paths = _dcim_paths(dcim_path)
+    photo_files = []
+    for path in dcim_paths:
+        photo_files.extend(_collect_media_files(path))
     if verbose:
         logger.debug(
             f"{len(photo_files)} 件のメディアファイルを検出: {photo_files[:10]}"
         )  # 先頭10件のみ表示
-    if not photo_files:
-        logger.info(f"DCIM に対象ファイルがありません: {dcim_path}")
+    if not photo_files and not watch:
+        logger.info(f"DCIM に対象ファイルがありません: {', '.join(map(str, dcim_paths))}")
 
         # 写真がない場合でも、SDカードの写真をスライドショーで表示
         logger.info(
@@ -262,23 +203,14 @@ def upload_photos(
         )
         return False
 
-    # アップロード済み/失敗ログを読み込み
-    uploaded_files, failed_files, _, _ = _load_logs()
-
-    # 新規ファイルとリトライ対象を選定
-    new_files = []
-    retry_files = []
-    for f in photo_files:
-        if f in uploaded_files:
-            continue
-        if f in failed_files and failed_files[f].get("retry_count", 0) < MAX_RETRIES:
-            retry_files.append(f)
-        elif f not in failed_files:
-            new_files.append(f)
+    # アップロード台帳を照会し、新規ファイルとリトライ対象を選定
+    # マウント先が変わっても、内容が同じアップロード済みファイルは対象にしない
+    candidate_files, _, _ = skip_uploaded_duplicates(dcim_paths, photo_files)
+    new_files, retry_files, _ = select_upload_files(candidate_files)
 
     all_upload_files = new_files + retry_files
 
-    if not all_upload_files:
+    if not all_upload_files and not watch:
         logger.info("アップロード対象ファイルはありません")
 
         # 写真がない場合でも、SDカードの写真をスライドショーで表示
@@ -348,11 +280,26 @@ def upload_photos(
             verbose=verbose,
             bgm_files=bgm_files,
             random_bgm=random_bgm,
+            follow=watch,
         )
 
     # 3. 写真のアップロード処理
+    #    常駐デーモンが使えればジョブとして依頼し、完了まで待つ。
+    #    デーモンを起動できない場合はこのプロセスでアップロードする
+    if use_daemon and upload_daemon.ensure_daemon():
+        done = upload_daemon.submit_job(
+            dcim_paths, album_name, verbose=verbose, watch=watch, scan_cache=scan_cache, follow=True
+        )
+        if done is None:
+            logger.error("デーモンでのアップロードに失敗しました")
+            return False
+        logger.info(f"デーモンのジョブが終了しました: status={done.get('status')}")
+        return bool(done.get("success"))
+
+    # デーモンを使わない場合は、前回の停止で残ったトークンの作成をここで行う
+    recover_pending_tokens(verbose=verbose)
     success = core_upload_photos(
-        Path(dcim_path), album_name=album_name, verbose=verbose
+        dcim_paths, album_name=album_name, verbose=verbose, watch=watch, scan_cache=scan_cache
     )
     return success
 
@@ -367,6 +314,7 @@ def show_uploaded_slideshow(
     verbose=False,
     bgm_files=None,
     random_bgm=False,
+    follow=False,
 ):
     """
     アップロードした写真のスライドショーを表示
@@ -381,6 +329,7 @@ def show_uploaded_slideshow(
         verbose (bool): 詳細なログを出力するかどうか
         bgm_files (list): BGMとして再生する音楽ファイルまたはディレクトリのリスト
         random_bgm (bool): BGMをランダムに再生するかどうか
+        follow (bool): 監視モードで追加されたファイルも再生リストに加えるかどうか
     """
     slideshow_script = Path(__file__).parent / "slideshow.py"
 
@@ -392,6 +341,8 @@ def show_uploaded_slideshow(
         command.append("--fullscreen")
     if current_only:
         command.append("--current")
+    if follow:
+        command.append("--follow")
 
     # 追加オプション
     if interval != 5:  # デフォルト値と異なる場合のみ追加
@@ -490,6 +441,21 @@ def main():
     parser.add_argument(
         "--random-bgm", action="store_true", help="BGMをランダムに再生する"
     )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="SDカードが外れるまで監視し、新しく書き込まれた写真・動画もアップロードする",
+    )
+    parser.add_argument(
+        "--no-scan-cache",
+        action="store_true",
+        help="走査キャッシュを使わずに SD カードのすべてのフォルダを読み直す",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="常駐デーモンを使わずにこのプロセスでアップロードする",
+    )
     args = parser.parse_args()
 
     # 詳細ログモードが指定された場合は DEBUG レベルに変更
@@ -506,18 +472,18 @@ def main():
     # recent モード: --all-photos が指定されていなければ recent=True
     recent = not args.all_photos
 
-    # SDカードの確認
-    sd_path = find_sd_card()
-    if not sd_path or not (sd_path / DCIM_PATH).exists():
+    # SDカードの確認（マルチスロットのカードリーダーでは挿さっているすべてのカードを取り込む）
+    sd_paths = find_sd_cards()
+    if not sd_paths:
         logger.error(
             "SDカードが見つかりません。SDカードを挿入してから再度実行してください。"
         )
         return
 
-    logger.info(f"SDカード検出: {sd_path}")
+    logger.info(f"SDカード検出: {', '.join(map(str, sd_paths))}")
     # 写真特定 → スライドショー表示 → アップロード開始
     upload_photos(
-        sd_path / DCIM_PATH,
+        [sd_path / DCIM_PATH for sd_path in sd_paths],
         args.album,
         args.slideshow,
         fullscreen,
@@ -530,6 +496,9 @@ def main():
         args.bgm,
         args.all_photos,
         args.random_bgm,
+        use_daemon=not args.no_daemon,
+        watch=args.watch,
+        scan_cache=not args.no_scan_cache,
     )
 
     logger.info("処理を完了しました。")
@@ -0,0 +1,170 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from pathlib import Path
+from typing import AsyncIterator, Callable, List, Optional
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from . import service
+from .service.ratelimit import MAX_ATTEMPTS, RETRYABLE_STATUSES, QuotaExceededError, get_rate_limiter, retry_delay
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp はオプション依存 (pip install google_photos_uploader[async])
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+# 同時に送信中にするアップロード数の既定値
+ASYNC_CONCURRENCY = 32
+# ファイルから 1 回に読み込むバイト数（1 アップロードあたりのメモリ上限）
+READ_CHUNK_SIZE = 1024 * 1024
+
+# 複数のアップロードが同時に 401 を受けても、リフレッシュは 1 度だけ行う
+_refresh_lock = threading.Lock()
+
+def is_available() -> bool:
+    """asyncio エンジンが利用可能か（aiohttp がインストールされているか）"""
+    return aiohttp is not None
+
+async def _read_chunks(file_path: Path) -> AsyncIterator[bytes]:
+    """ファイルを READ_CHUNK_SIZE ずつスレッドで読み込んで返す"""
+    f = await asyncio.to_thread(open, file_path, 'rb')
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+def _refresh_credentials(creds: Credentials, rejected_token: Optional[str]) -> None:
+    """401 を受けたアクセストークンをリフレッシュ（他のアップロードが更新済みなら何もしない）"""
+    with _refresh_lock:
+        if creds.token == rejected_token:
+            creds.refresh(Request(session=service.get_session()))
+
+async def _upload_raw(http: "aiohttp.ClientSession", file_path: Path, creds: Credentials, file_size: int) -> Optional[str]:
+    """raw プロトコルでファイルをストリーミング送信してトークンを取得
+
+    service 層と同じレートリミッターを使用し、429 / 5xx 応答は
+    Retry-After（無ければジッター付き指数バックオフ）に従って再試行する。
+    401 応答は service._request と同様にアクセストークンを 1 度だけリフレッシュして再送する。
+    """
+    headers = {
+        'Content-Type': 'application/octet-stream',
+        'Content-Length': str(file_size),
+        'X-Goog-Upload-Content-Type': service.get_mime_type(file_path),
+        'X-Goog-Upload-Protocol': 'raw',
+    }
+    limiter = get_rate_limiter()
+    refreshed = False
+    for attempt in range(MAX_ATTEMPTS):
+        await asyncio.to_thread(limiter.acquire, 'uploads')
+        token = creds.token
+        headers['Authorization'] = f'Bearer {token}'
+        async with http.post(service.API_BASE_URL + '/uploads', headers=headers, data=_read_chunks(file_path)) as response:
+            text = await response.text()
+            if response.status == 200:
+                return text
+            if response.status == 401 and not refreshed and creds.refresh_token:
+                # アクセストークンが失効している可能性があるため 1 度だけリフレッシュ
+                refreshed = True
+                logger.warning(f"401 応答のためアクセストークンをリフレッシュします: {file_path}")
+                await asyncio.to_thread(_refresh_credentials, creds, token)
+                continue
+            if response.status not in RETRYABLE_STATUSES or attempt == MAX_ATTEMPTS - 1:
+                logger.error(f"アップロード失敗: {response.status} - {text}")
+                return None
+            delay = retry_delay(response, attempt)
+        logger.warning(f"{response.status} 応答のため {delay:.1f} 秒後に再試行します: {file_path}")
+        limiter.pause('uploads', delay)
+    return None
+
+async def _upload_one(
+    http: "aiohttp.ClientSession",
+    file_path: str,
+    creds_provider: Callable[[], Optional[Credentials]],
+    semaphore: asyncio.Semaphore,
+) -> Optional[str]:
+    """1 ファイルをアップロードしてトークンを返す"""
+    async with semaphore:
+        path = Path(file_path)
+        try:
+            creds = await asyncio.to_thread(creds_provider)
+            if not creds:
+                logger.error("認証情報の取得に失敗しました")
+                return None
+
+            file_size = (await asyncio.to_thread(path.stat)).st_size
+            if file_size >= service.RESUMABLE_THRESHOLD:
+                # 大きなファイルは同期版のレジューム可能アップロードに委譲する
+                return await asyncio.to_thread(service.upload_media, path, creds, True)
+
+            logger.info(f"ファイルバイトをアップロード中: {path}")
+            return await _upload_raw(http, path, creds, file_size)
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"アップロード中にエラーが発生: {file_path} {e}")
+            return None
+
+async def _run(
+    files: List[str],
+    creds_provider: Callable[[], Optional[Credentials]],
+    on_complete: Callable[[str, int, Optional[str]], None],
+    concurrency: int,
+) -> None:
+    # ファイルの読み込み、レートリミッターの待ち、大きなファイルの同期アップロードは
+    # asyncio.to_thread で行う。既定の executor は CPU 数 + 4 スレッド（Raspberry Pi では 8）
+    # しかないため、送信中のアップロードがそれぞれ 1 スレッドを使えるよう concurrency に合わせる
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='async-upload')
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(sock_connect=10, sock_read=120)
+
+    # on_complete はジョブストアや台帳（SQLite）への書き込みを行うため、イベントループを
+    # 止めないよう専用スレッドで完了順に呼ぶ
+    completions = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='async-complete')
+    loop = asyncio.get_running_loop()
+
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as http:
+            async def _task(file_path: str, idx: int):
+                token = await _upload_one(http, file_path, creds_provider, semaphore)
+                await loop.run_in_executor(completions, on_complete, file_path, idx, token)
+
+            await asyncio.gather(*(_task(fp, i) for i, fp in enumerate(files, start=1)))
+    finally:
+        completions.shutdown(wait=True)
+
+def run_async_uploads(
+    files: List[str],
+    creds_provider: Callable[[], Optional[Credentials]],
+    on_complete: Callable[[str, int, Optional[str]], None],
+    concurrency: int = ASYNC_CONCURRENCY,
+) -> None:
+    """asyncio でファイルを並行アップロードする
+
+    ネットワーク並列度は CPU 数に依存せず concurrency で決まる。各アップロードが
+    メモリに保持するのは READ_CHUNK_SIZE 分のみ。
+
+    Args:
+        files: アップロードするファイルパスのリスト
+        creds_provider: 認証情報を返す関数（スレッドで呼び出される）
+        on_complete: 1 ファイル完了ごとに (ファイルパス, 番号, トークン or None) で呼ばれる。
+            イベントループとは別の 1 スレッドから完了順に呼ばれるため、ブロックしてもよい
+        concurrency: 同時に送信中にするアップロード数
+
+    Raises:
+        QuotaExceededError: 日次クォータを使い切った場合（送信中のアップロードは中止する）
+    """
+    if aiohttp is None:
+        raise RuntimeError("asyncio エンジンには aiohttp が必要です: pip install aiohttp")
+    asyncio.run(_run(files, creds_provider, on_complete, max(1, concurrency)))
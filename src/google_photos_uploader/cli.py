@@ -6,8 +6,12 @@ import sys
 from pathlib import Path
 from typing import List, Optional
 
+from . import async_engine, daemon
+from .async_engine import ASYNC_CONCURRENCY
 from .auth import get_credentials
+from .pipeline import MAX_BATCH_SIZE
 from .service import upload_media, batch_create_media_items
+from .service.ratelimit import QuotaExceededError
 from .utils import setup_logging, find_media_files
 
 logger = logging.getLogger(__name__)
@@ -35,6 +39,17 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--token-only', action='store_true', help='アップロードトークンのみを取得')
     parser.add_argument('--verbose', '-v', action='store_true', help='詳細なログを出力')
     
+    # アップロードエンジン関連の引数
+    parser.add_argument('--engine', choices=['thread', 'async'], default='thread', help='アップロードエンジン')
+    parser.add_argument('--concurrency', type=int, default=ASYNC_CONCURRENCY, help='async エンジンの同時アップロード数')
+    
+    # 常駐デーモン関連の引数
+    parser.add_argument('--daemon', action='store_true', help='ディレクトリのアップロードを常駐デーモンに依頼する')
+    parser.add_argument('--priority', type=int, default=0, help='デーモンのジョブの優先度（大きいほど先に処理）')
+    parser.add_argument('--no-wait', action='store_true', help='デーモンにジョブを登録したら完了を待たずに終了')
+    parser.add_argument('--no-scan-cache', action='store_true', help='走査キャッシュを使わずにすべてのフォルダを読み直す（--daemon と併用）')
+    parser.add_argument('--watch', action='store_true', help='ディレクトリを監視し、新しく書き込まれたファイルも続けてアップロードする（--daemon と併用）')
+    
     return parser.parse_args()
 
 def main() -> int:
@@ -48,6 +63,10 @@ def main() -> int:
     # ログレベルの設定
     setup_logging(logging.DEBUG if args.verbose else logging.INFO)
     
+    # 常駐デーモンへの依頼（認証やアップロードはデーモン側で行う）
+    if args.daemon:
+        return _submit_to_daemon(args)
+    
     # 認証情報の取得
     creds = get_credentials()
     if not creds:
@@ -91,14 +110,28 @@ def main() -> int:
             logger.error("バッチ作成モードでは--tokens-fileが必要です")
             return 1
         
-        result = batch_create_media_items(tokens, args.album, creds)
+        try:
+            result = batch_create_media_items(tokens, args.album, creds)
+        except QuotaExceededError as e:
+            logger.error(f"{e}。バッチ作成を中止します")
+            return 1
         print(json.dumps(result))  # 結果をJSON形式で出力
         return 0
     
+    # asyncio エンジンでのアップロード
+    if args.engine == 'async':
+        if async_engine.is_available():
+            return _upload_async(files_to_upload, creds, args)
+        logger.warning("aiohttp が見つからないため thread エンジンでアップロードします")
+
     # 通常のアップロードモード
     success_count = 0
     for file_path in files_to_upload:
-        result = upload_media(file_path, creds, args.token_only)
+        try:
+            result = upload_media(file_path, creds, args.token_only)
+        except QuotaExceededError as e:
+            logger.error(f"{e}。残りのファイルのアップロードを中止します")
+            break
         if result:
             success_count += 1
             if args.token_only:
@@ -107,5 +140,86 @@ def main() -> int:
     logger.info(f"アップロード完了: 成功={success_count}, 失敗={len(files_to_upload) - success_count}")
     return 0 if success_count == len(files_to_upload) else 1
 
+def _upload_async(files_to_upload: List[Path], creds, args: argparse.Namespace) -> int:
+    """asyncio エンジンでアップロードし、トークン取得後にバッチ作成する
+
+    Returns:
+        int: 終了コード（0: 成功, 1: 失敗）
+    """
+    tokens: List[tuple] = []
+
+    def _on_complete(file_path: str, idx: int, token: Optional[str]):
+        if token:
+            logger.info(f"アップロード成功: {file_path}")
+            tokens.append((token, Path(file_path).name))
+            if args.token_only:
+                print(token)  # トークンのみを出力
+        else:
+            logger.error(f"アップロード失敗: {file_path}")
+
+    try:
+        async_engine.run_async_uploads(
+            [str(p) for p in files_to_upload],
+            lambda: creds,
+            _on_complete,
+            concurrency=args.concurrency,
+        )
+    except QuotaExceededError as e:
+        # 取得済みのトークンはバッチ作成を試みる（作成の枠が残っていれば作成できる）
+        logger.error(f"{e}。残りのファイルのアップロードを中止します")
+
+    success_count = len(tokens)
+    if not args.token_only:
+        success_count = 0
+        for i in range(0, len(tokens), MAX_BATCH_SIZE):
+            try:
+                result = batch_create_media_items(tokens[i : i + MAX_BATCH_SIZE], args.album, creds)
+            except QuotaExceededError as e:
+                logger.error(f"{e}。バッチ作成を中止します")
+                break
+            success_count += len(result.get("success", []))
+
+    logger.info(f"アップロード完了: 成功={success_count}, 失敗={len(files_to_upload) - success_count}")
+    return 0 if success_count == len(files_to_upload) else 1
+
+def _submit_to_daemon(args: argparse.Namespace) -> int:
+    """ディレクトリのアップロードをデーモンに依頼し、進捗を表示する
+
+    Returns:
+        int: 終了コード（0: 成功, 1: 失敗）
+    """
+    if not args.directory:
+        logger.error("デーモンモードでは--directoryが必要です")
+        return 1
+    if not daemon.ensure_daemon():
+        logger.error("アップロードデーモンに接続できません")
+        return 1
+
+    def _on_event(event: dict):
+        if event.get('event') == 'file':
+            state = '成功' if event.get('success') else '失敗'
+            print(f"[{event['completed']}/{event['total']}] {state}: {event['file']}")
+        elif event.get('event') == 'added':
+            print(f"新しいファイル {len(event['files'])} 件を追加（計 {event['total']} 件）")
+
+    result = daemon.submit_job(
+        Path(args.directory).resolve(),
+        args.album,
+        priority=args.priority,
+        engine=args.engine,
+        verbose=args.verbose,
+        watch=args.watch,
+        scan_cache=not args.no_scan_cache,
+        follow=not args.no_wait,
+        on_event=_on_event,
+    )
+    if result is None:
+        return 1
+    if args.no_wait:
+        print(result['job_id'])
+        return 0
+    logger.info(f"デーモンのジョブが終了しました: status={result.get('status')}")
+    return 0 if result.get('success') else 1
+
 if __name__ == '__main__':
     sys.exit(main()) 
\ No newline at end of file
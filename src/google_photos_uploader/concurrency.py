@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 並列アップロード数の下限 / 初期値 / 上限
+MIN_CONCURRENCY = 1
+INITIAL_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+# 混雑時に並列数へ掛ける係数（乗算的減少）
+DECREASE_FACTOR = 0.5
+# 連続した 429 などで過剰に減少させないための最小間隔（秒）
+DECREASE_COOLDOWN = 2.0
+# 1 ウィンドウあたりの完了数の最低値（実際は max(この値, 現在の並列数)）
+MIN_WINDOW = 4
+# スループットの改善とみなす増加率
+THROUGHPUT_GAIN = 0.05
+# 基準値からこの倍率を超えてレイテンシが悪化した場合は混雑とみなす
+LATENCY_TOLERANCE = 1.5
+# レイテンシを正規化する際の最小バイト数（小さいファイルの RTT 支配を抑える）
+_LATENCY_FLOOR_BYTES = 256 * 1024
+
+class AIMDController:
+    """AIMD (加算的増加・乗算的減少) でアップロード並列数を調整するコントローラー
+
+    一定数の完了ごとにスループットを評価し、改善している間は並列数を 1 ずつ
+    増やす。スループットが横ばいの間は並列数を維持し、帯域の上限を超えて
+    増やし続けないようにする。429 / 5xx 応答を受けた場合、またはスループットが
+    伸びないままレイテンシが悪化した場合は並列数を半減させる。
+
+    Args:
+        initial: 初期並列数
+        minimum: 並列数の下限
+        maximum: 並列数の上限
+    """
+
+    def __init__(
+        self,
+        initial: int = INITIAL_CONCURRENCY,
+        minimum: int = MIN_CONCURRENCY,
+        maximum: int = MAX_CONCURRENCY,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self._limit = min(max(initial, self.minimum), self.maximum)
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+        # 評価ウィンドウの集計
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_count = 0
+        self._window_latency = 0.0
+        self._prev_throughput: Optional[float] = None
+        self._base_latency: Optional[float] = None
+        self._last_decrease = float('-inf')
+
+    @property
+    def limit(self) -> int:
+        """現在の並列数の上限"""
+        return self._limit
+
+    # --------------------------------------------------
+    # スロット管理
+    # --------------------------------------------------
+
+    def acquire(self) -> None:
+        """並列数の上限に空きが出るまで待機してスロットを確保"""
+        with self._cond:
+            while self._in_flight >= self._limit:
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        """スロットを解放"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    # --------------------------------------------------
+    # 計測
+    # --------------------------------------------------
+
+    def record(self, nbytes: int, elapsed: float) -> None:
+        """成功したアップロードのサイズと所要時間を記録
+
+        Args:
+            nbytes: 送信したバイト数
+            elapsed: 所要時間（秒）
+        """
+        with self._cond:
+            self._window_bytes += nbytes
+            self._window_count += 1
+            self._window_latency += elapsed / max(nbytes, _LATENCY_FLOOR_BYTES)
+            if self._window_count >= max(MIN_WINDOW, self._limit):
+                self._evaluate()
+
+    def observe_response(self, response) -> None:
+        """HTTP 応答を観測し、429 / 5xx の場合は並列数を減らす
+
+        service.session.add_response_hook() に登録して使用する。
+        """
+        status = getattr(response, 'status_code', 200)
+        if status == 429 or status >= 500:
+            with self._cond:
+                self._decrease(f"HTTP {status}")
+
+    # --------------------------------------------------
+    # 内部処理（self._cond を保持した状態で呼ぶ）
+    # --------------------------------------------------
+
+    def _reset_window(self):
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_count = 0
+        self._window_latency = 0.0
+
+    def _evaluate(self):
+        duration = max(time.monotonic() - self._window_start, 1e-6)
+        throughput = self._window_bytes / duration
+        latency = self._window_latency / self._window_count
+        prev = self._prev_throughput
+
+        if self._base_latency is None or latency < self._base_latency:
+            self._base_latency = latency
+        latency_ratio = latency / self._base_latency if self._base_latency else 1.0
+
+        improved = prev is None or throughput >= prev * (1 + THROUGHPUT_GAIN)
+        if latency_ratio > LATENCY_TOLERANCE and not improved:
+            self._decrease(f"レイテンシ悪化 x{latency_ratio:.2f}")
+            self._reset_window()
+            return
+
+        # 横ばい（改善が THROUGHPUT_GAIN 未満）の場合は帯域の上限に達しているとみなして維持する
+        if improved:
+            self._set_limit(self._limit + 1, f"throughput={throughput / 1e6:.2f}MB/s")
+        self._prev_throughput = throughput
+        self._reset_window()
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self._set_limit(int(self._limit * DECREASE_FACTOR), reason)
+        # 減少直後の計測は混雑の影響を受けているため基準をリセット
+        self._prev_throughput = None
+        self._reset_window()
+
+    def _set_limit(self, limit: int, reason: str):
+        limit = min(max(limit, self.minimum), self.maximum)
+        if limit != self._limit:
+            logger.info(f"アップロード並列数を変更: {self._limit} → {limit} ({reason})")
+            self._limit = limit
+            self._cond.notify_all()
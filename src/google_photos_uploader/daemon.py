@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""常駐アップロードデーモンとそのクライアント
+
+デーモンは Unix ソケットで待ち受け、アップロードジョブ（ディレクトリ、アルバム、
+優先度）を受け付けて 1 件ずつ uploader.upload_photos で処理する。プロセスが
+常駐するため、認証情報・HTTP 接続プール・アルバム ID・アップロード済みログは
+ジョブをまたいでメモリ上に保持される。
+
+プロトコルは 1 行 1 JSON で、1 接続につき 1 リクエスト。クライアントは
+``{"cmd": ...}`` を送り、デーモンは 1 行の応答を返して切断する。``follow`` / ``watch`` の場合は続けて
+ジョブの進捗イベントを 1 行ずつ送り、``{"event": "done"}`` で終える。
+
+    {"cmd": "ping"}
+    {"cmd": "submit", "dcim_path": "...", "album": "...", "priority": 0, "follow": true}
+                                         # 複数の SD カードは "dcim_path": ["...", "..."]
+                                         # "watch": true で SD カードが外れるまで新しいファイルも取り込む
+                                         # （中止するまで後続のジョブは待つ）
+                                         # "scan_cache": false で走査キャッシュを使わない
+    {"cmd": "status"}
+    {"cmd": "watch", "job_id": "..."}
+    {"cmd": "cancel", "job_id": "..."}   # job_id 省略時は全ジョブ
+    {"cmd": "shutdown"}
+"""
+
+import argparse
+import collections
+import heapq
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Union
+
+from . import uploader
+from .utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = Path.home() / '.google_photos_uploader' / 'uploader.sock'
+# 完了済みジョブを status で返すために保持しておく件数
+MAX_FINISHED_JOBS = 20
+# ジョブ毎に保持する進捗イベントの件数（監視モードのジョブは中止するまでイベントが増え続ける）
+MAX_JOB_EVENTS = 1000
+# ensure_daemon() がデーモンの起動を待つ秒数
+STARTUP_TIMEOUT = 10.0
+
+def _normalize_dcim_path(dcim_path) -> Union[str, List[str]]:
+    """ジョブの dcim_path を文字列（SD カード 1 枚）または文字列のリスト（複数枚）にそろえる"""
+    if isinstance(dcim_path, (str, os.PathLike)):
+        return str(dcim_path)
+    paths = [str(p) for p in dcim_path]
+    return paths[0] if len(paths) == 1 else paths
+
+class DaemonJob:
+    """デーモンが受け付けたアップロードジョブ"""
+
+    def __init__(
+        self,
+        dcim_path: Union[str, List[str]],
+        album_name: Optional[str],
+        priority: int,
+        engine: str,
+        verbose: bool,
+        watch: bool = False,
+        scan_cache: bool = True,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        # SD カード 1 枚なら文字列、複数枚なら文字列のリスト
+        self.dcim_path = dcim_path
+        self.album_name = album_name
+        self.priority = priority
+        self.engine = engine
+        self.verbose = verbose
+        # True の場合は SD カードが外れるか中止されるまで新しいファイルを取り込み続ける
+        self.watch = watch
+        self.scan_cache = scan_cache
+        self.status = 'queued'
+        self.success: Optional[bool] = None
+        self.progress: Dict[str, int] = {'completed': 0, 'total': 0}
+        self.submitted_at = time.time()
+        self.cancel = threading.Event()
+        # 直近 MAX_JOB_EVENTS 件のイベントと、その先頭のイベントの通し番号
+        self._events: Deque[dict] = collections.deque(maxlen=MAX_JOB_EVENTS)
+        self._first_event = 0
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def emit(self, event: dict) -> None:
+        """進捗イベントを記録し、購読中のクライアントへ通知"""
+        with self._cond:
+            if event.get('event') == 'file':
+                self.progress = {'completed': event['completed'], 'total': event['total']}
+            elif event.get('event') == 'started':
+                self.progress = {'completed': 0, 'total': event['total']}
+            elif event.get('event') == 'added':
+                self.progress = dict(self.progress, total=event['total'])
+            if len(self._events) == self._events.maxlen:
+                self._first_event += 1
+            self._events.append(dict(event, job_id=self.id))
+            self._cond.notify_all()
+
+    def finish(self, status: str, success: Optional[bool] = None) -> None:
+        with self._cond:
+            self.status = status
+            self.success = success
+        self.emit({'event': 'done', 'status': status, 'success': success})
+
+    def events(self) -> Iterator[dict]:
+        """保持しているイベントと、ジョブ完了までの新しいイベントを順に返す
+
+        購読が遅れて古いイベントが破棄された場合は、残っている最も古いイベントから続ける。
+        """
+        index = 0
+        while True:
+            with self._cond:
+                while index >= self._first_event + len(self._events):
+                    self._cond.wait()
+                index = max(index, self._first_event)
+                event = self._events[index - self._first_event]
+            index += 1
+            yield event
+            if event.get('event') == 'done':
+                return
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'dcim_path': self.dcim_path,
+            'album': self.album_name,
+            'priority': self.priority,
+            'engine': self.engine,
+            'watch': self.watch,
+            'status': self.status,
+            'success': self.success,
+            'progress': dict(self.progress),
+            'submitted_at': self.submitted_at,
+        }
+
+class UploadDaemon:
+    """ジョブを優先度順に 1 件ずつ処理する常駐アップローダー
+
+    Args:
+        socket_path: 待ち受ける Unix ソケットのパス
+    """
+
+    def __init__(self, socket_path: Path = SOCKET_PATH):
+        self.socket_path = Path(socket_path)
+        self._jobs: Dict[str, DaemonJob] = {}
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._worker = threading.Thread(target=self._run_jobs, name='upload-daemon-worker', daemon=True)
+
+    # --------------------------------------------------
+    # ジョブ管理
+    # --------------------------------------------------
+
+    def submit(
+        self,
+        dcim_path: Union[str, List[str]],
+        album_name: Optional[str] = None,
+        priority: int = 0,
+        engine: str = 'thread',
+        verbose: bool = False,
+        watch: bool = False,
+        scan_cache: bool = True,
+    ) -> DaemonJob:
+        """ジョブを登録する。同じディレクトリのジョブが待機中/実行中ならそれを返す"""
+        dcim_path = _normalize_dcim_path(dcim_path)
+        with self._cond:
+            for job in self._jobs.values():
+                if job.dcim_path == dcim_path and not job.finished:
+                    logger.info(f"同じディレクトリのジョブが進行中のため再利用します: {job.id}")
+                    return job
+            job = DaemonJob(dcim_path, album_name, priority, engine, verbose, watch, scan_cache)
+            self._jobs[job.id] = job
+            # 優先度の高いものから、同じ優先度なら登録順に処理する
+            heapq.heappush(self._queue, (-priority, next(self._seq), job))
+            self._prune_locked()
+            self._cond.notify_all()
+        logger.info(f"ジョブを受け付けました: {job.id} {dcim_path} (album={album_name}, priority={priority})")
+        return job
+
+    def cancel(self, job_id: Optional[str] = None) -> List[str]:
+        """ジョブを中止する。実行中のジョブは送信中のファイルが終わり次第止まる
+
+        Returns:
+            List[str]: 中止を要求したジョブ ID
+        """
+        cancelled = []
+        with self._cond:
+            for job in list(self._jobs.values()):
+                if job.finished or (job_id is not None and job.id != job_id):
+                    continue
+                job.cancel.set()
+                cancelled.append(job.id)
+                if job.status == 'queued':
+                    self._queue = [entry for entry in self._queue if entry[2] is not job]
+                    heapq.heapify(self._queue)
+                    job.finish('cancelled')
+        if cancelled:
+            logger.info(f"ジョブの中止を要求しました: {', '.join(cancelled)}")
+        return cancelled
+
+    def jobs(self) -> List[dict]:
+        with self._cond:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def get(self, job_id: str) -> Optional[DaemonJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def _prune_locked(self) -> None:
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def _run_jobs(self) -> None:
+        # 前回の停止時に batchCreate されずに残ったトークンを先に処理する
+        try:
+            uploader.recover_pending_tokens()
+        except Exception as e:
+            logger.error(f"トークンからの復旧に失敗: {e}")
+
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                job.status = 'running'
+
+            logger.info(f"ジョブを開始します: {job.id} {job.dcim_path}")
+            try:
+                success = uploader.upload_photos(
+                    [Path(p) for p in job.dcim_path] if isinstance(job.dcim_path, list) else Path(job.dcim_path),
+                    album_name=job.album_name,
+                    verbose=job.verbose,
+                    engine=job.engine,
+                    on_progress=job.emit,
+                    cancel=job.cancel,
+                    watch=job.watch,
+                    scan_cache=job.scan_cache,
+                )
+                job.finish('cancelled' if job.cancel.is_set() else 'done', success)
+            except Exception as e:
+                logger.error(f"ジョブの実行中にエラーが発生: {job.id} {e}")
+                job.finish('failed', False)
+            logger.info(f"ジョブが終了しました: {job.id} status={job.status}")
+
+    # --------------------------------------------------
+    # ソケットサーバー
+    # --------------------------------------------------
+
+    def _make_handler(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def send(self, message: dict) -> None:
+                self.wfile.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+            def follow(self, job: DaemonJob) -> None:
+                for event in job.events():
+                    self.send(event)
+
+            def handle(self):
+                # 1 接続につき 1 リクエスト。応答（とイベント）を送り終えたら切断する
+                line = self.rfile.readline()
+                if not line.strip():
+                    return
+                try:
+                    daemon._dispatch(self, json.loads(line))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                except Exception as e:
+                    logger.error(f"リクエストの処理に失敗: {e}")
+                    try:
+                        self.send({'ok': False, 'error': str(e)})
+                    except OSError:
+                        pass
+
+        return Handler
+
+    def _dispatch(self, handler, message: dict) -> None:
+        cmd = message.get('cmd')
+        if cmd == 'ping':
+            handler.send({'ok': True, 'pid': os.getpid()})
+        elif cmd == 'submit':
+            if not message.get('dcim_path'):
+                handler.send({'ok': False, 'error': 'dcim_path は必須です'})
+                return
+            job = self.submit(
+                message['dcim_path'],
+                album_name=message.get('album'),
+                priority=int(message.get('priority', 0)),
+                engine=message.get('engine', 'thread'),
+                verbose=bool(message.get('verbose', False)),
+                watch=bool(message.get('watch', False)),
+                scan_cache=bool(message.get('scan_cache', True)),
+            )
+            handler.send({'ok': True, 'job': job.to_dict()})
+            if message.get('follow'):
+                handler.follow(job)
+        elif cmd == 'watch':
+            job = self.get(message.get('job_id', ''))
+            if job is None:
+                handler.send({'ok': False, 'error': 'ジョブが見つかりません'})
+                return
+            handler.send({'ok': True, 'job': job.to_dict()})
+            handler.follow(job)
+        elif cmd == 'status':
+            handler.send({'ok': True, 'jobs': self.jobs()})
+        elif cmd == 'cancel':
+            handler.send({'ok': True, 'cancelled': self.cancel(message.get('job_id'))})
+        elif cmd == 'shutdown':
+            handler.send({'ok': True})
+            threading.Thread(target=self.shutdown, daemon=True).start()
+        else:
+            handler.send({'ok': False, 'error': f'不明なコマンド: {cmd}'})
+
+    def start(self) -> "UploadDaemon":
+        """ソケットを開いてジョブ処理スレッドを開始（待ち受けは serve_forever で行う）"""
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            if is_running(self.socket_path):
+                raise RuntimeError(f"デーモンは既に起動しています: {self.socket_path}")
+            # 前回のプロセスが残したソケットファイル
+            self.socket_path.unlink()
+        self._server = socketserver.ThreadingUnixStreamServer(str(self.socket_path), self._make_handler())
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        self._worker.start()
+        logger.info(f"アップロードデーモンを起動しました: {self.socket_path}")
+        return self
+
+    def serve_forever(self) -> None:
+        if self._server is None:
+            self.start()
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """実行中のジョブを中止し、待ち受けを終了する"""
+        self.cancel()
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+        logger.info("アップロードデーモンを停止しました")
+
+# --------------------------------------------------
+# クライアント
+# --------------------------------------------------
+
+def _connect(socket_path: Optional[Path], timeout: Optional[float]) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(str(socket_path or SOCKET_PATH))
+    return sock
+
+def stream(message: dict, socket_path: Optional[Path] = None, timeout: Optional[float] = None) -> Iterator[dict]:
+    """デーモンへメッセージを送り、返ってくる JSON 行を順に返す"""
+    with _connect(socket_path, timeout) as sock:
+        sock.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reader:
+            for line in reader:
+                if line.strip():
+                    yield json.loads(line)
+
+def request(message: dict, socket_path: Optional[Path] = None, timeout: float = 5.0) -> Optional[dict]:
+    """1 往復のリクエストを送信。デーモンに接続できない場合は None"""
+    try:
+        return next(stream(message, socket_path, timeout), None)
+    except (OSError, ValueError) as e:
+        logger.debug(f"デーモンへの接続に失敗: {e}")
+        return None
+
+def is_running(socket_path: Optional[Path] = None) -> bool:
+    """デーモンが応答するか"""
+    response = request({'cmd': 'ping'}, socket_path, timeout=1.0)
+    return bool(response and response.get('ok'))
+
+def submit_job(
+    dcim_path,
+    album_name: Optional[str] = None,
+    priority: int = 0,
+    engine: str = 'thread',
+    verbose: bool = False,
+    watch: bool = False,
+    scan_cache: bool = True,
+    follow: bool = False,
+    on_event: Optional[Callable[[dict], None]] = None,
+    socket_path: Optional[Path] = None,
+) -> Optional[dict]:
+    """デーモンにジョブを登録
+
+    Args:
+        dcim_path: アップロードするディレクトリ（複数の SD カードの場合はそのリスト）
+        album_name: アップロード先アルバム名
+        priority: 優先度（大きいほど先に処理）
+        engine: アップロードエンジン ("thread" または "async")
+        verbose: 詳細ログ出力
+        watch: True の場合は SD カードが外れるまで新しく書き込まれたファイルも取り込む
+        scan_cache: False の場合は走査キャッシュを使わずにすべてのフォルダを読み直す
+        follow: True の場合はジョブ完了まで進捗イベントを受け取る
+        on_event: follow 時に各イベントで呼ばれる関数
+        socket_path: デーモンのソケット
+
+    Returns:
+        Optional[dict]: follow しない場合は登録したジョブ、follow した場合は最後の
+        ``done`` イベント。デーモンに接続できない場合は None
+    """
+    message = {
+        'cmd': 'submit',
+        'dcim_path': _normalize_dcim_path(dcim_path),
+        'album': album_name,
+        'priority': priority,
+        'engine': engine,
+        'verbose': verbose,
+        'watch': watch,
+        'scan_cache': scan_cache,
+        'follow': follow,
+    }
+    try:
+        responses = stream(message, socket_path, timeout=None if follow else 5.0)
+        reply = next(responses, None)
+        if not reply or not reply.get('ok'):
+            logger.error(f"ジョブの登録に失敗: {reply and reply.get('error')}")
+            return None
+        if not follow:
+            return reply['job']
+        last = None
+        for event in responses:
+            last = event
+            if on_event is not None:
+                on_event(event)
+        return last
+    except (OSError, ValueError) as e:
+        logger.error(f"デーモンとの通信に失敗: {e}")
+        return None
+
+def get_status(socket_path: Optional[Path] = None) -> Optional[List[dict]]:
+    """デーモンのジョブ一覧。接続できない場合は None"""
+    response = request({'cmd': 'status'}, socket_path)
+    return response.get('jobs', []) if response and response.get('ok') else None
+
+def has_active_jobs(socket_path: Optional[Path] = None) -> bool:
+    """待機中または実行中のジョブがあるか"""
+    jobs = get_status(socket_path) or []
+    return any(job['status'] in ('queued', 'running') for job in jobs)
+
+def cancel_jobs(job_id: Optional[str] = None, socket_path: Optional[Path] = None) -> bool:
+    """ジョブを中止（job_id 省略時は全ジョブ）"""
+    response = request({'cmd': 'cancel', 'job_id': job_id}, socket_path)
+    return bool(response and response.get('ok'))
+
+def ensure_daemon(socket_path: Optional[Path] = None, timeout: float = STARTUP_TIMEOUT) -> bool:
+    """デーモンが起動していなければバックグラウンドで起動し、応答するまで待つ
+
+    Returns:
+        bool: デーモンが利用可能になった場合は True
+    """
+    if is_running(socket_path):
+        return True
+
+    command = [sys.executable, '-m', 'google_photos_uploader.daemon']
+    if socket_path is not None:
+        command.extend(['--socket', str(socket_path)])
+    env = os.environ.copy()
+    # スクリプトから呼ばれた場合でもパッケージを import できるようにする
+    package_root = str(Path(__file__).resolve().parent.parent)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    try:
+        subprocess.Popen(
+            command,
+            env=env,
+            start_new_session=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except Exception as e:
+        logger.error(f"デーモンの起動に失敗: {e}")
+        return False
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_running(socket_path):
+            logger.info("アップロードデーモンを起動しました")
+            return True
+        time.sleep(0.2)
+    logger.error("アップロードデーモンが時間内に応答しませんでした")
+    return False
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Google Photos アップロードデーモン')
+    parser.add_argument('--socket', type=Path, default=SOCKET_PATH, help='待ち受ける Unix ソケットのパス')
+    parser.add_argument('--verbose', '-v', action='store_true', help='詳細なログを出力')
+    args = parser.parse_args()
+
+    (Path.home() / '.google_photos_uploader').mkdir(parents=True, exist_ok=True)
+    setup_logging(logging.DEBUG if args.verbose else logging.INFO)
+
+    daemon = UploadDaemon(args.socket)
+    try:
+        daemon.start()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=daemon.shutdown, daemon=True).start())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        daemon.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
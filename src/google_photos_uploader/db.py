@@ -0,0 +1,49 @@
+import logging
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Union
+
+logger = logging.getLogger(__name__)
+
+# アップローダーの状態を保存する SQLite データベース
+DB_PATH = Path.home() / '.google_photos_uploader' / 'uploader.db'
+# 他のプロセスが書き込み中の場合に待つ最大ミリ秒
+BUSY_TIMEOUT_MS = 5000
+
+def connect(path: Union[str, Path] = DB_PATH) -> sqlite3.Connection:
+    """WAL モードで SQLite データベースに接続
+
+    WAL モードでは書き込み中も他の接続から読み出せ、電源断の後も
+    最後にコミットされた状態から再開できる。synchronous=NORMAL のため
+    電源断の直前のコミットが失われることはあるが、データベースは壊れない。
+
+    接続はスレッド間で共有できるように開く。呼び出し側でロックを用いること。
+
+    Args:
+        path: データベースファイルのパス
+
+    Returns:
+        sqlite3.Connection: 接続
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    mode = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+    if str(mode).lower() != 'wal':
+        logger.warning(f"SQLite の WAL モードを有効にできませんでした: {mode}")
+    conn.execute('PRAGMA synchronous = NORMAL')
+    return conn
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """複数の書き込みを 1 つのトランザクションにまとめる"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
@@ -0,0 +1,286 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from . import db
+from .utils import get_volume_id, read_mountinfo
+
+logger = logging.getLogger(__name__)
+
+# ハッシュに使う先頭・中央・末尾それぞれのバイト数
+SAMPLE_SIZE = 64 * 1024
+
+# IN 句 1 回あたりのパラメータ数
+_CHUNK = 500
+
+# 全体のハッシュを求める際に 1 回で読むバイト数
+READ_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS content_index (
+    key TEXT NOT NULL,
+    full_hash TEXT NOT NULL,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (key, full_hash)
+);
+CREATE TABLE IF NOT EXISTS content_fingerprints (
+    volume TEXT NOT NULL,
+    rel_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    full_hash TEXT,
+    PRIMARY KEY (volume, rel_path)
+);
+"""
+
+def _chunks(items: List[str]) -> Iterator[List[str]]:
+    for i in range(0, len(items), _CHUNK):
+        yield items[i : i + _CHUNK]
+
+def content_key(file_path: Union[str, Path]) -> Optional[str]:
+    """ファイル内容から重複判定用のキーを求める
+
+    ファイル全体ではなく、サイズと先頭・中央・末尾の SAMPLE_SIZE バイトずつを
+    BLAKE2b でハッシュする。SD カードからの読み出し量をファイル毎に数百 KB に
+    抑えつつ、マウント先やファイル名が変わっても同じファイルを識別できる。
+    読んでいない部分だけが異なるファイル（編集した RAW や動画など）も同じキーになるため、
+    キーの一致は重複の候補に留め、確定には full_content_hash() を使う。
+
+    Returns:
+        Optional[str]: "サイズ-ハッシュ" 形式のキー。読み込めない場合は None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+            if size <= SAMPLE_SIZE * 3:
+                digest.update(f.read())
+            else:
+                for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+                    f.seek(offset)
+                    digest.update(f.read(SAMPLE_SIZE))
+        return f"{size}-{digest.hexdigest()}"
+    except OSError as e:
+        logger.warning(f"ファイルのハッシュ計算に失敗: {file_path} {e}")
+        return None
+
+def full_content_hash(file_path: Union[str, Path]) -> Optional[str]:
+    """ファイル全体の BLAKE2b ハッシュ（内容キーが一致したファイルの重複の確定に使う）
+
+    Returns:
+        Optional[str]: 16 進のハッシュ。読み込めない場合は None
+    """
+    try:
+        digest = hashlib.blake2b(digest_size=32)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError as e:
+        logger.warning(f"ファイルのハッシュ計算に失敗: {file_path} {e}")
+        return None
+
+class DedupIndex:
+    """アップロード済みファイルの内容キーを記録するインデックス
+
+    アップロード台帳（ledger.UploadLedger）は絶対パスで記録されているため、
+    同じ SD カードが別のマウント先に現れると全ファイルが未アップロードに見える。
+    このインデックスは内容で判定するので、パスが変わっても再アップロードしない。
+
+    内容キー（標本のハッシュ）で候補を絞り、ファイル全体のハッシュが一致した場合だけ
+    同じファイルとみなす。全体のハッシュは登録時に求め、内容キーと同じ指紋で
+    キャッシュするため、挿し直したカードのファイルを読み直すことはない。
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self._conn = db.connect(path or db.DB_PATH)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(self, keys: Dict[str, Optional[str]]) -> None:
+        """アップロード済みファイルを登録（ファイル全体のハッシュも求める）
+
+        Args:
+            keys: パス → 内容キー
+        """
+        keys = {path: key for path, key in keys.items() if key}
+        if not keys:
+            return
+        hashes = self.full_hashes(keys)
+        now = time.time()
+        rows = [(key, hashes[path], path, now) for path, key in keys.items() if hashes.get(path)]
+        if not rows:
+            return
+        with self._lock, db.transaction(self._conn):
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO content_index (key, full_hash, path, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def known_hashes(self, keys: Iterable[Optional[str]]) -> Dict[str, Set[str]]:
+        """登録済みの内容キー → その内容キーを持つアップロード済みファイルの全体のハッシュ"""
+        keys = [k for k in set(keys) if k]
+        found: Dict[str, Set[str]] = {}
+        with self._lock:
+            for chunk in _chunks(keys):
+                marks = ','.join('?' * len(chunk))
+                for row in self._conn.execute(
+                    f"SELECT key, full_hash FROM content_index WHERE key IN ({marks})", chunk
+                ):
+                    found.setdefault(row['key'], set()).add(row['full_hash'])
+        return found
+
+    def content_keys(
+        self, paths: Iterable[str], stats: Optional[Dict[str, Tuple[int, int]]] = None
+    ) -> Dict[str, Optional[str]]:
+        """ファイルの内容キーを求める（変更の無いファイルはハッシュを省く）
+
+        (ボリューム ID, ボリューム内の相対パス, サイズ, mtime_ns) を指紋として内容キーを
+        記録しておき、指紋が一致するファイルは読み込まずに記録済みのキーを返す。
+        ボリューム ID はファイルシステムの UUID なので、マウント先が変わっても一致する。
+
+        Args:
+            paths: ファイルパス
+            stats: パス → (サイズ, mtime_ns)。ディレクトリ走査で取得済みのものは stat を省く
+
+        Returns:
+            Dict[str, Optional[str]]: パス → 内容キー。読み込めないファイルは None
+        """
+        keys: Dict[str, Optional[str]] = {}
+        fingerprints = self._fingerprints(paths, stats, keys)
+        cached = self._cached_fingerprints(fingerprints)
+
+        hashed = []
+        for fp, (path, size, mtime_ns) in fingerprints.items():
+            hit = cached.get(fp)
+            if hit and hit['size'] == size and hit['mtime_ns'] == mtime_ns:
+                keys[path] = hit['key']
+                continue
+            keys[path] = content_key(path)
+            if keys[path]:
+                hashed.append((fp[0], fp[1], size, mtime_ns, keys[path]))
+
+        if hashed:
+            with self._lock, db.transaction(self._conn):
+                self._conn.executemany(
+                    """
+                    INSERT INTO content_fingerprints (volume, rel_path, size, mtime_ns, key, full_hash)
+                    VALUES (?, ?, ?, ?, ?, NULL)
+                    ON CONFLICT(volume, rel_path) DO UPDATE SET
+                        size = excluded.size, mtime_ns = excluded.mtime_ns, key = excluded.key, full_hash = NULL
+                    """,
+                    hashed,
+                )
+            logger.debug(f"内容キーを計算: {len(hashed)} 件（指紋が一致した {len(fingerprints) - len(hashed)} 件は省略）")
+        return keys
+
+    def full_hashes(
+        self, paths: Iterable[str], stats: Optional[Dict[str, Tuple[int, int]]] = None
+    ) -> Dict[str, Optional[str]]:
+        """ファイル全体のハッシュを求める（指紋が一致し、計算済みのファイルは読まない）
+
+        content_keys() で指紋を記録したファイルは、求めたハッシュも指紋に記録する。
+
+        Args:
+            paths: ファイルパス
+            stats: パス → (サイズ, mtime_ns)。ディレクトリ走査で取得済みのものは stat を省く
+
+        Returns:
+            Dict[str, Optional[str]]: パス → 全体のハッシュ。読み込めないファイルは None
+        """
+        hashes: Dict[str, Optional[str]] = {}
+        fingerprints = self._fingerprints(paths, stats, hashes)
+        cached = self._cached_fingerprints(fingerprints)
+
+        computed = []
+        for fp, (path, size, mtime_ns) in fingerprints.items():
+            hit = cached.get(fp)
+            matches = hit is not None and hit['size'] == size and hit['mtime_ns'] == mtime_ns
+            if matches and hit['full_hash']:
+                hashes[path] = hit['full_hash']
+                continue
+            hashes[path] = full_content_hash(path)
+            if matches and hashes[path]:
+                computed.append((hashes[path], fp[0], fp[1], size, mtime_ns))
+
+        if computed:
+            with self._lock, db.transaction(self._conn):
+                self._conn.executemany(
+                    """
+                    UPDATE content_fingerprints SET full_hash = ?
+                    WHERE volume = ? AND rel_path = ? AND size = ? AND mtime_ns = ?
+                    """,
+                    computed,
+                )
+        return hashes
+
+    def _fingerprints(
+        self, paths: Iterable[str], stats: Optional[Dict[str, Tuple[int, int]]], unreadable: Dict[str, None]
+    ) -> Dict[Tuple[str, str], Tuple[str, int, int]]:
+        """(ボリューム, 相対パス) → (パス, サイズ, mtime_ns)。stat できないファイルは unreadable に None で入れる"""
+        fingerprints: Dict[Tuple[str, str], Tuple[str, int, int]] = {}
+        volumes: Dict[str, Tuple[str, str]] = {}  # ディレクトリ → (ボリューム, 相対パス)
+        mountinfo = None
+        for path in paths:
+            stat = stats.get(path) if stats is not None else None
+            if stat is None:
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    unreadable[path] = None
+                    continue
+                stat = (st.st_size, st.st_mtime_ns)
+            # ボリュームと相対パスはディレクトリ毎に求め、ファイル毎の relpath を避ける
+            directory, _, name = str(path).rpartition(os.sep)
+            if directory not in volumes:
+                if mountinfo is None:
+                    mountinfo = read_mountinfo()
+                volume, mount_point = get_volume_id(Path(directory or os.sep), mountinfo)
+                volumes[directory] = (volume, os.path.relpath(directory or os.sep, mount_point))
+            volume, rel_dir = volumes[directory]
+            fingerprints[(volume, f"{rel_dir}/{name}")] = (path, *stat)
+        return fingerprints
+
+    def _cached_fingerprints(self, fingerprints: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+        """記録済みの指紋（(ボリューム, 相対パス) → 行）"""
+        cached: Dict[Tuple[str, str], dict] = {}
+        by_volume: Dict[str, List[str]] = {}
+        for volume, rel_path in fingerprints:
+            by_volume.setdefault(volume, []).append(rel_path)
+        with self._lock:
+            for volume, rel_paths in by_volume.items():
+                for chunk in _chunks(rel_paths):
+                    marks = ','.join('?' * len(chunk))
+                    for row in self._conn.execute(
+                        f"""
+                        SELECT rel_path, size, mtime_ns, key, full_hash FROM content_fingerprints
+                        WHERE volume = ? AND rel_path IN ({marks})
+                        """,
+                        [volume, *chunk],
+                    ):
+                        cached[(volume, row['rel_path'])] = dict(row)
+        return cached
+
+_index: Optional[DedupIndex] = None
+_index_lock = threading.Lock()
+
+def get_dedup_index() -> DedupIndex:
+    """プロセス共有の重複判定インデックスを取得"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DedupIndex()
+        return _index
@@ -0,0 +1,229 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# ファイル毎のアップロード状態
+STATE_DISCOVERED = 'discovered'  # 対象として検出済み
+STATE_UPLOADED = 'uploaded'      # バイト送信済み（アップロードトークン取得済み）
+STATE_CREATED = 'created'        # batchCreate でメディアアイテム作成済み
+STATE_FAILED = 'failed'          # 失敗
+
+# アップロードトークンの有効期限は 1 日。余裕を持たせてこれより古いものは使わない
+TOKEN_TTL = 23 * 60 * 60
+
+# IN 句 1 回あたりのパラメータ数
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    token TEXT,
+    token_at REAL,
+    album TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS upload_files_state ON upload_files(state);
+"""
+
+def _chunks(items: List[str]) -> Iterator[List[str]]:
+    for i in range(0, len(items), _CHUNK):
+        yield items[i : i + _CHUNK]
+
+class JobStore:
+    """ファイル毎のアップロード状態を SQLite (WAL) に記録するジョブストア
+
+    状態は discovered → uploaded（トークン付き）→ created と進み、失敗時は failed になる。
+    電源断などで途中終了しても、次回の実行時に uploaded のファイルはトークンを
+    再利用して batchCreate だけを行い、created のファイルは送り直さない。
+
+    ファイルはパスに加えてサイズと mtime で識別し、同じパスでも内容が
+    変わっていれば（別の SD カードで同じファイル名など）最初からやり直す。
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self._conn = db.connect(path or db.DB_PATH)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def discover(self, files: Dict[str, Tuple[int, int]]) -> None:
+        """アップロード対象のファイルを登録
+
+        既存のファイルでサイズか mtime が変わっているものは discovered に戻す。
+
+        Args:
+            files: パス → (サイズ, mtime_ns)
+        """
+        now = time.time()
+        rows = [(path, size, mtime_ns, now) for path, (size, mtime_ns) in files.items()]
+        with self._lock, db.transaction(self._conn):
+            self._conn.executemany(
+                """
+                INSERT INTO upload_files (path, size, mtime_ns, state, updated_at)
+                VALUES (?, ?, ?, 'discovered', ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size,
+                    mtime_ns = excluded.mtime_ns,
+                    state = 'discovered',
+                    token = NULL,
+                    token_at = NULL,
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE upload_files.size != excluded.size OR upload_files.mtime_ns != excluded.mtime_ns
+                """,
+                rows,
+            )
+
+    def mark_uploaded(self, path: str, token: str, album: Optional[str] = None) -> None:
+        """バイト送信が完了しトークンを取得した
+
+        Args:
+            path: ファイルパス
+            token: アップロードトークン
+            album: 作成先のアルバム名（起動時の復旧で使用）
+        """
+        now = time.time()
+        with self._lock:
+            # 同じトークンを記録し直す場合は取得時刻を更新しない
+            self._conn.execute(
+                """
+                UPDATE upload_files
+                SET state = 'uploaded', error = NULL, updated_at = ?,
+                    token_at = CASE WHEN token = ? THEN token_at ELSE ? END,
+                    token = ?,
+                    album = COALESCE(?, album)
+                WHERE path = ?
+                """,
+                (now, token, now, token, album, path),
+            )
+
+    def mark_created(self, paths: Iterable[str]) -> None:
+        """メディアアイテムの作成が完了した"""
+        now = time.time()
+        with self._lock, db.transaction(self._conn):
+            self._conn.executemany(
+                "UPDATE upload_files SET state = 'created', error = NULL, updated_at = ? WHERE path = ?",
+                [(now, path) for path in paths],
+            )
+
+    def mark_failed(self, path: str, error: str, keep_token: bool = False) -> None:
+        """失敗を記録する。keep_token=False の場合はトークンも破棄する"""
+        now = time.time()
+        with self._lock:
+            if keep_token:
+                self._conn.execute(
+                    "UPDATE upload_files SET state = 'failed', error = ?, updated_at = ? WHERE path = ?",
+                    (error, now, path),
+                )
+            else:
+                self._conn.execute(
+                    """
+                    UPDATE upload_files
+                    SET state = 'failed', error = ?, token = NULL, token_at = NULL, updated_at = ?
+                    WHERE path = ?
+                    """,
+                    (error, now, path),
+                )
+
+    def states(self, paths: Iterable[str]) -> Dict[str, str]:
+        """パス → 状態（未登録のパスは含まない）"""
+        result: Dict[str, str] = {}
+        with self._lock:
+            for chunk in _chunks(list(paths)):
+                marks = ','.join('?' * len(chunk))
+                for row in self._conn.execute(f"SELECT path, state FROM upload_files WHERE path IN ({marks})", chunk):
+                    result[row['path']] = row['state']
+        return result
+
+    def created(self, paths: Iterable[str]) -> Set[str]:
+        """指定パスのうちメディアアイテム作成済みのもの"""
+        return {path for path, state in self.states(paths).items() if state == STATE_CREATED}
+
+    def valid_tokens(self, paths: Optional[Iterable[str]] = None, ttl: float = TOKEN_TTL) -> Dict[str, str]:
+        """有効期限内のトークンを持つ uploaded 状態のファイル
+
+        Args:
+            paths: 対象のパス。None の場合はすべて
+            ttl: トークンの有効期間（秒）
+
+        Returns:
+            Dict[str, str]: パス → アップロードトークン
+        """
+        since = time.time() - ttl
+        query = "SELECT path, token FROM upload_files WHERE state = 'uploaded' AND token IS NOT NULL AND token_at >= ?"
+        result: Dict[str, str] = {}
+        with self._lock:
+            if paths is None:
+                rows = self._conn.execute(query, (since,)).fetchall()
+            else:
+                rows = []
+                for chunk in _chunks(list(paths)):
+                    marks = ','.join('?' * len(chunk))
+                    rows.extend(self._conn.execute(f"{query} AND path IN ({marks})", [since, *chunk]))
+        for row in rows:
+            result[row['path']] = row['token']
+        return result
+
+    def pending_tokens(self, ttl: float = TOKEN_TTL) -> List[dict]:
+        """有効期限内のトークンを持ち、まだ作成されていないファイルの一覧
+
+        Returns:
+            List[dict]: {"path", "token", "album", "token_at"} のリスト（取得順）
+        """
+        since = time.time() - ttl
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT path, token, album, token_at FROM upload_files
+                WHERE state = 'uploaded' AND token IS NOT NULL AND token_at >= ?
+                ORDER BY token_at
+                """,
+                (since,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def expire_tokens(self, ttl: float = TOKEN_TTL) -> int:
+        """期限切れのトークンを破棄し、ファイルを再アップロード対象（discovered）に戻す
+
+        Returns:
+            int: 破棄したトークン数
+        """
+        since = time.time() - ttl
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                UPDATE upload_files
+                SET state = 'discovered', token = NULL, token_at = NULL, updated_at = ?
+                WHERE state = 'uploaded' AND token_at < ?
+                """,
+                (time.time(), since),
+            )
+            return cursor.rowcount
+
+_store: Optional[JobStore] = None
+_store_lock = threading.Lock()
+
+def get_job_store() -> JobStore:
+    """プロセス共有のジョブストアを取得"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
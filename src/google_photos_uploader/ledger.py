@@ -0,0 +1,422 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from . import db
+
+logger = logging.getLogger(__name__)
+
+# アップロード結果
+STATUS_UPLOADED = 'uploaded'  # メディアアイテム作成済み
+
+# 再試行ジャーナルのイベント種別
+EVENT_FAILED = 'failed'    # 失敗（count 回分）
+EVENT_CLEARED = 'cleared'  # 成功したため失敗の記録を消す
+
+# ジャーナルの行数がこれを超え、かつ失敗中のファイル数の COMPACT_RATIO 倍を超えたら圧縮する
+COMPACT_MIN_EVENTS = 1000
+COMPACT_RATIO = 2
+
+# 旧形式のログ（取り込み後は .imported を付けて残す）
+LEGACY_UPLOADED_LOG = 'uploaded_files.txt'
+LEGACY_FAILED_LOG = 'failed_files.json'
+IMPORTED_SUFFIX = '.imported'
+
+# IN 句 1 回あたりのパラメータ数
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    path TEXT PRIMARY KEY,
+    content_key TEXT,
+    album TEXT,
+    media_item_id TEXT,
+    status TEXT NOT NULL,
+    uploaded_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS uploads_status_uploaded_at ON uploads(status, uploaded_at);
+CREATE INDEX IF NOT EXISTS uploads_content_key ON uploads(content_key);
+CREATE TABLE IF NOT EXISTS retry_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
+    error TEXT,
+    at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS retry_events_path ON retry_events(path, seq);
+CREATE TABLE IF NOT EXISTS ledger_meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def _chunks(items: List[str]) -> Iterator[List[str]]:
+    for i in range(0, len(items), _CHUNK):
+        yield items[i : i + _CHUNK]
+
+def _parse_attempt(value) -> float:
+    """旧形式の last_attempt（"%Y-%m-%d %H:%M:%S"）をエポック秒に変換"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return time.mktime(time.strptime(str(value), "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        return time.time()
+
+def fold_retry_events(events: Iterable[tuple]) -> Dict[str, dict]:
+    """再試行ジャーナルのイベントを畳み込み、ファイル毎の現在の失敗状態を求める
+
+    Args:
+        events: (path, kind, count, error, at) を seq 順に並べたもの
+
+    Returns:
+        Dict[str, dict]: パス → {"retry_count", "last_error", "last_attempt"}（失敗中のもののみ）
+    """
+    state: Dict[str, dict] = {}
+    for path, kind, count, error, at in events:
+        if kind == EVENT_CLEARED:
+            state.pop(path, None)
+            continue
+        entry = state.setdefault(path, {"retry_count": 0, "last_error": None, "last_attempt": None})
+        entry["retry_count"] += count
+        entry["last_error"] = error
+        entry["last_attempt"] = at
+    return state
+
+class UploadLedger:
+    """アップロード済み・失敗ファイルの台帳
+
+    従来の uploaded_files.txt（パスの追記ログ）と failed_files.json（毎回全体を
+    書き直す JSON）を置き換える。アップロード済みのファイルはパスを主キーとし、
+    状態とアップロード日時にインデックスを張っているため、起動時にログ全体を
+    読み込まずに、対象ファイルだけを照会できる。
+
+    失敗は追記のみの再試行ジャーナル（retry_events）に記録し、読み出し時に
+    畳み込んで現在の失敗回数を求める。書き込みは変更分のイベントを追加するだけで、
+    履歴が増えたら compact() で失敗中のファイル 1 件につき 1 イベントにまとめる。
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self._conn = db.connect(path or db.DB_PATH)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --------------------------------------------------
+    # 照会
+    # --------------------------------------------------
+
+    def lookup(self, paths: Iterable[str]) -> Dict[str, dict]:
+        """指定パスのアップロード記録（未記録のパスは含まない）
+
+        Returns:
+            Dict[str, dict]: パス → {"status", "content_key", "album", "media_item_id", ...}
+        """
+        result: Dict[str, dict] = {}
+        with self._lock:
+            for chunk in _chunks(list(paths)):
+                marks = ','.join('?' * len(chunk))
+                for row in self._conn.execute(f"SELECT * FROM uploads WHERE path IN ({marks})", chunk):
+                    result[row['path']] = dict(row)
+        return result
+
+    def uploaded(self, paths: Iterable[str]) -> Set[str]:
+        """指定パスのうちアップロード済みのもの
+
+        起動時に SD カード上の全ファイルを照会するため、主キーだけで引き、
+        行オブジェクトを作らずにタプルで受け取る。状態を条件に加えると
+        状態のインデックスが選ばれて全件走査になるため、状態は Python 側で判定する。
+        """
+        result: Set[str] = set()
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.row_factory = None
+            for chunk in _chunks(list(paths)):
+                marks = ','.join('?' * len(chunk))
+                for path, status in cursor.execute(f"SELECT path, status FROM uploads WHERE path IN ({marks})", chunk):
+                    if status == STATUS_UPLOADED:
+                        result.add(path)
+        return result
+
+    def retry_state(self, paths: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """再試行ジャーナルを畳み込んだ現在の失敗状態
+
+        Args:
+            paths: 対象のパス。None の場合はすべて
+
+        Returns:
+            Dict[str, dict]: パス → {"retry_count", "last_error", "last_attempt"}（失敗中のもののみ）
+        """
+        query = "SELECT seq, path, kind, count, error, at FROM retry_events"
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.row_factory = None
+            if paths is None:
+                events = cursor.execute(query).fetchall()
+            else:
+                events = []
+                for chunk in _chunks(list(paths)):
+                    marks = ','.join('?' * len(chunk))
+                    events.extend(cursor.execute(f"{query} WHERE path IN ({marks})", chunk))
+        events.sort(key=lambda e: e[0])
+        return fold_retry_events(e[1:] for e in events)
+
+    def failed_paths(self) -> List[str]:
+        """失敗として記録されているファイル（古い順）"""
+        state = self.retry_state()
+        return sorted(state, key=lambda p: state[p]["last_attempt"] or 0)
+
+    def recent_uploads(self, since: Optional[float] = None) -> List[str]:
+        """アップロード済みファイル（新しい順）
+
+        Args:
+            since: この時刻（エポック秒）以降にアップロードされたものに限る
+        """
+        query = "SELECT path FROM uploads WHERE status = 'uploaded'"
+        params: list = []
+        if since is not None:
+            query += " AND uploaded_at >= ?"
+            params.append(since)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY uploaded_at DESC, rowid DESC", params).fetchall()
+        return [row['path'] for row in rows]
+
+    def unhashed(self, prefix: str) -> List[str]:
+        """prefix 以下のアップロード済みファイルのうち内容キーが未記録のもの
+
+        旧形式のログから取り込んだファイルは内容キーを持たないため、
+        重複判定インデックスへの移行対象になる。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT path FROM uploads
+                WHERE path >= ? AND path < ? AND status = 'uploaded' AND content_key IS NULL
+                """,
+                (prefix, prefix + '\U0010ffff'),
+            ).fetchall()
+        return [row['path'] for row in rows]
+
+    # --------------------------------------------------
+    # 記録
+    # --------------------------------------------------
+
+    def record_uploaded(
+        self,
+        paths: Iterable[str],
+        album: Optional[str] = None,
+        content_keys: Optional[Dict[str, Optional[str]]] = None,
+        media_item_ids: Optional[Dict[str, Optional[str]]] = None,
+    ) -> None:
+        """アップロード（メディアアイテムの作成）が完了した
+
+        失敗の記録があるファイルには、再試行ジャーナルへ cleared イベントを追加する。
+
+        Args:
+            paths: ファイルパス
+            album: アルバム名
+            content_keys: パス → 内容キー
+            media_item_ids: パス → メディアアイテム ID
+        """
+        paths = list(paths)
+        content_keys = content_keys or {}
+        media_item_ids = media_item_ids or {}
+        now = time.time()
+        rows = [(p, content_keys.get(p), album, media_item_ids.get(p), now, now) for p in paths]
+        if not rows:
+            return
+        with self._lock, db.transaction(self._conn):
+            self._conn.executemany(
+                """
+                INSERT INTO uploads (path, content_key, album, media_item_id, status, uploaded_at, updated_at)
+                VALUES (?, ?, ?, ?, 'uploaded', ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    content_key = COALESCE(excluded.content_key, content_key),
+                    album = COALESCE(excluded.album, album),
+                    media_item_id = COALESCE(excluded.media_item_id, media_item_id),
+                    status = 'uploaded',
+                    uploaded_at = excluded.uploaded_at,
+                    updated_at = excluded.updated_at
+                """,
+                rows,
+            )
+            retried: Set[str] = set()
+            for chunk in _chunks(paths):
+                marks = ','.join('?' * len(chunk))
+                retried.update(
+                    row['path']
+                    for row in self._conn.execute(f"SELECT DISTINCT path FROM retry_events WHERE path IN ({marks})", chunk)
+                )
+            self._conn.executemany(
+                "INSERT INTO retry_events (path, kind, count, at) VALUES (?, 'cleared', 0, ?)",
+                [(p, now) for p in paths if p in retried],
+            )
+
+    def record_failed(self, path: str, error: str) -> int:
+        """失敗を再試行ジャーナルへ追記する
+
+        Returns:
+            int: 記録後の失敗回数
+        """
+        now = time.time()
+        with self._lock, db.transaction(self._conn):
+            self._conn.execute(
+                "INSERT INTO retry_events (path, kind, count, error, at) VALUES (?, 'failed', 1, ?, ?)",
+                (path, error, now),
+            )
+            events = self._conn.execute(
+                "SELECT path, kind, count, error, at FROM retry_events WHERE path = ? ORDER BY seq", (path,)
+            ).fetchall()
+        return fold_retry_events(tuple(e) for e in events)[path]["retry_count"]
+
+    def set_content_keys(self, keys: Dict[str, Optional[str]]) -> None:
+        """内容キーを記録"""
+        rows = [(key, path) for path, key in keys.items() if key]
+        if not rows:
+            return
+        with self._lock, db.transaction(self._conn):
+            self._conn.executemany("UPDATE uploads SET content_key = ? WHERE path = ?", rows)
+
+    # --------------------------------------------------
+    # 再試行ジャーナルの圧縮
+    # --------------------------------------------------
+
+    def compact(self) -> int:
+        """再試行ジャーナルを現在の状態だけに圧縮する
+
+        畳み込んだ結果を、失敗中のファイル 1 件につき 1 つの failed イベント
+        （count に累計の失敗回数）として書き直す。
+
+        Returns:
+            int: 削除したイベント数
+        """
+        with self._lock, db.transaction(self._conn):
+            events = [tuple(e) for e in self._conn.execute("SELECT path, kind, count, error, at FROM retry_events ORDER BY seq")]
+            state = fold_retry_events(events)
+            self._conn.execute("DELETE FROM retry_events")
+            self._conn.executemany(
+                "INSERT INTO retry_events (path, kind, count, error, at) VALUES (?, 'failed', ?, ?, ?)",
+                [
+                    (path, info["retry_count"], info["last_error"], info["last_attempt"])
+                    for path, info in sorted(state.items(), key=lambda item: item[1]["last_attempt"] or 0)
+                ],
+            )
+        removed = len(events) - len(state)
+        if removed:
+            logger.info(f"再試行ジャーナルを圧縮しました: {len(events)} → {len(state)} イベント")
+        return removed
+
+    def maybe_compact(self, min_events: int = COMPACT_MIN_EVENTS) -> int:
+        """ジャーナルが失敗中のファイル数に比べて大きくなっていれば圧縮する
+
+        Returns:
+            int: 削除したイベント数（圧縮しなかった場合は 0）
+        """
+        with self._lock:
+            events, paths = self._conn.execute("SELECT COUNT(*), COUNT(DISTINCT path) FROM retry_events").fetchone()
+        if events <= min_events or events <= paths * COMPACT_RATIO:
+            return 0
+        return self.compact()
+
+    # --------------------------------------------------
+    # 旧形式のログの取り込み
+    # --------------------------------------------------
+
+    def import_legacy(self, base_dir: Union[str, Path]) -> int:
+        """uploaded_files.txt と failed_files.json を台帳へ取り込む（1 回だけ）
+
+        アップロード済みログは記録順を保つため、ログの更新日時を
+        アップロード日時として先頭から順に登録する。失敗ログは失敗回数を
+        まとめた failed イベントとして再試行ジャーナルに登録する。
+        取り込んだファイルは .imported を付けた名前に変更して残す。
+
+        Args:
+            base_dir: 旧形式のログがあるディレクトリ
+
+        Returns:
+            int: 取り込んだファイル数（取り込み済みの場合は 0）
+        """
+        base_dir = Path(base_dir)
+        uploaded_log = base_dir / LEGACY_UPLOADED_LOG
+        failed_log = base_dir / LEGACY_FAILED_LOG
+
+        uploaded: List[str] = []
+        uploaded_at = time.time()
+        if uploaded_log.exists():
+            uploaded_at = uploaded_log.stat().st_mtime
+            seen: Set[str] = set()
+            for line in uploaded_log.read_text(encoding='utf-8').splitlines():
+                line = line.strip()
+                if line and line not in seen:
+                    seen.add(line)
+                    uploaded.append(line)
+        failed: Dict[str, dict] = {}
+        if failed_log.exists():
+            try:
+                failed = json.loads(failed_log.read_text(encoding='utf-8'))
+            except json.JSONDecodeError:
+                logger.warning(f"{LEGACY_FAILED_LOG} の解析に失敗。失敗の記録は取り込みません")
+        uploaded_set = set(uploaded)
+        failures: List[Tuple[str, int, Optional[str], float]] = sorted(
+            (
+                (p, int(info.get('retry_count', 0)), info.get('last_error'), _parse_attempt(info.get('last_attempt')))
+                for p, info in failed.items()
+                if isinstance(info, dict) and p not in uploaded_set
+            ),
+            key=lambda f: f[3],
+        )
+
+        now = time.time()
+        with self._lock, db.transaction(self._conn):
+            if self._conn.execute("SELECT 1 FROM ledger_meta WHERE name = 'legacy_imported'").fetchone():
+                return 0
+            self._conn.executemany(
+                """
+                INSERT INTO uploads (path, status, uploaded_at, updated_at) VALUES (?, 'uploaded', ?, ?)
+                ON CONFLICT(path) DO NOTHING
+                """,
+                [(p, uploaded_at, now) for p in uploaded],
+            )
+            self._conn.executemany(
+                "INSERT INTO retry_events (path, kind, count, error, at) VALUES (?, 'failed', ?, ?, ?)", failures
+            )
+            self._conn.execute("INSERT INTO ledger_meta (name, value) VALUES ('legacy_imported', ?)", (str(now),))
+
+        for log in (uploaded_log, failed_log):
+            if log.exists():
+                try:
+                    os.replace(log, log.with_name(log.name + IMPORTED_SUFFIX))
+                except OSError as e:
+                    logger.warning(f"取り込み済みのログの名前を変更できませんでした: {log} {e}")
+        imported = len(uploaded) + len(failures)
+        if imported:
+            logger.info(f"旧形式のログから {len(uploaded)} 件のアップロード済み、{len(failures)} 件の失敗を取り込みました")
+        return imported
+
+_ledger: Optional[UploadLedger] = None
+_ledger_lock = threading.Lock()
+
+def get_ledger() -> UploadLedger:
+    """プロセス共有の台帳を取得（初回に旧形式のログを取り込む）"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = UploadLedger()
+            try:
+                _ledger.import_legacy(Path.home() / '.google_photos_uploader')
+            except OSError as e:
+                logger.error(f"旧形式のログの取り込みに失敗しました: {e}")
+        return _ledger
@@ -0,0 +1,189 @@
+import logging
+import os
+import select
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .utils import MOUNTINFO_PATH, REMOVABLE_MOUNT_ROOTS, read_mountinfo
+
+logger = logging.getLogger(__name__)
+
+# mountinfo を poll で監視できない場合（通常のファイルや Linux 以外）に変更を確認する間隔（秒）
+FALLBACK_POLL_INTERVAL = 1.0
+
+class MountMonitor:
+    """DCIM フォルダを持つボリュームのマウント・アンマウントを検出してコールバックを呼ぶ
+
+    Linux では /proc/self/mountinfo を poll(2) で監視する。マウントテーブルが変わると
+    カーネルが POLLPRI を通知するため、SD カードがマウントされてから数ミリ秒で
+    コールバックを呼べる。決まったパスを定期的に調べる find_sd_card() と違い、
+    マウント先の名前（/media/$USER/disk など）にも依存しない。
+
+    mountinfo_path が /proc 以外（テスト用の偽の mountinfo など）の場合は、
+    interval 秒毎にファイルの mtime を確認して変更を検出する。
+
+    コールバックは監視スレッドから呼ばれる。start() の時点でマウント済みのカードは通知しない。
+
+    Args:
+        mountinfo_path: 監視する mountinfo
+        roots: リムーバブルメディアのマウント先（この下のマウントポイントだけを対象にする）
+        interval: poll を使えない場合に変更を確認する間隔（秒）
+    """
+
+    def __init__(
+        self,
+        mountinfo_path: str = MOUNTINFO_PATH,
+        roots: Sequence[str] = REMOVABLE_MOUNT_ROOTS,
+        interval: float = FALLBACK_POLL_INTERVAL,
+    ):
+        self.mountinfo_path = mountinfo_path
+        self.roots = tuple(os.path.join(root, '') for root in roots)
+        self.interval = interval
+        self._on_mount: List[Callable[[Path], None]] = []
+        self._on_unmount: List[Callable[[Path], None]] = []
+        self._lock = threading.Lock()
+        # マウントポイント → マウント元デバイス
+        self._cards: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # poll で監視する mountinfo と、stop() で poll を起こすためのパイプ
+        self._mountinfo = None
+        self._wake: Optional[tuple] = None
+
+    def register(
+        self,
+        on_mount: Callable[[Path], None],
+        on_unmount: Optional[Callable[[Path], None]] = None,
+    ) -> None:
+        """カードのマウント（とアンマウント）時に呼ぶ関数を登録する
+
+        Args:
+            on_mount: マウントされたカードのマウントポイントを受け取る関数
+            on_unmount: 取り外されたカードのマウントポイントを受け取る関数
+        """
+        with self._lock:
+            self._on_mount.append(on_mount)
+            if on_unmount is not None:
+                self._on_unmount.append(on_unmount)
+
+    def cards(self) -> List[Path]:
+        """現在マウントされているカード（マウントポイントの名前順）"""
+        with self._lock:
+            return [Path(mp) for mp in sorted(self._cards)]
+
+    def start(self) -> "MountMonitor":
+        # 変更の待ち受けを用意してから現在のカードを読み、その間のマウントも取りこぼさない
+        if hasattr(select, 'poll') and os.path.realpath(self.mountinfo_path).startswith('/proc/'):
+            wait = self._poll_waiter()
+        else:
+            wait = self._stat_waiter()
+        with self._lock:
+            self._cards = self._scan()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(wait,), name="mount-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._wake is not None:
+            try:
+                os.write(self._wake[1], b'\0')
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def check(self) -> None:
+        """mountinfo を読み直し、前回からマウント・アンマウントされたカードを通知する"""
+        cards = self._scan()
+        with self._lock:
+            previous = self._cards
+            self._cards = cards
+            on_mount = list(self._on_mount)
+            on_unmount = list(self._on_unmount)
+        # 同じマウントポイントでもデバイスが変わっていれば別のカードとみなす
+        removed = [mp for mp, device in sorted(previous.items()) if cards.get(mp) != device]
+        added = [mp for mp, device in sorted(cards.items()) if previous.get(mp) != device]
+        for mp in removed:
+            logger.info(f"SDカードが取り外されました: {mp}")
+            self._notify(on_unmount, Path(mp))
+        for mp in added:
+            logger.info(f"SDカードがマウントされました: {mp} ({cards[mp]})")
+            self._notify(on_mount, Path(mp))
+
+    def _notify(self, callbacks: List[Callable[[Path], None]], mount_point: Path) -> None:
+        for callback in callbacks:
+            try:
+                callback(mount_point)
+            except Exception as e:
+                logger.error(f"マウントの通知先でエラーが発生: {mount_point} {e}")
+
+    def _scan(self) -> Dict[str, str]:
+        """DCIM フォルダを持つリムーバブルメディアのマウントポイント → デバイス"""
+        mounts = read_mountinfo(self.mountinfo_path)
+        return {
+            mp: device
+            for mp, device in mounts.items()
+            if mp.startswith(self.roots) and os.path.isdir(os.path.join(mp, 'DCIM'))
+        }
+
+    def _run(self, wait: Callable[[], None]) -> None:
+        try:
+            while True:
+                wait()
+                if self._stop.is_set():
+                    return
+                self.check()
+        except Exception as e:
+            logger.error(f"マウントの監視が停止しました: {e}")
+        finally:
+            self._close()
+
+    def _poll_waiter(self) -> Callable[[], None]:
+        """マウントテーブルの変更を poll(2) で待つ関数を返す"""
+        self._mountinfo = open(self.mountinfo_path, 'rb')
+        self._wake = os.pipe()
+        poller = select.poll()
+        poller.register(self._mountinfo, select.POLLPRI | select.POLLERR)
+        poller.register(self._wake[0], select.POLLIN)
+        logger.info(f"マウントの監視を開始: {self.mountinfo_path}")
+        return poller.poll
+
+    def _stat_waiter(self) -> Callable[[], None]:
+        """mountinfo の mtime が変わるまで interval 秒毎に確認する関数を返す（poll を使えない場合）"""
+        def _signature():
+            try:
+                st = os.stat(self.mountinfo_path)
+                return st.st_ino, st.st_mtime_ns, st.st_size
+            except OSError:
+                return None
+
+        last = [_signature()]
+
+        def _wait():
+            while not self._stop.wait(self.interval):
+                current = _signature()
+                if current != last[0]:
+                    last[0] = current
+                    return
+
+        logger.info(f"マウントの監視を開始: {self.mountinfo_path}（{self.interval} 秒毎に確認）")
+        return _wait
+
+    def _close(self) -> None:
+        if self._mountinfo is not None:
+            self._mountinfo.close()
+            self._mountinfo = None
+        if self._wake is not None:
+            wake, self._wake = self._wake, None
+            for fd in wake:
+                os.close(fd)
@@ -0,0 +1,111 @@
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# mediaItems:batchCreate で一度に作成できる最大数
+MAX_BATCH_SIZE = 50
+# バッチが埋まらなくても batchCreate を送るまでの待ち時間（秒）
+BATCH_FLUSH_INTERVAL = 10.0
+
+_CLOSE = object()
+
+class BatchCreateStage:
+    """アップロード結果を受け取り、随時 mediaItems:batchCreate を送るステージ
+
+    トークンが batch_size 件たまるか、最初のトークンを受け取ってから
+    flush_interval 秒経過した時点でバッチ作成を行う。バッチ作成は専用スレッドで
+    行うため、その間も後続ファイルのアップロードは継続する。
+
+    Args:
+        create_batch: (トークン, ファイル名) のリストを受け取り
+            {"success": [...], "failed": [...]} を返す関数（結果を記録しない場合は None）
+        on_batch: バッチ作成後に (アップロード結果のリスト, create_batch の戻り値) で呼ばれる
+        batch_size: 1 バッチの最大件数
+        flush_interval: バッチが埋まらない場合の送信間隔（秒）
+        priority: アップロード結果から優先度（小さいほど先）を返す関数。指定すると
+            たまっているトークンのうち優先度の高いものから順にバッチ作成する
+    """
+
+    def __init__(
+        self,
+        create_batch: Callable[[List[tuple]], Optional[Dict[str, List[str]]]],
+        on_batch: Callable[[List[dict], Optional[Dict[str, List[str]]]], None],
+        batch_size: int = MAX_BATCH_SIZE,
+        flush_interval: float = BATCH_FLUSH_INTERVAL,
+        priority: Optional[Callable[[dict], int]] = None,
+    ):
+        self._create_batch = create_batch
+        self._on_batch = on_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._priority = priority
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batch-create", daemon=True)
+
+    def start(self) -> "BatchCreateStage":
+        self._thread.start()
+        return self
+
+    def put(self, result: dict) -> None:
+        """トークン取得に成功したアップロード結果を投入"""
+        self._queue.put(result)
+
+    def close(self) -> None:
+        """残りのトークンをバッチ作成し、ステージを終了するまで待機"""
+        self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --------------------------------------------------
+    # 内部処理
+    # --------------------------------------------------
+
+    def _run(self):
+        pending: List[dict] = []
+        deadline: Optional[float] = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _CLOSE:
+                if pending:
+                    self._flush(pending)
+                return
+
+            if item is not None:
+                pending.append(item)
+                if self._priority is not None:
+                    pending.sort(key=self._priority)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if len(pending) >= self.batch_size or (deadline is not None and time.monotonic() >= deadline):
+                self._flush(pending[: self.batch_size])
+                pending = pending[self.batch_size :]
+                deadline = time.monotonic() + self.flush_interval if pending else None
+
+    def _flush(self, batch: List[dict]):
+        token_pairs = [(r["token"], Path(r["file"]).name) for r in batch]
+        logger.debug(f"バッチ作成を送信: {len(batch)} 件")
+        try:
+            result = self._create_batch(token_pairs)
+        except Exception as e:
+            logger.error(f"バッチ作成中にエラーが発生: {e}")
+            result = {"success": [], "failed": [t for t, _ in token_pairs]}
+        try:
+            self._on_batch(batch, result)
+        except Exception as e:
+            logger.error(f"バッチ作成結果の処理中にエラーが発生: {e}")
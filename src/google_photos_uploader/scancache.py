@@ -0,0 +1,163 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Union
+
+from . import db
+from .utils import SCAN_WORKERS, DirListing, MediaEntry, get_volume_id, scan_media_files
+
+logger = logging.getLogger(__name__)
+
+# FAT / exFAT の mtime の分解能（2 秒）。これより新しい mtime のフォルダは、
+# 走査の直後に同じ mtime のままファイルが追加されうるため記録しない
+RACY_WINDOW_NS = 2 * 1_000_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_dirs (
+    volume TEXT NOT NULL,
+    rel_dir TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    subdirs TEXT NOT NULL,
+    files TEXT NOT NULL,
+    PRIMARY KEY (volume, rel_dir)
+);
+"""
+
+class ScanResult(NamedTuple):
+    """ScanCache.scan の結果"""
+    # 見つかったファイル
+    entries: List[MediaEntry]
+    # サイズと mtime が記録の値のファイル（今回は stat していない）
+    cached: Set[str]
+    # 今回の走査で見つかったフォルダ → DirListing
+    listings: Dict[str, DirListing]
+    volume: str
+    mount_point: str
+
+class ScanCache:
+    """ボリューム毎にフォルダの mtime と中身を記録する走査キャッシュ
+
+    同じ SD カードを挿し直した場合、フォルダは毎回読むが、mtime とファイル名の一覧が
+    記録と一致するフォルダはファイルを stat せずに記録済みのサイズと mtime を使う。
+    FAT / exFAT ではカメラや Windows がファイルを追加してもフォルダの mtime を
+    更新しない場合があるため、mtime だけでは判定しない。
+
+    名前の変わらないファイルをその場で書き換えた場合は記録のサイズと mtime が古くなる。
+    そのようなファイルは ScanResult.cached に含まれるので、アップロードや重複判定で
+    使う場合は stat し直すこと。
+
+    ボリュームはファイルシステムの UUID で識別するため、マウント先が変わっても記録を使える。
+
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        self._conn = db.connect(path or db.DB_PATH)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def scan(self, directory: Union[str, Path], workers: int = SCAN_WORKERS) -> ScanResult:
+        """directory 以下のメディアファイルを、変更の無いフォルダは記録から求める
+
+        Args:
+            directory: 検索対象のディレクトリ（DCIM フォルダ）
+            workers: 並行して読み込むスレッド数
+
+        Returns:
+            ScanResult: 走査結果
+        """
+        root = os.path.abspath(directory)
+        volume, mount_point = get_volume_id(Path(root))
+        mount_point = str(mount_point)
+        root_rel = os.path.relpath(root, mount_point)
+
+        # 記録済みのフォルダ（root 以下）を読み込む
+        loaded: Dict[str, DirListing] = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rel_dir, mtime_ns, subdirs, files FROM scan_dirs WHERE volume = ?", (volume,)
+            ).fetchall()
+        for row in rows:
+            rel_dir = row['rel_dir']
+            if rel_dir != root_rel and not rel_dir.startswith(root_rel + os.sep) and root_rel != os.curdir:
+                continue
+            path = os.path.normpath(os.path.join(mount_point, rel_dir))
+            prefix = path + os.sep
+            files = [MediaEntry(prefix + name, size, mtime_ns) for name, size, mtime_ns in json.loads(row['files'])]
+            loaded[path] = DirListing(row['mtime_ns'], [prefix + name for name in json.loads(row['subdirs'])], files)
+
+        listings = dict(loaded)
+        entries = scan_media_files(Path(root), workers=workers, cache=listings)
+
+        # root からたどれるフォルダだけが現存する。それ以外の記録は削除する
+        found: Dict[str, DirListing] = {}
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            listing = listings.get(path)
+            if listing is None or path in found:
+                continue
+            found[path] = listing
+            stack.extend(listing.subdirs)
+
+        changed = {path: listing for path, listing in found.items() if loaded.get(path) is not listing}
+        removed = [path for path in loaded if path not in found]
+        racy = time.time_ns() - RACY_WINDOW_NS
+        self._write(volume, mount_point, {p: l for p, l in changed.items() if l.mtime_ns < racy}, removed)
+        if changed or removed:
+            logger.debug(
+                f"走査キャッシュ: {volume} フォルダ {len(found)} 件中 {len(changed)} 件を読み直し、{len(removed)} 件を削除"
+            )
+
+        cached = {entry.path for path, listing in found.items() if path not in changed for entry in listing.files}
+        return ScanResult(entries, cached, found, volume, mount_point)
+
+    def _write(self, volume: str, mount_point: str, changed: Dict[str, DirListing], removed: List[str]) -> None:
+        if not changed and not removed:
+            return
+        rows = [
+            (
+                volume,
+                os.path.relpath(path, mount_point),
+                listing.mtime_ns,
+                json.dumps([os.path.basename(d) for d in listing.subdirs], ensure_ascii=False),
+                json.dumps(
+                    [[os.path.basename(e.path), e.size, e.mtime_ns] for e in listing.files], ensure_ascii=False
+                ),
+            )
+            for path, listing in changed.items()
+        ]
+        with self._lock, db.transaction(self._conn):
+            self._conn.executemany(
+                "DELETE FROM scan_dirs WHERE volume = ? AND rel_dir = ?",
+                [(volume, os.path.relpath(path, mount_point)) for path in removed],
+            )
+            self._conn.executemany(
+                """
+                INSERT INTO scan_dirs (volume, rel_dir, mtime_ns, subdirs, files)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(volume, rel_dir) DO UPDATE SET
+                    mtime_ns = excluded.mtime_ns, subdirs = excluded.subdirs, files = excluded.files
+                """,
+                rows,
+            )
+
+_cache: Optional[ScanCache] = None
+_cache_lock = threading.Lock()
+
+def get_scan_cache() -> ScanCache:
+    """プロセス共有の走査キャッシュを取得"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ScanCache()
+        return _cache
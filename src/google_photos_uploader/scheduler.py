@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# このサイズ（バイト）以上のファイルは large レーンで送信する
+SMALL_FILE_THRESHOLD = 20 * 1024 * 1024
+# large レーンで同時に送信するファイル数の上限
+LARGE_LANE_CONCURRENCY = 2
+# 動画レーンで同時に送信するファイル数の上限
+VIDEO_LANE_CONCURRENCY = 2
+# 動画として扱う拡張子
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.wmv', '.mkv'}
+# 複数の SD カードを同時に取り込むとき、1 枚のカードから同時に読み出すファイル数の上限
+DEVICE_READ_CONCURRENCY = 3
+
+class UploadJob(NamedTuple):
+    """スケジューラーが払い出すアップロード 1 件"""
+    path: str
+    size: int
+    idx: int
+    lane: str
+    device: str = ""
+
+class Lane:
+    """スケジューラーのレーン設定
+
+    Args:
+        name: レーン名
+        cap: 同時に払い出す件数の上限。None の場合は無制限
+        reserved: 待ちがある限り、他のレーンより優先して確保する同時実行数
+        preemptible: True の場合、優先度の高いレーンに待ちができると reserved を超えて
+            送信中のファイルを一時停止させる（UploadScheduler.preempt_requested / pause）
+    """
+
+    def __init__(self, name: str, cap: Optional[int] = None, reserved: int = 0, preemptible: bool = False):
+        self.name = name
+        self.cap = cap
+        self.reserved = reserved
+        self.preemptible = preemptible
+        self.in_flight = 0
+        self.paused = 0
+        # デバイス → (サイズ, 投入順, ジョブ) のヒープ
+        self.heaps: Dict[str, List[tuple]] = {}
+
+    def has_capacity(self) -> bool:
+        return self.cap is None or self.in_flight < self.cap
+
+    def waiting(self) -> int:
+        return sum(len(heap) for heap in self.heaps.values())
+
+def size_lanes(threshold: int = SMALL_FILE_THRESHOLD, large_concurrency: int = LARGE_LANE_CONCURRENCY):
+    """サイズで small / large の 2 レーンに分ける設定を返す
+
+    Returns:
+        tuple[list[Lane], Callable[[str, int], str]]: (レーン一覧, 振り分け関数)
+    """
+    lanes = [
+        Lane("small"),
+        # 大きなファイルを 1 本は常に流して回線を埋めつつ、残りのワーカーで小さいファイルを捌く
+        Lane("large", cap=large_concurrency, reserved=1),
+    ]
+    return lanes, lambda path, size: "large" if size >= threshold else "small"
+
+def media_lanes(
+    threshold: int = SMALL_FILE_THRESHOLD,
+    large_concurrency: int = LARGE_LANE_CONCURRENCY,
+    video_concurrency: int = VIDEO_LANE_CONCURRENCY,
+):
+    """写真を優先し、動画をバックグラウンドで送るレーンの設定を返す
+
+    写真は size_lanes と同じく small / large に分け、動画は最も優先度の低い
+    video レーンに回す。video レーンは写真の待ちがあっても 1 本だけは流し、
+    写真の待ちが無いときは上限まで広がる。その状態で写真が追加されると、
+    1 本を超えて送信中の動画は一時停止して写真に並列数を譲る。
+
+    Returns:
+        tuple[list[Lane], Callable[[str, int], str]]: (レーン一覧, 振り分け関数)
+    """
+    lanes, by_size = size_lanes(threshold, large_concurrency)
+    lanes.append(Lane("video", cap=video_concurrency, reserved=1, preemptible=True))
+
+    def classify(path: str, size: int) -> str:
+        if os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS:
+            return "video"
+        return by_size(path, size)
+
+    return lanes, classify
+
+class UploadScheduler:
+    """ファイルをレーンに振り分け、各レーン内では小さいものから順に払い出すスケジューラー
+
+    払い出しの規則:
+        1. reserved に満たないレーンに待ちがあれば、そのレーンを優先する
+        2. それ以外はレーンの並び順（優先度順）に、上限に空きがあり待ちのあるレーンから選ぶ
+        3. 一時停止中のファイルがあるレーンからは、それが再開するまで新しいファイルを払い出さない
+        4. レーン内では読み出し上限に空きのあるデバイスのうち、処理中の件数が最も少ない
+           デバイスのファイルを選ぶ（同数なら小さいファイル）。遅いカードに読み出しが
+           集中して、速いカードの待ちが止まることを防ぐ
+
+    Args:
+        lanes: 優先度順のレーン一覧
+        classify: (パス, サイズ) からレーン名を返す関数
+        device_of: パスから読み出し元デバイス（SD カード）を返す関数。None の場合は 1 台とみなす
+        device_limit: デバイス毎の同時読み出し数の上限。int なら全デバイス共通、
+            dict ならデバイス毎の上限（未指定のデバイスは無制限）。None の場合は無制限
+    """
+
+    def __init__(
+        self,
+        lanes: Sequence[Lane],
+        classify: Callable[[str, int], str],
+        device_of: Optional[Callable[[str], str]] = None,
+        device_limit: Union[int, Dict[str, int], None] = None,
+    ):
+        self._lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes}
+        self._order = [lane.name for lane in lanes]
+        self._classify = classify
+        self._device_of = device_of
+        self._device_limit = device_limit
+        self._device_in_flight: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._closed = False
+
+    def submit(self, path: str, idx: int, size: Optional[int] = None) -> UploadJob:
+        """ファイルを投入
+
+        Args:
+            path: ファイルパス
+            idx: 進捗表示用の通し番号
+            size: ファイルサイズ。None の場合は stat して求める
+        """
+        if size is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+        device = self._device_of(path) if self._device_of is not None else ""
+        job = UploadJob(path, size, idx, self._classify(path, size), device)
+        with self._cond:
+            heap = self._lanes[job.lane].heaps.setdefault(device, [])
+            heapq.heappush(heap, (job.size, next(self._seq), job))
+            # get() で待つワーカーと pause() で待つファイルの両方に知らせる
+            self._cond.notify_all()
+        return job
+
+    def close(self) -> None:
+        """これ以上ファイルを投入しないことを通知"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self) -> Optional[UploadJob]:
+        """次に送信するファイルを取得
+
+        払い出せるファイルが無い間は待機し、close() 後にすべて払い出し済みなら None を返す。
+        """
+        with self._cond:
+            while True:
+                picked = self._pick()
+                if picked is not None:
+                    lane, heap = picked
+                    _, _, job = heapq.heappop(heap)
+                    lane.in_flight += 1
+                    self._device_in_flight[job.device] = self._device_in_flight.get(job.device, 0) + 1
+                    # 待ちが減ったことを一時停止中のファイルに知らせる
+                    self._cond.notify_all()
+                    return job
+                if self._closed and not any(l.waiting() for l in self._lanes.values()):
+                    return None
+                self._cond.wait()
+
+    def abort(self) -> None:
+        """待ちのファイルをすべて破棄する（中断時）。一時停止中のファイルは再開させる"""
+        with self._cond:
+            for lane in self._lanes.values():
+                lane.heaps.clear()
+            self._closed = True
+            self._cond.notify_all()
+
+    def preempt_requested(self, job: UploadJob) -> bool:
+        """job を一時停止して、優先度の高いレーンに並列数を譲るべきか
+
+        レーンの reserved 分は譲らずに流し続ける。
+        """
+        with self._cond:
+            lane = self._lanes[job.lane]
+            return lane.preemptible and lane.in_flight > lane.reserved and self._higher_waiting(job.lane)
+
+    def pause(self, job: UploadJob) -> None:
+        """払い出したファイルを一時停止し、優先度の高いレーンの待ちが無くなるか、
+        レーンの送信数が reserved を下回るまで待つ
+
+        停止中はレーンとデバイスの同時実行数を空けておき、再開できるようになると戻る。
+        呼び出し側は停止中、アップロードの並列数（AIMDController のスロット）も手放すこと。
+        """
+        lane = self._lanes[job.lane]
+        with self._cond:
+            lane.in_flight -= 1
+            self._device_in_flight[job.device] -= 1
+            lane.paused += 1
+            self._cond.notify_all()
+            while (
+                (lane.in_flight >= lane.reserved and self._higher_waiting(job.lane))
+                or not lane.has_capacity()
+                or not self._device_has_capacity(job.device)
+            ):
+                self._cond.wait()
+            lane.paused -= 1
+            lane.in_flight += 1
+            self._device_in_flight[job.device] += 1
+            self._cond.notify_all()
+
+    def done(self, job: UploadJob) -> None:
+        """払い出したファイルの処理完了を通知"""
+        with self._cond:
+            self._lanes[job.lane].in_flight -= 1
+            self._device_in_flight[job.device] -= 1
+            self._cond.notify_all()
+
+    def pending(self, lane: Optional[str] = None) -> int:
+        """待ちファイル数（lane 指定時はそのレーンのみ）"""
+        with self._cond:
+            if lane is not None:
+                return self._lanes[lane].waiting()
+            return sum(l.waiting() for l in self._lanes.values())
+
+    def _device_has_capacity(self, device: str) -> bool:
+        limit = self._device_limit
+        if isinstance(limit, dict):
+            limit = limit.get(device)
+        return limit is None or self._device_in_flight.get(device, 0) < limit
+
+    def _pick_heap(self, lane: Lane) -> Optional[List[tuple]]:
+        """レーン内で次に払い出すデバイスのヒープ"""
+        best = None
+        for device, heap in lane.heaps.items():
+            if not heap or not self._device_has_capacity(device):
+                continue
+            rank = (self._device_in_flight.get(device, 0), heap[0][0], heap[0][1])
+            if best is None or rank < best[0]:
+                best = (rank, heap)
+        return best[1] if best else None
+
+    def _higher_waiting(self, name: str) -> bool:
+        """name より優先度の高いレーンに払い出せるファイルが待っているか"""
+        for higher in self._order[: self._order.index(name)]:
+            lane = self._lanes[higher]
+            if lane.has_capacity() and self._pick_heap(lane) is not None:
+                return True
+        return False
+
+    def _pick(self) -> Optional[tuple]:
+        lanes = [self._lanes[name] for name in self._order if not self._lanes[name].paused]
+        for lane in lanes:
+            if lane.in_flight < lane.reserved and lane.has_capacity():
+                heap = self._pick_heap(lane)
+                if heap is not None:
+                    return lane, heap
+        for lane in lanes:
+            if lane.has_capacity():
+                heap = self._pick_heap(lane)
+                if heap is not None:
+                    return lane, heap
+        return None
@@ -1,20 +1,36 @@
 import json
 import logging
 import mimetypes
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, List, Optional, Union
 
 import requests
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 
 from ..auth import SCOPES
+from .body import MappedFile
+from .ratelimit import MAX_ATTEMPTS, RETRYABLE_STATUSES, QuotaExceededError, get_rate_limiter, retry_delay
+from .session import get_session
 
 logger = logging.getLogger(__name__)
 
 # Google Photos APIのエンドポイント
 API_BASE_URL = 'https://photoslibrary.googleapis.com/v1'
 
+# このサイズ（バイト）以上のファイルはレジューム可能アップロードで送信する
+RESUMABLE_THRESHOLD = 32 * 1024 * 1024
+# レジューム可能アップロードで 1 リクエストあたりに送信するチャンクサイズ
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+# チャンク送信に失敗した際に再開を試みる最大回数
+RESUMABLE_MAX_RESUMES = 5
+
+# アルバム名 → アルバムID のキャッシュ
+ALBUM_CACHE_FILE = Path.home() / '.google_photos_uploader' / 'album_cache.json'
+# アルバム一覧取得時の 1 ページあたりの件数（API の上限は 50）
+ALBUM_PAGE_SIZE = 50
+
 # --------------------------------------------------
 # 内部ヘルパー: アクセストークンの自動リフレッシュ
 # --------------------------------------------------
@@ -28,11 +44,62 @@ def _ensure_valid_credentials(creds: Credentials) -> None:
     try:
         if creds and (not creds.valid or creds.expired):
             if creds.refresh_token:
-                creds.refresh(Request())
+                creds.refresh(Request(session=get_session()))
     except Exception as e:
         # リフレッシュ失敗時でも後続で 401 を検知できるようにログのみ
         logger.error(f"アクセストークンのリフレッシュに失敗: {e}")
 
+def _request(endpoint: str, method: str, url: str, creds: Credentials, **kwargs) -> requests.Response:
+    """レート制限と再試行を適用して API リクエストを送信
+
+    送信前にエンドポイント種別ごとのトークンバケットと日次クォータを消費する。
+    429 / 5xx 応答は Retry-After（無ければジッター付き指数バックオフ）に従って
+    同じ種別のリクエスト全体を減速させてから再試行し、401 応答は
+    アクセストークンを 1 度だけリフレッシュして再送する。
+
+    Args:
+        endpoint: エンドポイント種別 ('uploads', 'batchCreate', 'albums' など)
+        method: HTTP メソッド
+        url: リクエスト URL
+        creds: 認証情報
+        **kwargs: requests に渡す引数
+
+    Returns:
+        requests.Response: 最後に受け取った応答
+
+    Raises:
+        QuotaExceededError: 日次クォータを使い切っている場合
+    """
+    limiter = get_rate_limiter()
+    refreshed = False
+    response = None
+    data = kwargs.get('data')
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.acquire(endpoint)
+        if hasattr(data, 'seek'):
+            # 再送時は本文を先頭から送り直す
+            data.seek(0)
+        response = get_session().request(method, url, **kwargs)
+
+        if response.status_code == 401 and not refreshed and creds and creds.refresh_token:
+            # アクセストークンが失効している可能性があるため 1 度だけリフレッシュ
+            refreshed = True
+            logger.warning(f"401 応答のためアクセストークンをリフレッシュします: {endpoint}")
+            creds.refresh(Request(session=get_session()))
+            kwargs.setdefault('headers', {})['Authorization'] = f'Bearer {creds.token}'
+            continue
+
+        if response.status_code not in RETRYABLE_STATUSES or attempt == MAX_ATTEMPTS - 1:
+            return response
+
+        delay = retry_delay(response, attempt)
+        logger.warning(
+            f"{response.status_code} 応答のため {delay:.1f} 秒後に再試行します: "
+            f"{endpoint} ({attempt + 1}/{MAX_ATTEMPTS})"
+        )
+        limiter.pause(endpoint, delay)
+    return response
+
 def get_mime_type(file_path: Union[str, Path]) -> str:
     """ファイルのMIMEタイプを取得
 
@@ -45,17 +112,30 @@ def get_mime_type(file_path: Union[str, Path]) -> str:
     mime_type, _ = mimetypes.guess_type(str(file_path))
     return mime_type or 'application/octet-stream'
 
-def upload_media(file_path: Union[str, Path], creds: Credentials, token_only: bool = False) -> Optional[Union[bool, str]]:
+def upload_media(
+    file_path: Union[str, Path],
+    creds: Credentials,
+    token_only: bool = False,
+    resumable_threshold: Optional[int] = None,
+    on_chunk: Optional[Callable[[], None]] = None,
+) -> Optional[Union[bool, str]]:
     """メディアファイルをアップロード
 
     Args:
         file_path: メディアファイルのパス
         creds: 認証情報
         token_only: Trueの場合、アップロードトークンのみを返す
+        resumable_threshold: このサイズ（バイト）以上のファイルはレジューム可能
+            アップロードで送信する。None の場合は RESUMABLE_THRESHOLD を使用
+        on_chunk: レジューム可能アップロードでチャンクを 1 つ送り終える毎に呼ばれる関数。
+            呼び出し中は次のチャンクを送らないため、優先度の高い送信に回線を譲る場合に使う
 
     Returns:
         token_only=Falseの場合はアップロード成功の有無(bool)
         token_only=Trueの場合はアップロードトークン(str)
+
+    Raises:
+        QuotaExceededError: 日次クォータを使い切っている場合
     """
     file_path = Path(file_path)
     
@@ -69,40 +149,216 @@ def upload_media(file_path: Union[str, Path], creds: Credentials, token_only: bo
 
         # ファイルのMIMEタイプを推定
         mime_type = get_mime_type(file_path)
-        
-        # アップロードリクエストのヘッダーを設定
-        headers = {
-            'Authorization': f'Bearer {creds.token}',
-            'Content-Type': 'application/octet-stream',
-            'X-Goog-Upload-Content-Type': mime_type,
-            'X-Goog-Upload-Protocol': 'raw',
-        }
-        
-        # ファイルをバイナリモードで開く
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-        
-        # アップロードリクエスト
-        logger.info(f"ファイルバイトをアップロード中: {file_path}")
-        response = requests.post(API_BASE_URL + '/uploads', headers=headers, data=file_data)
-        
-        if response.status_code == 200:
-            upload_token = response.text
-            logger.info(f"アップロードトークン取得: {upload_token[:10]}...")
-            
-            if token_only:
-                return upload_token
-            
-            # メディアアイテムの作成
-            return create_media_item(upload_token, file_path.name, creds)
+        file_size = file_path.stat().st_size
+
+        if resumable_threshold is None:
+            resumable_threshold = RESUMABLE_THRESHOLD
+
+        # ---------- B. サイズに応じてプロトコルを選択 ----------
+        if file_size >= resumable_threshold:
+            logger.info(f"ファイルバイトをレジューム可能アップロードで送信中: {file_path} ({file_size} bytes)")
+            upload_token = _upload_resumable(file_path, creds, mime_type, file_size, on_chunk)
         else:
-            logger.error(f"アップロード失敗: {response.status_code} - {response.text}")
+            logger.info(f"ファイルバイトをアップロード中: {file_path}")
+            upload_token = _upload_raw(file_path, creds, mime_type)
+
+        if not upload_token:
             return None if token_only else False
+
+        logger.info(f"アップロードトークン取得: {upload_token[:10]}...")
+
+        if token_only:
+            return upload_token
+
+        # メディアアイテムの作成
+        return create_media_item(upload_token, file_path.name, creds)
     
+    except QuotaExceededError:
+        # クォータ切れはファイル単位の失敗ではないため、呼び出し元で実行ごと止める
+        raise
     except Exception as e:
         logger.error(f"アップロード中にエラーが発生: {e}")
         return None if token_only else False
 
+def _upload_raw(file_path: Path, creds: Credentials, mime_type: str) -> Optional[str]:
+    """ファイル全体を 1 リクエストで送信する（raw プロトコル）
+
+    Args:
+        file_path: メディアファイルのパス
+        creds: 認証情報
+        mime_type: ファイルのMIMEタイプ
+
+    Returns:
+        Optional[str]: アップロードトークン。失敗した場合はNone
+    """
+    # アップロードリクエストのヘッダーを設定
+    headers = {
+        'Authorization': f'Bearer {creds.token}',
+        'Content-Type': 'application/octet-stream',
+        'X-Goog-Upload-Content-Type': mime_type,
+        'X-Goog-Upload-Protocol': 'raw',
+    }
+
+    # ファイル全体を bytes に読み込まず、メモリマップから少しずつ送信する
+    with MappedFile(file_path) as mapped:
+        response = _request('uploads', 'POST', API_BASE_URL + '/uploads', creds, headers=headers, data=mapped.slice())
+
+    if response.status_code == 200:
+        return response.text
+
+    logger.error(f"アップロード失敗: {response.status_code} - {response.text}")
+    return None
+
+# --------------------------------------------------
+# レジューム可能アップロード
+# start → upload (チャンク) … → upload, finalize の順に送信し、
+# 途中で失敗した場合は query でサーバーが受信済みのオフセットを確認して再開する
+# --------------------------------------------------
+
+def _start_resumable_session(file_path: Path, creds: Credentials, mime_type: str, file_size: int) -> Optional[tuple[str, int]]:
+    """レジューム可能アップロードのセッションを開始
+
+    Args:
+        file_path: メディアファイルのパス
+        creds: 認証情報
+        mime_type: ファイルのMIMEタイプ
+        file_size: ファイルサイズ（バイト）
+
+    Returns:
+        Optional[tuple[str, int]]: (アップロードURL, チャンク粒度)。失敗した場合はNone
+    """
+    headers = {
+        'Authorization': f'Bearer {creds.token}',
+        'Content-Length': '0',
+        'X-Goog-Upload-Command': 'start',
+        'X-Goog-Upload-Content-Type': mime_type,
+        'X-Goog-Upload-Protocol': 'resumable',
+        'X-Goog-Upload-Raw-Size': str(file_size),
+    }
+    response = _request('uploads', 'POST', API_BASE_URL + '/uploads', creds, headers=headers)
+
+    upload_url = response.headers.get('X-Goog-Upload-URL')
+    if response.status_code != 200 or not upload_url:
+        logger.error(f"アップロードセッションの開始に失敗: {file_path} {response.status_code} - {response.text}")
+        return None
+
+    try:
+        granularity = int(response.headers.get('X-Goog-Upload-Chunk-Granularity', 0))
+    except ValueError:
+        granularity = 0
+    return upload_url, granularity
+
+def _query_resumable_offset(upload_url: str, creds: Credentials) -> Optional[tuple[str, int, str]]:
+    """サーバーが受信済みのバイト数を問い合わせる
+
+    Args:
+        upload_url: セッション開始時に返されたアップロードURL
+        creds: 認証情報
+
+    Returns:
+        Optional[tuple[str, int, str]]: (ステータス, 受信済みバイト数, レスポンス本文)。
+            問い合わせに失敗した場合はNone
+    """
+    headers = {
+        'Authorization': f'Bearer {creds.token}',
+        'Content-Length': '0',
+        'X-Goog-Upload-Command': 'query',
+    }
+    try:
+        response = _request('uploads', 'POST', upload_url, creds, headers=headers)
+    except requests.RequestException as e:
+        logger.warning(f"アップロード状態の問い合わせに失敗: {e}")
+        return None
+
+    if response.status_code != 200:
+        logger.warning(f"アップロード状態の問い合わせに失敗: {response.status_code} - {response.text}")
+        return None
+
+    status = response.headers.get('X-Goog-Upload-Status', '')
+    try:
+        received = int(response.headers.get('X-Goog-Upload-Size-Received', 0))
+    except ValueError:
+        received = 0
+    return status, received, response.text
+
+def _upload_resumable(
+    file_path: Path,
+    creds: Credentials,
+    mime_type: str,
+    file_size: int,
+    on_chunk: Optional[Callable[[], None]] = None,
+) -> Optional[str]:
+    """ファイルをチャンク単位でストリーミング送信する（resumable プロトコル）
+
+    各チャンクはメモリマップ上の範囲として送信するため、チャンク全体を
+    bytes にコピーしない。送信に失敗した場合はサーバーが報告する
+    オフセットから再開する。
+
+    Args:
+        file_path: メディアファイルのパス
+        creds: 認証情報
+        mime_type: ファイルのMIMEタイプ
+        file_size: ファイルサイズ（バイト）
+        on_chunk: 最後以外のチャンクを送り終える毎に呼ばれる関数
+
+    Returns:
+        Optional[str]: アップロードトークン。失敗した場合はNone
+    """
+    session = _start_resumable_session(file_path, creds, mime_type, file_size)
+    if not session:
+        return None
+    upload_url, granularity = session
+
+    # チャンクサイズはサーバー指定の粒度の倍数に揃える
+    chunk_size = RESUMABLE_CHUNK_SIZE
+    if granularity > 0:
+        chunk_size = max(granularity, chunk_size - chunk_size % granularity)
+
+    offset = 0
+    resumes = 0
+    with MappedFile(file_path) as mapped:
+        while True:
+            chunk = mapped.slice(offset, chunk_size)
+            is_last = offset + len(chunk) >= file_size
+            headers = {
+                'Authorization': f'Bearer {creds.token}',
+                'Content-Length': str(len(chunk)),
+                'X-Goog-Upload-Command': 'upload, finalize' if is_last else 'upload',
+                'X-Goog-Upload-Offset': str(offset),
+            }
+
+            try:
+                response = _request('uploads', 'POST', upload_url, creds, headers=headers, data=chunk)
+                if response.status_code == 200:
+                    if is_last:
+                        return response.text
+                    offset += len(chunk)
+                    if on_chunk is not None:
+                        on_chunk()
+                    continue
+                logger.warning(f"チャンク送信失敗: {file_path} offset={offset} {response.status_code} - {response.text}")
+            except requests.RequestException as e:
+                logger.warning(f"チャンク送信中にエラーが発生: {file_path} offset={offset} {e}")
+
+            # ---------- 失敗時: 受信済みオフセットを問い合わせて再開 ----------
+            resumes += 1
+            if resumes > RESUMABLE_MAX_RESUMES:
+                logger.error(f"レジューム回数の上限に達しました: {file_path}")
+                return None
+
+            state = _query_resumable_offset(upload_url, creds)
+            if state is None:
+                continue
+            status, received, body = state
+            if status == 'final':
+                # finalize 済みであれば本文にアップロードトークンが返る
+                return body or None
+            if status != 'active':
+                logger.error(f"アップロードセッションが無効になりました: {file_path} status={status}")
+                return None
+            logger.info(f"アップロードを再開: {file_path} offset={received}/{file_size}")
+            offset = received
+
 def create_media_item(upload_token: str, file_name: str, creds: Credentials, album_name: Optional[str] = None) -> bool:
     """メディアアイテムを作成
 
@@ -141,7 +397,7 @@ def create_media_item(upload_token: str, file_name: str, creds: Credentials, alb
         
         # メディアアイテム作成リクエストを送信
         logger.info(f"メディアアイテムを作成中: {file_name}")
-        response = requests.post(API_BASE_URL + '/mediaItems', headers=headers, json=request_body)
+        response = _request('batchCreate', 'POST', API_BASE_URL + '/mediaItems', creds, headers=headers, json=request_body)
         
         if response.status_code == 200:
             logger.info(f"メディアアイテム作成成功: {file_name}")
@@ -150,10 +406,70 @@ def create_media_item(upload_token: str, file_name: str, creds: Credentials, alb
             logger.error(f"メディアアイテム作成失敗: {response.status_code} - {response.text}")
             return False
     
+    except QuotaExceededError:
+        raise
     except Exception as e:
         logger.error(f"メディアアイテム作成中にエラーが発生: {e}")
         return False
 
+# --------------------------------------------------
+# アルバムID キャッシュ
+# アルバム名 → ID を ALBUM_CACHE_FILE に保存し、同じ実行中の
+# 2 回目以降のバッチではアルバム一覧の取得を行わない
+# --------------------------------------------------
+
+_album_cache: Optional[Dict[str, str]] = None
+_album_lock = threading.Lock()
+
+def _get_album_cache() -> Dict[str, str]:
+    """アルバムID キャッシュを取得（初回のみファイルから読み込む）"""
+    global _album_cache
+    if _album_cache is None:
+        _album_cache = {}
+        if ALBUM_CACHE_FILE.exists():
+            try:
+                _album_cache = dict(json.loads(ALBUM_CACHE_FILE.read_text(encoding='utf-8')))
+            except Exception as e:
+                logger.warning(f"アルバムキャッシュの読み込みに失敗: {e}")
+    return _album_cache
+
+def _save_album_cache() -> None:
+    try:
+        ALBUM_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ALBUM_CACHE_FILE.with_suffix('.json.tmp')
+        tmp.write_text(json.dumps(_get_album_cache(), ensure_ascii=False), encoding='utf-8')
+        tmp.replace(ALBUM_CACHE_FILE)
+    except Exception as e:
+        logger.warning(f"アルバムキャッシュの保存に失敗: {e}")
+
+def invalidate_album(album_name: str) -> None:
+    """キャッシュ済みのアルバムID を破棄（アルバムが削除された場合など）"""
+    with _album_lock:
+        if _get_album_cache().pop(album_name, None) is not None:
+            logger.info(f"アルバムキャッシュを破棄: {album_name}")
+            _save_album_cache()
+
+def _find_album(album_name: str, creds: Credentials, headers: Dict[str, str]) -> Optional[str]:
+    """アルバム一覧を nextPageToken で最後まで辿って同名のアルバムを探す"""
+    page_token = None
+    while True:
+        params = {'pageSize': ALBUM_PAGE_SIZE}
+        if page_token:
+            params['pageToken'] = page_token
+        response = _request('albums', 'GET', API_BASE_URL + '/albums', creds, headers=headers, params=params)
+        if response.status_code != 200:
+            logger.error(f"アルバム一覧の取得に失敗: {response.status_code} - {response.text}")
+            return None
+
+        result = response.json()
+        for album in result.get('albums', []):
+            if album.get('title') == album_name:
+                return album['id']
+
+        page_token = result.get('nextPageToken')
+        if not page_token:
+            return None
+
 def get_or_create_album(album_name: str, creds: Credentials) -> Optional[str]:
     """アルバムを取得または作成
 
@@ -164,44 +480,46 @@ def get_or_create_album(album_name: str, creds: Credentials) -> Optional[str]:
     Returns:
         Optional[str]: アルバムID。失敗した場合はNone
     """
-    try:
-        _ensure_valid_credentials(creds)
-        # 既存のアルバムを検索
-        headers = {
-            'Authorization': f'Bearer {creds.token}',
-            'Content-Type': 'application/json'
-        }
-        
-        # アルバム一覧を取得
-        response = requests.get(API_BASE_URL + '/albums', headers=headers)
-        
-        if response.status_code == 200:
-            albums = response.json().get('albums', [])
-            
-            # 同名のアルバムを探す
-            for album in albums:
-                if album['title'] == album_name:
-                    logger.info(f"既存のアルバムを使用: {album_name}")
-                    return album['id']
-        
-        # アルバムが存在しない場合は新規作成
-        create_response = requests.post(
-            API_BASE_URL + '/albums',
-            headers=headers,
-            json={'album': {'title': album_name}}
-        )
-        
-        if create_response.status_code == 200:
-            album_id = create_response.json()['id']
-            logger.info(f"新規アルバムを作成: {album_name}")
+    # 並列に呼ばれても同名のアルバムを重複作成しないようロックする
+    with _album_lock:
+        cached = _get_album_cache().get(album_name)
+        if cached:
+            return cached
+
+        try:
+            _ensure_valid_credentials(creds)
+            # 既存のアルバムを検索
+            headers = {
+                'Authorization': f'Bearer {creds.token}',
+                'Content-Type': 'application/json'
+            }
+
+            album_id = _find_album(album_name, creds, headers)
+            if album_id:
+                logger.info(f"既存のアルバムを使用: {album_name}")
+            else:
+                # アルバムが存在しない場合は新規作成
+                create_response = _request(
+                    'albums', 'POST', API_BASE_URL + '/albums', creds,
+                    headers=headers,
+                    json={'album': {'title': album_name}}
+                )
+
+                if create_response.status_code != 200:
+                    logger.error(f"アルバム作成失敗: {create_response.status_code} - {create_response.text}")
+                    return None
+                album_id = create_response.json()['id']
+                logger.info(f"新規アルバムを作成: {album_name}")
+
+            _get_album_cache()[album_name] = album_id
+            _save_album_cache()
             return album_id
-        else:
-            logger.error(f"アルバム作成失敗: {create_response.status_code} - {create_response.text}")
+
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"アルバム操作中にエラーが発生: {e}")
             return None
-    
-    except Exception as e:
-        logger.error(f"アルバム操作中にエラーが発生: {e}")
-        return None
 
 def batch_create_media_items(tokens: List[str], album_name: Optional[str], creds: Credentials) -> Dict[str, List[str]]:
     """複数のメディアアイテムをバッチで作成
@@ -212,7 +530,11 @@ def batch_create_media_items(tokens: List[str], album_name: Optional[str], creds
         creds: 認証情報
 
     Returns:
-        Dict[str, List[str]]: 成功と失敗したトークンのリスト
+        Dict[str, List[str]]: 成功と失敗したトークンのリスト。
+            成功時は "media_item_ids"（トークン → メディアアイテム ID）も含む
+
+    Raises:
+        QuotaExceededError: 日次クォータを使い切っている場合
     """
     if not tokens:
         logger.error("アップロードトークンが指定されていません")
@@ -279,7 +601,16 @@ def batch_create_media_items(tokens: List[str], album_name: Optional[str], creds
         
         # バッチ作成リクエストを送信
         logger.info(f"{len(tokens_only)}個のメディアアイテムをバッチ作成中")
-        response = requests.post(API_BASE_URL + '/mediaItems:batchCreate', headers=headers, json=request_body)
+        response = _request('batchCreate', 'POST', API_BASE_URL + '/mediaItems:batchCreate', creds, headers=headers, json=request_body)
+
+        if response.status_code in (400, 404) and 'albumId' in request_body:
+            # キャッシュ済みのアルバムが削除されている可能性があるため、取り直して再送する
+            logger.warning(f"アルバム指定でのバッチ作成に失敗したため、アルバムを再取得します: {album_name}")
+            invalidate_album(album_name)
+            album_id = get_or_create_album(album_name, creds)
+            if album_id and album_id != request_body['albumId']:
+                request_body['albumId'] = album_id
+                response = _request('batchCreate', 'POST', API_BASE_URL + '/mediaItems:batchCreate', creds, headers=headers, json=request_body)
         
         if response.status_code == 200:
             response_data = response.json()
@@ -287,6 +618,7 @@ def batch_create_media_items(tokens: List[str], album_name: Optional[str], creds
             # 結果をパース
             success_tokens = []
             failed_tokens = []
+            media_item_ids = {}
             
             for result, token in zip(response_data.get('newMediaItemResults', []), tokens_only):
                 status = result.get('status', {})
@@ -305,6 +637,8 @@ def batch_create_media_items(tokens: List[str], album_name: Optional[str], creds
 
                 if is_success:
                     success_tokens.append(token)
+                    if result.get('mediaItem', {}).get('id'):
+                        media_item_ids[token] = result['mediaItem']['id']
                 else:
                     logger.warning(f"アイテム作成失敗: {status.get('message', 'UNKNOWN')}")
                     failed_tokens.append(token)
@@ -312,12 +646,15 @@ def batch_create_media_items(tokens: List[str], album_name: Optional[str], creds
             logger.info(f"バッチ作成完了: 成功={len(success_tokens)}, 失敗={len(failed_tokens)}")
             return {
                 "success": success_tokens,
-                "failed": failed_tokens
+                "failed": failed_tokens,
+                "media_item_ids": media_item_ids,
             }
         else:
             logger.error(f"バッチ作成リクエスト失敗: {response.status_code} - {response.text}")
             return {"success": [], "failed": tokens_only}
     
+    except QuotaExceededError:
+        raise
     except Exception as e:
         logger.error(f"バッチ作成中にエラーが発生: {e}")
         return {"success": [], "failed": tokens_only}
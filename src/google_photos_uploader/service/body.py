@@ -0,0 +1,85 @@
+import mmap
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+class MappedFile:
+    """アップロード本文をメモリマップ経由で提供するファイル
+
+    ファイル全体を bytes としてコピーせず、ページキャッシュを共有した
+    読み取り専用のマップから必要な範囲だけを読み出す。
+
+    Args:
+        file_path: 対象ファイルのパス
+    """
+
+    def __init__(self, file_path: Union[str, Path]):
+        self._file = open(file_path, 'rb')
+        self.size = os.fstat(self._file.fileno()).st_size
+        # 空ファイルは mmap できないため None のまま扱う
+        self._map: Optional[mmap.mmap] = None
+        if self.size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def slice(self, offset: int = 0, length: Optional[int] = None) -> "BodySlice":
+        """指定範囲を送信用の本文として返す
+
+        Args:
+            offset: 先頭からのオフセット
+            length: 長さ。None の場合はファイル末尾まで
+        """
+        end = self.size if length is None else min(self.size, offset + length)
+        return BodySlice(self._map, offset, max(0, end - offset))
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BodySlice:
+    """MappedFile の一部を requests の data に渡すためのファイルライクオブジェクト
+
+    requests / urllib3 は read() を持つオブジェクトを小さなブロック単位で
+    読み出して送信するため、同時に確保されるのは 1 ブロック分だけになる。
+    __len__ と tell() により Content-Length も正しく設定される。
+    """
+
+    def __init__(self, mapped: Optional[mmap.mmap], offset: int, length: int):
+        self._map = mapped
+        self._start = offset
+        self._length = length
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            pos += self._pos
+        elif whence == os.SEEK_END:
+            pos += self._length
+        self._pos = min(max(0, pos), self._length)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0 or self._map is None:
+            return b''
+        start = self._start + self._pos
+        self._pos += size
+        return self._map[start : start + size]
@@ -0,0 +1,237 @@
+import atexit
+import json
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# エンドポイント種別ごとのトークンバケット設定（1 秒あたりのリクエスト数, バースト数）
+RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+    'uploads': (10.0, 20),
+    'batchCreate': (2.0, 5),
+    'albums': (1.0, 5),
+    'default': (5.0, 10),
+}
+
+# 1 日あたりのリクエスト上限（Photos Library API の既定クォータ）
+# メディアバイトのアップロードとそれ以外の API 呼び出しで別枠
+DAILY_QUOTAS: Dict[str, int] = {
+    'uploads': 75000,
+    'api': 10000,
+}
+
+# クォータの日付は太平洋時間の 0 時で切り替わる
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:
+    _QUOTA_TZ = timezone.utc
+
+QUOTA_FILE = Path.home() / '.google_photos_uploader' / 'quota.json'
+
+# 再試行の設定（指数バックオフ + フルジッター）
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# クォータカウンターをファイルへ保存する間隔（リクエスト数）
+_QUOTA_SAVE_EVERY = 20
+
+class QuotaExceededError(Exception):
+    """1 日あたりのクォータを使い切った場合に送出される"""
+
+class TokenBucket:
+    """トークンバケット方式のレートリミッター
+
+    Args:
+        rate: 1 秒あたりに補充されるトークン数
+        capacity: バケットの容量（バースト可能なリクエスト数）
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """トークンを 1 つ取得するまで待機
+
+        Returns:
+            float: 待機した秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self._blocked_until:
+                    delay = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """指定秒数の間、このバケットからの取得を全スレッドで停止"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+class DailyQuota:
+    """1 日あたりのリクエスト数を数えるカウンター
+
+    カウントは QUOTA_FILE に保存され、プロセスをまたいで引き継がれる。
+
+    Args:
+        limits: 枠の名前 → 1 日あたりの上限
+        path: カウンターの保存先
+    """
+
+    def __init__(self, limits: Dict[str, int], path: Path = QUOTA_FILE):
+        self.limits = limits
+        self.path = path
+        self._lock = threading.Lock()
+        self._day = self._today()
+        self._counts: Dict[str, int] = {}
+        self._dirty = 0
+        self._load()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(_QUOTA_TZ).strftime('%Y-%m-%d')
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            if data.get('date') == self._day:
+                self._counts = {k: int(v) for k, v in data.get('counts', {}).items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"クォータファイルの読み込みに失敗: {e}")
+
+    def save(self) -> None:
+        """現在のカウントをファイルへ保存"""
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix('.json.tmp')
+            tmp.write_text(json.dumps({'date': self._day, 'counts': self._counts}), encoding='utf-8')
+            tmp.replace(self.path)
+            self._dirty = 0
+        except Exception as e:
+            logger.debug(f"クォータファイルの保存に失敗: {e}")
+
+    def consume(self, name: str) -> int:
+        """枠を 1 つ消費する
+
+        Returns:
+            int: 当日の消費数
+
+        Raises:
+            QuotaExceededError: 当日の上限に達している場合
+        """
+        with self._lock:
+            today = self._today()
+            if today != self._day:
+                self._day = today
+                self._counts = {}
+            used = self._counts.get(name, 0)
+            limit = self.limits.get(name)
+            if limit is not None and used >= limit:
+                raise QuotaExceededError(f"1 日あたりのクォータを使い切りました: {name} ({used}/{limit})")
+            self._counts[name] = used + 1
+            self._dirty += 1
+            if self._dirty >= _QUOTA_SAVE_EVERY:
+                self._save_locked()
+            return used + 1
+
+    def used(self, name: str) -> int:
+        with self._lock:
+            return self._counts.get(name, 0)
+
+class RateLimiter:
+    """エンドポイント種別ごとのトークンバケットと日次クォータをまとめたリミッター
+
+    Args:
+        rate_limits: 種別 → (1 秒あたりのリクエスト数, バースト数)
+        quota: 日次クォータのカウンター。None の場合は数えない
+    """
+
+    def __init__(self, rate_limits: Dict[str, Tuple[float, int]] = RATE_LIMITS, quota: Optional[DailyQuota] = None):
+        self._buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in rate_limits.items()}
+        self.quota = quota
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        return self._buckets.get(endpoint) or self._buckets['default']
+
+    def acquire(self, endpoint: str) -> None:
+        """リクエストを 1 つ送ってよい状態になるまで待機
+
+        Raises:
+            QuotaExceededError: 日次クォータを使い切っている場合
+        """
+        if self.quota is not None:
+            self.quota.consume('uploads' if endpoint == 'uploads' else 'api')
+        waited = self._bucket(endpoint).acquire()
+        if waited > 1:
+            logger.debug(f"レート制限により {waited:.1f} 秒待機しました: {endpoint}")
+
+    def pause(self, endpoint: str, seconds: float) -> None:
+        """サーバーから減速を求められた種別を一時停止"""
+        self._bucket(endpoint).pause(seconds)
+
+def retry_delay(response, attempt: int) -> float:
+    """再試行までの待ち時間を求める
+
+    Retry-After ヘッダーがあればそれに従い、無ければ
+    フルジッター付きの指数バックオフを用いる。
+
+    Args:
+        response: HTTP 応答（headers 属性を持つオブジェクト）
+        attempt: 0 から始まる試行回数
+
+    Returns:
+        float: 待ち時間（秒）
+    """
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, max(0.0, float(retry_after)))
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(retry_after)
+                return min(BACKOFF_MAX, max(0.0, (when - datetime.now(timezone.utc)).total_seconds()))
+            except (TypeError, ValueError):
+                pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """プロセス共有のレートリミッターを取得"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            quota = DailyQuota(DAILY_QUOTAS)
+            atexit.register(quota.save)
+            _limiter = RateLimiter(RATE_LIMITS, quota)
+        return _limiter
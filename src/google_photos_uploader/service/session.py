@@ -0,0 +1,125 @@
+import logging
+import threading
+from typing import Callable, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 接続プールの既定値（ホスト毎のプール数 / 1 ホストあたりの最大接続数）
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 5
+# リクエスト毎のタイムアウト（接続, 読み取り）秒
+DEFAULT_TIMEOUT: Tuple[float, float] = (10.0, 120.0)
+
+TimeoutType = Union[float, Tuple[float, float]]
+
+# 全応答を観測するフック（並列数コントローラーなどが登録する）
+_response_hooks: List[Callable[[requests.Response], None]] = []
+
+class _PooledSession(requests.Session):
+    """タイムアウト未指定のリクエストに既定値を適用する Session"""
+
+    def __init__(self, timeout: TimeoutType):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        response = super().request(method, url, **kwargs)
+        for hook in list(_response_hooks):
+            try:
+                hook(response)
+            except Exception as e:
+                logger.debug(f"レスポンスフックでエラーが発生: {e}")
+        return response
+
+_session: Optional[_PooledSession] = None
+_session_lock = threading.Lock()
+_config = {
+    'pool_connections': DEFAULT_POOL_CONNECTIONS,
+    'pool_maxsize': DEFAULT_POOL_MAXSIZE,
+    'timeout': DEFAULT_TIMEOUT,
+}
+
+def _build_session() -> _PooledSession:
+    """設定値に従って keep-alive 付きのセッションを生成"""
+    session = _PooledSession(_config['timeout'])
+    adapter = HTTPAdapter(
+        pool_connections=_config['pool_connections'],
+        pool_maxsize=_config['pool_maxsize'],
+        # ワーカー数を超えた場合は接続を破棄せず空きを待つ
+        pool_block=True,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    logger.debug(
+        f"HTTP セッションを生成: pool_connections={_config['pool_connections']}, "
+        f"pool_maxsize={_config['pool_maxsize']}, timeout={_config['timeout']}"
+    )
+    return session
+
+def get_session() -> requests.Session:
+    """プロセス共有の HTTP セッションを取得
+
+    Returns:
+        requests.Session: 接続プールを共有するセッション
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+def configure_session(
+    pool_maxsize: Optional[int] = None,
+    pool_connections: Optional[int] = None,
+    timeout: Optional[TimeoutType] = None,
+) -> None:
+    """共有セッションの接続プールとタイムアウトを設定
+
+    プールサイズが変わった場合は既存のセッションを閉じ、次回の
+    get_session() で作り直す。
+
+    Args:
+        pool_maxsize: 1 ホストあたりの最大接続数（通常はワーカー数）
+        pool_connections: キャッシュするホスト毎のプール数
+        timeout: リクエスト毎のタイムアウト（秒、または (接続, 読み取り) のタプル）
+    """
+    global _session
+    with _session_lock:
+        changed = False
+        if pool_maxsize is not None and pool_maxsize != _config['pool_maxsize']:
+            _config['pool_maxsize'] = max(1, pool_maxsize)
+            changed = True
+        if pool_connections is not None and pool_connections != _config['pool_connections']:
+            _config['pool_connections'] = max(1, pool_connections)
+            changed = True
+        if timeout is not None:
+            _config['timeout'] = timeout
+            if _session is not None:
+                _session.timeout = timeout
+
+        if changed and _session is not None:
+            _session.close()
+            _session = None
+
+def close_session() -> None:
+    """共有セッションを閉じ、保持している接続を解放"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def add_response_hook(hook: Callable[[requests.Response], None]) -> None:
+    """共有セッションの全応答で呼ばれるフックを登録"""
+    _response_hooks.append(hook)
+
+def remove_response_hook(hook: Callable[[requests.Response], None]) -> None:
+    """登録済みのフックを解除"""
+    try:
+        _response_hooks.remove(hook)
+    except ValueError:
+        pass
@@ -1,27 +1,46 @@
 import concurrent.futures
-import glob
 import json
 import logging
 import os
 import threading
 import time
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Sequence, Union
 
+from . import async_engine, watcher
 from .auth import get_credentials
+from .concurrency import AIMDController
+from .dedup import get_dedup_index
+from .jobstore import get_job_store
+from .ledger import get_ledger
+from .pipeline import BatchCreateStage, MAX_BATCH_SIZE
+from .scancache import ScanResult, get_scan_cache
+from .scheduler import (
+    DEVICE_READ_CONCURRENCY,
+    SMALL_FILE_THRESHOLD,
+    VIDEO_EXTENSIONS,
+    VIDEO_LANE_CONCURRENCY,
+    UploadScheduler,
+    media_lanes,
+)
 from .service import (
     upload_media as gp_upload_media,
     batch_create_media_items as gp_batch_create,
 )
-from .utils import SUPPORTED_EXTENSIONS
+from .service.ratelimit import QuotaExceededError
+from .service.session import (
+    add_response_hook,
+    configure_session,
+    get_session,
+    remove_response_hook,
+)
+from .utils import scan_media_files
 from google.auth.transport.requests import Request
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_ALBUM = "Photo Uploader"
 MAX_RETRIES = 3
-MAX_WORKERS = 5
-MAX_BATCH_SIZE = 50
 
 # --------------------------------------------------
 # 内部ヘルパー
@@ -41,7 +60,7 @@ def _get_credentials():
         # 2. 有効期限切れの場合はリフレッシュ
         try:
             if _cached_creds and _cached_creds.expired and _cached_creds.refresh_token:
-                _cached_creds.refresh(Request())
+                _cached_creds.refresh(Request(session=get_session()))
         except Exception as e:
             logger.error(f"認証情報のリフレッシュに失敗: {e}")
             _cached_creds = get_credentials()
@@ -57,12 +76,15 @@ def _clear_credentials_cache():
 # 外部公開関数
 # --------------------------------------------------
 
-def upload_single_file(file_path: str, verbose: bool = False) -> str | None:
+def upload_single_file(
+    file_path: str, verbose: bool = False, on_chunk: Optional[Callable[[], None]] = None
+) -> str | None:
     """単一ファイルをアップロードし、アップロードトークンを返す
 
     Args:
         file_path: ファイルパス
         verbose: 追加ログを出力するか
+        on_chunk: レジューム可能アップロードでチャンクを送る毎に呼ばれる関数
 
     Returns:
         str | None: 成功時はアップロードトークン、失敗時はNone
@@ -75,14 +97,16 @@ def upload_single_file(file_path: str, verbose: bool = False) -> str | None:
 
         if verbose:
             logger.debug(f"アップロード開始: {file_path}")
-        token = gp_upload_media(file_path, creds, token_only=True)
+        token = gp_upload_media(file_path, creds, token_only=True, on_chunk=on_chunk)
         if token:
             logger.info(f"アップロード成功: {file_path}")
         else:
+            # 401 のリフレッシュと 429/5xx の再試行は service 層で行うため、
+            # ここでは認証情報キャッシュをクリアしない
             logger.error(f"アップロード失敗: {file_path}")
-            # アップロード失敗時に認証エラーの可能性があるため、キャッシュをクリア
-            _clear_credentials_cache()
         return token
+    except QuotaExceededError:
+        raise
     except Exception as e:
         logger.error(f"upload_single_file で例外: {e}")
         # 例外発生時に認証エラーの可能性があるため、キャッシュをクリア
@@ -100,11 +124,9 @@ def batch_create_media_items(tokens: List[str], album_name: str | None, verbose:
             logger.debug(
                 f"batch_create_media_items 開始: token={len(tokens)}, album={album_name}"
             )
-        result = gp_batch_create(tokens, album_name, creds)
-        if not result.get("success"):
-            # 全て失敗した場合は認証エラーの可能性があるため、キャッシュをクリア
-            _clear_credentials_cache()
-        return result
+        return gp_batch_create(tokens, album_name, creds)
+    except QuotaExceededError:
+        raise
     except Exception as e:
         logger.error(f"batch_create_media_items で例外: {e}")
         # 例外発生時に認証エラーの可能性があるため、キャッシュをクリア
@@ -117,65 +139,175 @@ _PROGRESS_PATH = Path.home() / ".google_photos_uploader" / "upload_progress.json
 _progress_lock = threading.Lock()
 
 def upload_photos(
-    dcim_path: Path,
+    dcim_path: Union[Path, Sequence[Path]],
     album_name: str | None = None,
     verbose: bool = False,
+    engine: str = "thread",
+    on_progress: Optional[Callable[[dict], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    watch: bool = False,
+    scan_cache: bool = True,
 ) -> bool:
     """指定ディレクトリ内の写真・動画をアップロード
 
     Args:
-        dcim_path: DCIM フォルダの Path
+        dcim_path: DCIM フォルダの Path。複数の SD カードを取り込む場合はそのリスト
         album_name: アップロード先アルバム名
         verbose: 詳細ログ出力
+        engine: アップロードエンジン ("thread" または "async")
+        on_progress: 進捗イベント（dict）を受け取る関数。デーモンがクライアントへ中継する
+        cancel: セットされると未送信のファイルを送らずに終了する（thread エンジンのみ）
+        watch: 走査後も DCIM フォルダを監視し、書き込みが終わったファイルを実行中の
+            アップロードに追加する。cancel がセットされるか SD カードが外れるまで終わらない
+            （thread エンジンのみ。watchdog が必要）
+        scan_cache: False の場合は走査キャッシュを使わず、すべてのフォルダを読み直して stat する
 
     Returns:
         bool: 1 枚でも成功したら True
     """
+    if not watch:
+        return _upload_photos(dcim_path, album_name, verbose, engine, on_progress, cancel, scan_cache=scan_cache)
+
+    if not watcher.is_available():
+        logger.error("watchdog がインストールされていないため監視モードを使えません")
+        return False
+    if engine != "thread":
+        logger.warning("監視モードは thread エンジンでアップロードします")
+    # 走査中に書き込まれたファイルも取りこぼさないよう、走査の前に監視を始める
+    dcim_paths = [p for p in _dcim_paths(dcim_path) if p.is_dir()]
+    if not dcim_paths:
+        logger.info(f"監視する DCIM フォルダがありません: {dcim_path}")
+        return False
+    with watcher.MediaWatcher(dcim_paths) as live:
+        return _upload_photos(
+            dcim_paths, album_name, verbose, "thread", on_progress, cancel, live=live, scan_cache=scan_cache
+        )
+
+def _upload_photos(
+    dcim_path: Union[Path, Sequence[Path]],
+    album_name: str | None,
+    verbose: bool,
+    engine: str,
+    on_progress: Optional[Callable[[dict], None]],
+    cancel: Optional[threading.Event],
+    live: Optional[watcher.MediaWatcher] = None,
+    scan_cache: bool = True,
+) -> bool:
+    """upload_photos の本体。live を指定すると、その監視で見つかったファイルも追加で送る"""
     # ---------------------------------------------
     # 1. ファイル検索
     # ---------------------------------------------
-    photo_files = _collect_media_files(dcim_path)
-
-    if not photo_files:
-        logger.info(f"DCIM に対象ファイルがありません: {dcim_path}")
+    def _emit(event: str, **data):
+        if on_progress is None:
+            return
+        try:
+            on_progress(dict(data, event=event))
+        except Exception as e:
+            logger.debug(f"進捗イベントの通知に失敗: {e}")
+
+    dcim_paths = _dcim_paths(dcim_path)
+    photo_files: List[str] = []
+    file_device: Dict[str, str] = {}  # ファイル → 読み出し元の DCIM フォルダ
+    scanned_stats: Dict[str, tuple[int, int]] = {}  # ファイル → 走査時の (サイズ, mtime_ns)
+    # 複数の SD カードは並行して走査する（カード内のサブフォルダは scan_media_files が並行して読む）。
+    # 走査キャッシュを使う場合、前回から変更の無いフォルダはファイルを stat せずに記録を使う
+    scan = get_scan_cache().scan if scan_cache else _scan_uncached
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(dcim_paths) or 1) as pool:
+        scans = list(pool.map(scan, dcim_paths))
+    for path, result in zip(dcim_paths, scans):
+        files = [entry.path for entry in result.entries]
+        file_device.update(dict.fromkeys(files, str(path)))
+        # 記録から求めたサイズと mtime は書き換えで古くなりうるため、必要になった時点で stat し直す
+        scanned_stats.update(
+            (entry.path, (entry.size, entry.mtime_ns)) for entry in result.entries if entry.path not in result.cached
+        )
+        photo_files.extend(files)
+
+    if live is not None:
+        # 走査の時点で書き込み中だったファイルは、監視側で書き込みの終わりを待ってから追加する
+        held = set(live.hold_recent({fp: scanned_stats.get(fp) or _file_stat(fp) for fp in photo_files}))
+        if held:
+            photo_files = [fp for fp in photo_files if fp not in held]
+            for fp in held:
+                file_device.pop(fp, None)
+                scanned_stats.pop(fp, None)
+
+    if not photo_files and live is None:
+        logger.info(f"DCIM に対象ファイルがありません: {', '.join(map(str, dcim_paths))}")
         return False
 
     total_files = len(photo_files)
-    logger.info(f"アップロード対象 {total_files} 件を発見")
+    if len(dcim_paths) > 1:
+        logger.info(f"アップロード対象 {total_files} 件を発見（SD カード {len(dcim_paths)} 枚）")
+    else:
+        logger.info(f"アップロード対象 {total_files} 件を発見")
 
     # 進捗ファイルを初期化
     # _initialize_progress(total_files, album_name or DEFAULT_ALBUM, file_list=photo_files)
 
-    # 2. アップロード済み/失敗ログの読み込み
-    uploaded_files, failed_files, uploaded_log, failed_log = _load_logs()
+    # 2. 別のパスでアップロード済みの同じ内容のファイルを除外
+    ledger = get_ledger()
+    # 同じ内容のファイルが今回の対象に複数ある場合、最初の 1 件 → 残りのファイル
+    photo_files, content_keys, held_duplicates = skip_uploaded_duplicates(
+        dcim_paths, photo_files, file_stats=scanned_stats
+    )
+
+    def _record_held_duplicates(originals: List[str], media_item_ids: Dict[str, Optional[str]]):
+        """作成が成功したファイルと同じ内容の、除外しておいたファイルを台帳に記録"""
+        duplicates = {dup: fp for fp in originals for dup in held_duplicates.pop(fp, [])}
+        if duplicates:
+            ledger.record_uploaded(
+                duplicates,
+                album_name or DEFAULT_ALBUM,
+                content_keys,
+                {dup: media_item_ids.get(fp) for dup, fp in duplicates.items()},
+            )
 
-    # 3. 新規ファイルとリトライ対象を選定
-    new_files: List[str] = []
-    retry_files: List[str] = []
-    for f in photo_files:
-        if f in uploaded_files:
-            continue
-        if f in failed_files and failed_files[f].get("retry_count", 0) < MAX_RETRIES:
-            retry_files.append(f)
-        elif f not in failed_files:
-            new_files.append(f)
+    # 3. 台帳を照会し、新規ファイルとリトライ対象を選定
+    new_files, retry_files, failed_files = select_upload_files(photo_files)
+
+    # 3-1. ジョブストアに登録し、前回の実行で作成まで済んでいたものを除外する
+    #      （batchCreate の成功後、台帳への記録前に停止した場合）
+    store = get_job_store()
+    file_stats = {f: scanned_stats.get(f) or _file_stat(f) for f in new_files + retry_files}
+    store.discover(file_stats)
+    already_created = store.created(file_stats)
+    if already_created:
+        logger.info(f"前回の実行で作成済みの {len(already_created)} 件を台帳に反映します")
+        get_dedup_index().add({f: content_keys.get(f) for f in already_created})
+        ledger.record_uploaded(already_created, album_name or DEFAULT_ALBUM, content_keys)
+        _record_held_duplicates(list(already_created), {})
+        new_files = [f for f in new_files if f not in already_created]
+        retry_files = [f for f in retry_files if f not in already_created]
 
     all_files = new_files + retry_files
-    if not all_files:
+    if not all_files and live is None:
         logger.info("アップロード対象ファイルはありません")
         return False
 
     logger.info(f"新規 {len(new_files)} 件、リトライ {len(retry_files)} 件")
+    _emit("started", total=len(all_files), new=len(new_files), retry=len(retry_files))
 
     # アップロード対象ファイルのみを進捗ファイルに設定
     _initialize_progress(len(all_files), album_name or DEFAULT_ALBUM, file_list=all_files)
 
     # 4. 並列アップロード（トークン取得）
+    #    トークンは取得でき次第バッチ作成ステージへ流し、50 件たまるか
+    #    一定時間が経過した時点で batchCreate を送る
     upload_results: List[dict] = []
+    success_files: List[str] = []
+    failed_files_dict: Dict[str, dict] = {}
+    # 日次クォータを使い切った場合は、ファイルの失敗として記録せず（取得済みのトークンも
+    # 残したまま）実行を止め、クォータの回復後の実行で続きを送る
+    quota_exceeded = threading.Event()
 
-    def _upload_task(file_path: str, idx: int):
+    def _stop_for_quota(exc: QuotaExceededError):
+        if not quota_exceeded.is_set():
+            logger.error(f"{exc}。残りのファイルは次回アップロードします")
+        quota_exceeded.set()
+
+    def _make_result(file_path: str, idx: int, token: str | None) -> dict:
         retry_cnt = failed_files.get(file_path, {}).get("retry_count", 0)
-        token = upload_single_file(file_path, verbose=verbose)
         if token:
             return {
                 "file": file_path,
@@ -192,97 +324,448 @@ def upload_photos(
             "idx": idx,
         }
 
-    workers = min(MAX_WORKERS, os.cpu_count() or 4)
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        future_map = {
-            executor.submit(_upload_task, fp, i): fp for i, fp in enumerate(all_files, start=1)
-        }
-        for fut in concurrent.futures.as_completed(future_map):
-            try:
-                upload_results.append(fut.result())
-            except Exception as exc:
-                logger.error(f"upload task error: {exc}")
-
-            # スレッド完了毎に進捗を更新
-            _update_progress_partial(upload_results, completed=False)
-
-    successful = [r for r in upload_results if r.get("success")]
-    if not successful:
-        logger.warning("トークン取得に成功したファイルがありませんでした")
-        return False
-
-    # 5. バッチ作成
-    success_files: List[str] = []
-    failed_files_dict: Dict[str, dict] = {}
-    for i in range(0, len(successful), MAX_BATCH_SIZE):
-        batch = successful[i : i + MAX_BATCH_SIZE]
-        token_pairs = [(b["token"], Path(b["file"]).name) for b in batch]
-        file_paths = [b["file"] for b in batch]
-        result = batch_create_media_items(token_pairs, album_name or DEFAULT_ALBUM, verbose=verbose)
-        for (tkn, _), fp in zip(token_pairs, file_paths):
-            if tkn in result.get("success", []):
-                success_files.append(fp)
+    def _on_batch(batch: List[dict], result: Optional[Dict[str, List[str]]]):
+        if result is None:
+            # クォータ切れ: トークンを uploaded 状態のまま残し、次回の実行で作成する
+            return
+        created = set(result.get("success", []))
+        media_item_ids = result.get("media_item_ids", {})
+        batch_success: List[str] = []
+        batch_media_ids: Dict[str, str] = {}
+        for r in batch:
+            fp = r["file"]
+            if r["token"] in created:
+                batch_success.append(fp)
+                batch_media_ids[fp] = media_item_ids.get(r["token"])
             else:
+                store.mark_failed(fp, "BATCH_FAILED")
                 failed_files_dict[fp] = {
-                    "retry_count": failed_files.get(fp, {}).get("retry_count", 0) + 1,
+                    "retry_count": ledger.record_failed(fp, "BATCH_FAILED"),
                     "last_error": "BATCH_FAILED",
                     "last_attempt": time.strftime("%Y-%m-%d %H:%M:%S"),
                 }
+        success_files.extend(batch_success)
+        # アルバムに追加された分はすぐにジョブストアと台帳へ記録する
+        store.mark_created(batch_success)
+        get_dedup_index().add({fp: content_keys.get(fp) for fp in batch_success})
+        ledger.record_uploaded(batch_success, album_name or DEFAULT_ALBUM, content_keys, batch_media_ids)
+        _record_held_duplicates(batch_success, batch_media_ids)
+        _emit("batch", created=len(batch_success), failed=len(batch) - len(batch_success))
+
+    # 写真のトークンを動画より先にバッチ作成し、アルバムに写真から並ぶようにする
+    def _create_batch(pairs) -> Optional[Dict[str, List[str]]]:
+        try:
+            return batch_create_media_items(pairs, album_name or DEFAULT_ALBUM, verbose=verbose)
+        except QuotaExceededError as e:
+            _stop_for_quota(e)
+            return None
 
-    # 6. ログ更新
-    failed_files.update(failed_files_dict)
-    # 成功分を失敗リストから除外
-    for fp in success_files:
-        failed_files.pop(fp, None)
+    stage = BatchCreateStage(
+        _create_batch,
+        _on_batch,
+        batch_size=MAX_BATCH_SIZE,
+        priority=lambda r: _is_video(r["file"]),
+    )
+
+    def _record(result: dict, concurrency: int | None = None):
+        upload_results.append(result)
+        if result.get("success"):
+            store.mark_uploaded(result["file"], result["token"], album_name or DEFAULT_ALBUM)
+            stage.put(result)
+        else:
+            store.mark_failed(result["file"], result["last_error"])
+        _emit(
+            "file",
+            file=result["file"],
+            success=bool(result.get("success")),
+            completed=len(upload_results),
+            total=len(all_files),
+        )
+        # 完了毎に進捗を更新
+        _update_progress_partial(upload_results, completed=False, concurrency=concurrency)
+
+    if engine == "async" and not async_engine.is_available():
+        logger.warning("aiohttp が見つからないため thread エンジンでアップロードします")
+        engine = "thread"
+
+    # サイズを先に調べ、小さいファイルから順に完了させる
+    file_sizes = {fp: file_stats[fp][0] for fp in all_files}
+    file_index = {fp: i for i, fp in enumerate(all_files, start=1)}
+
+    # 前回の実行でバイト送信まで済んでいるファイルは、有効なトークンを再利用して送り直さない
+    resumed = store.valid_tokens(all_files)
+    upload_files = [fp for fp in all_files if fp not in resumed]
+    if resumed:
+        logger.info(f"前回取得したトークンを再利用: {len(resumed)} 件（バイト送信を省略）")
+
+    with stage:
+        for fp in all_files:
+            if fp in resumed:
+                _record(_make_result(fp, file_index[fp], resumed[fp]))
+
+        if engine == "async":
+            def _on_complete(file_path: str, idx: int, token: str | None):
+                if token:
+                    logger.info(f"アップロード成功: {file_path}")
+                else:
+                    logger.error(f"アップロード失敗: {file_path}")
+                _record(_make_result(file_path, file_index[file_path], token), concurrency=async_engine.ASYNC_CONCURRENCY)
+
+            logger.info(f"asyncio エンジンでアップロードします (concurrency={async_engine.ASYNC_CONCURRENCY})")
+            try:
+                async_engine.run_async_uploads(sorted(upload_files, key=file_sizes.get), _get_credentials, _on_complete)
+            except QuotaExceededError as e:
+                _stop_for_quota(e)
+        else:
+            # 並列数は AIMD コントローラーがスループットと 429/5xx 応答を見て調整する
+            controller = AIMDController()
+            # 写真はサイズで small / large レーンに分けて優先し、動画は同時送信数を制限した
+            # バックグラウンドレーンで写真と並行して送る
+            lanes, classify = media_lanes()
+            # 複数の SD カードを取り込む場合は、カード毎に同時読み出し数を制限して
+            # 遅いカードがワーカーを占有しないようにする（送信の並列数は全カードで共有）
+            multi_card = len(dcim_paths) > 1
+            scheduler = UploadScheduler(
+                lanes,
+                classify,
+                device_of=file_device.get if multi_card else None,
+                device_limit=DEVICE_READ_CONCURRENCY if multi_card else None,
+            )
+            for fp in upload_files:
+                scheduler.submit(fp, file_index[fp], size=file_sizes[fp])
+            if live is None:
+                scheduler.close()
+            logger.info(
+                f"スケジュール: small {scheduler.pending('small')} 件, large {scheduler.pending('large')} 件, "
+                f"動画 {scheduler.pending('video')} 件 (閾値 {SMALL_FILE_THRESHOLD // (1024 * 1024)}MB, "
+                f"動画の同時送信 {VIDEO_LANE_CONCURRENCY} 件まで)"
+            )
 
-    _write_logs(uploaded_log, failed_log, success_files, failed_files)
+            def _yield_to_photos(job, paused: List[float]) -> Callable[[], None]:
+                """動画のチャンク送信の合間に、待っている写真があれば一時停止して並列数を譲る"""
+                def _on_chunk():
+                    if not scheduler.preempt_requested(job):
+                        return
+                    logger.info(f"写真を優先するため動画の送信を一時停止: {job.path}")
+                    started = time.monotonic()
+                    controller.release()
+                    try:
+                        scheduler.pause(job)
+                    finally:
+                        controller.acquire()
+                    paused[0] += time.monotonic() - started
+                    logger.info(f"動画の送信を再開: {job.path}")
+                return _on_chunk
+
+            def _add_new_files(paths: List[str]):
+                """監視で見つかったファイルを、走査時と同じ選定を経てスケジューラに追加する"""
+                stats = {fp: _file_stat(fp) for fp in paths}
+                stats = {fp: st for fp, st in stats.items() if st[0]}
+                found, keys, held = skip_uploaded_duplicates(dcim_paths, list(stats), file_stats=stats)
+                content_keys.update(keys)
+                held_duplicates.update(held)
+                new, retry, failed = select_upload_files(found)
+                failed_files.update(failed)
+                added = new + retry
+                if not added:
+                    return
+                store.discover({fp: stats[fp] for fp in added})
+                for fp in added:
+                    all_files.append(fp)
+                    file_index[fp] = len(all_files)
+                    file_sizes[fp] = stats[fp][0]
+                    file_device[fp] = _device_of(fp, dcim_paths)
+                    scheduler.submit(fp, file_index[fp], size=file_sizes[fp])
+                logger.info(f"新しいファイル {len(added)} 件をアップロードに追加（計 {len(all_files)} 件）")
+                _extend_progress(added)
+                _emit("added", files=added, total=len(all_files))
+
+            def _follow_new_files():
+                """cancel がセットされるか SD カードが外れるまで、新しいファイルを取り込む"""
+                # 走査で見つけて送ったファイル（書き込み中として保留したものは含まない）
+                seen = set(file_device)
+                logger.info("新しいファイルを待っています（監視モード）")
+                while live.alive():
+                    if (cancel is not None and cancel.is_set()) or quota_exceeded.is_set():
+                        scheduler.abort()
+                        return
+                    paths = [fp for fp in live.get_ready() if fp not in seen]
+                    if not paths:
+                        continue
+                    seen.update(paths)
+                    try:
+                        _add_new_files(paths)
+                    except Exception as e:
+                        logger.error(f"新しいファイルの追加に失敗: {e}")
+                logger.info("DCIM フォルダが見つからなくなったため監視を終了します")
+
+            def _upload_worker():
+                while True:
+                    if (cancel is not None and cancel.is_set()) or quota_exceeded.is_set():
+                        # 待ちを破棄し、一時停止中の動画も再開させて終わらせる
+                        scheduler.abort()
+                        return
+                    with controller.slot():
+                        job = scheduler.get()
+                        if job is None:
+                            return
+                        try:
+                            started = time.monotonic()
+                            paused = [0.0]
+                            token = upload_single_file(job.path, verbose=verbose, on_chunk=_yield_to_photos(job, paused))
+                            if token:
+                                controller.record(job.size, time.monotonic() - started - paused[0])
+                            _record(_make_result(job.path, job.idx, token), concurrency=controller.limit)
+                        except QuotaExceededError as exc:
+                            # このファイルは失敗として記録せず、次回の対象に残す
+                            _stop_for_quota(exc)
+                            scheduler.abort()
+                        except Exception as exc:
+                            logger.error(f"upload task error: {exc}")
+                        finally:
+                            scheduler.done(job)
+
+            # 接続プールを並列数の上限に合わせ、ワーカー間で keep-alive 接続を再利用する
+            configure_session(pool_maxsize=controller.maximum)
+            add_response_hook(controller.observe_response)
+            logger.info(f"アップロード並列数: 初期値 {controller.limit} (上限 {controller.maximum})")
+            try:
+                # 一時停止中の動画はスレッドを占有するため、その分だけワーカーを多く用意する
+                workers = controller.maximum + VIDEO_LANE_CONCURRENCY
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                    for _ in range(workers):
+                        executor.submit(_upload_worker)
+                    if live is not None:
+                        try:
+                            _follow_new_files()
+                        except BaseException:
+                            scheduler.abort()
+                            raise
+                        finally:
+                            scheduler.close()
+            finally:
+                remove_response_hook(controller.observe_response)
+
+    if not any(r.get("success") for r in upload_results):
+        logger.warning("トークン取得に成功したファイルがありませんでした")
 
-    # 完了後、進捗ファイルを最終更新
+    # 5. 完了後、進捗ファイルを最終更新
     total_failed = len([r for r in upload_results if not r.get("success")]) + len(failed_files_dict)
     _finalize_progress(len(success_files), total_failed, file_list=all_files)
+    # 失敗の記録は追記のみのため、溜まっていれば圧縮する
+    ledger.maybe_compact()
 
-    logger.info(f"upload_photos 完了: success={len(success_files)}, failed={len(failed_files_dict)}")
+    if cancel is not None and cancel.is_set():
+        logger.info(f"アップロードは中断されました: 未送信 {len(all_files) - len(upload_results)} 件")
+    elif quota_exceeded.is_set():
+        logger.info(f"クォータ切れのため中断しました: 未送信 {len(all_files) - len(upload_results)} 件")
+
+    logger.info(f"upload_photos 完了: success={len(success_files)}, failed={total_failed}")
+    _emit("finished", success=len(success_files), failed=total_failed)
     return bool(success_files)
 
+def recover_pending_tokens(verbose: bool = False) -> int:
+    """前回の実行で取得済みのトークンから batchCreate を行う（起動時の復旧処理）
+
+    バイト送信後、batchCreate の前に停止した（電源断や停止操作など）ファイルを、
+    トークンの有効期限内であれば送り直さずにアルバムへ追加する。期限切れの
+    トークンは破棄し、次回の upload_photos でバイトから送り直す。
+    batchCreate に失敗したトークンは有効期限内であれば次回再び試す。
+
+    Returns:
+        int: メディアアイテムを作成できたファイル数
+    """
+    store = get_job_store()
+    expired = store.expire_tokens()
+    if expired:
+        logger.info(f"期限切れのトークン {expired} 件を破棄しました（次回アップロードし直します）")
+
+    pending = store.pending_tokens()
+    if not pending:
+        return 0
+
+    ledger = get_ledger()
+    uploaded = ledger.uploaded(item["path"] for item in pending)
+    by_album: Dict[str, List[dict]] = {}
+    for item in pending:
+        if item["path"] in uploaded:
+            # 台帳には記録済み（作成後に状態を更新する前に停止した）
+            store.mark_created([item["path"]])
+            continue
+        by_album.setdefault(item["album"] or DEFAULT_ALBUM, []).append(item)
+    if not by_album:
+        return 0
+
+    logger.info(f"前回取得したトークン {sum(len(v) for v in by_album.values())} 件から作成を再開します")
+    recovered: List[str] = []
+    for album, items in by_album.items():
+        for i in range(0, len(items), MAX_BATCH_SIZE):
+            chunk = items[i : i + MAX_BATCH_SIZE]
+            try:
+                result = batch_create_media_items(
+                    [(it["token"], Path(it["path"]).name) for it in chunk], album, verbose=verbose
+                )
+            except QuotaExceededError as e:
+                # トークンは有効期限内であれば次回再び試す
+                logger.error(f"{e}。トークンからの作成を中断します")
+                logger.info(f"トークンからの作成を完了: {len(recovered)} 件")
+                return len(recovered)
+            created = set(result.get("success", []))
+            media_item_ids = result.get("media_item_ids", {})
+            done = [it["path"] for it in chunk if it["token"] in created]
+            store.mark_created(done)
+            index = get_dedup_index()
+            keys = index.content_keys(done)
+            index.add(keys)
+            ledger.record_uploaded(
+                done, album, keys, {it["path"]: media_item_ids.get(it["token"]) for it in chunk}
+            )
+            recovered.extend(done)
+
+    logger.info(f"トークンからの作成を完了: {len(recovered)} 件")
+    return len(recovered)
+
 # --------------------------------------------------
 # 新規ヘルパー関数
 # --------------------------------------------------
 
+def _is_video(file_path: str) -> bool:
+    return os.path.splitext(file_path)[1].lower() in VIDEO_EXTENSIONS
+
+def _dcim_paths(dcim_path: Union[Path, Sequence[Path]]) -> List[Path]:
+    """DCIM フォルダ（1 つまたは複数）をリストにそろえる"""
+    if isinstance(dcim_path, (str, os.PathLike)):
+        return [Path(dcim_path)]
+    return [Path(p) for p in dcim_path]
+
+def _device_of(file_path: str, dcim_paths: Sequence[Path]) -> str:
+    """file_path を含む DCIM フォルダ（読み出し元の SD カード）"""
+    for path in dcim_paths:
+        if file_path.startswith(os.path.join(str(path), "")):
+            return str(path)
+    return str(dcim_paths[0])
+
 def _collect_media_files(dcim_path: Path) -> List[str]:
     """指定フォルダ以下の対応拡張子ファイルを再帰取得"""
-    files: List[str] = []
-    for ext in SUPPORTED_EXTENSIONS:
-        files.extend(glob.glob(str(dcim_path / "**" / f"*{ext}"), recursive=True))
-        files.extend(glob.glob(str(dcim_path / "**" / f"*{ext.upper()}"), recursive=True))
-    return files
-
-def _load_logs() -> tuple[set[str], dict[str, dict], Path, Path]:
-    """アップロード済みログと失敗ログを読み込む"""
-    base_dir = Path.home() / ".google_photos_uploader"
-    uploaded_log = base_dir / "uploaded_files.txt"
-    failed_log = base_dir / "failed_files.json"
-
-    uploaded_files: set[str] = set()
-    failed_files: dict[str, dict] = {}
-
-    if uploaded_log.exists():
-        uploaded_files = {line.strip() for line in uploaded_log.read_text().splitlines() if line.strip()}
-    if failed_log.exists():
-        try:
-            failed_files = json.loads(failed_log.read_text())
-        except json.JSONDecodeError:
-            logger.warning("failed_files.json の解析に失敗。新しいファイルを生成します")
+    return [entry.path for entry in scan_media_files(dcim_path)]
+
+def select_upload_files(photo_files: List[str]) -> tuple[List[str], List[str], Dict[str, dict]]:
+    """台帳を照会して新規ファイルとリトライ対象を選定
+
+    アップロード済みのファイルと、失敗回数が MAX_RETRIES に達したファイルは除く。
+
+    Returns:
+        tuple: (新規ファイル, リトライ対象, 失敗の記録 パス → {"retry_count", "last_error", "last_attempt"})
+    """
+    ledger = get_ledger()
+    uploaded = ledger.uploaded(photo_files)
+    pending = [f for f in photo_files if f not in uploaded]
+    failed_files = ledger.retry_state(pending)
+    new_files: List[str] = []
+    retry_files: List[str] = []
+    for f in pending:
+        if f not in failed_files:
+            new_files.append(f)
+        elif failed_files[f]["retry_count"] < MAX_RETRIES:
+            retry_files.append(f)
+    return new_files, retry_files, failed_files
+
+def skip_uploaded_duplicates(
+    dcim_path: Union[Path, Sequence[Path]],
+    photo_files: List[str],
+    file_stats: Optional[Dict[str, tuple[int, int]]] = None,
+) -> tuple[List[str], Dict[str, str], Dict[str, List[str]]]:
+    """内容が同じファイルをアップロード済みとして除外する
 
-    return uploaded_files, failed_files, uploaded_log, failed_log
+    台帳はパスで記録しているため、同じ SD カードが別のマウント先に現れると
+    未アップロードに見える。台帳に無いファイルは内容キーを求めて重複判定
+    インデックスと照合し、内容キーが一致したものはファイル全体のハッシュでも
+    一致を確かめてから、アップロード済みとして台帳に記録する（次回から照合を省く）。
+    内容キーと全体のハッシュは指紋（ボリューム ID・相対パス・サイズ・mtime）で
+    キャッシュされるため、変更の無いファイルは読み込まない。
 
-def _write_logs(uploaded_log: Path, failed_log: Path, new_uploaded: List[str], failed_files: dict):
-    """ログファイルへ書き込み"""
-    uploaded_log.parent.mkdir(parents=True, exist_ok=True)
-    with uploaded_log.open("a", encoding="utf-8") as f:
-        for fp in new_uploaded:
-            f.write(f"{fp}\n")
+    同じ内容のファイルが複数ある場合は（別の SD カードにあるものも含めて）最初の 1 件だけを
+    残し、残りは最初の 1 件に紐付けて返す。これらは最初の 1 件の作成が成功するまで
+    台帳に記録しないこと（失敗した場合は次回の対象に残る）。
 
-    failed_log.write_text(json.dumps(failed_files, ensure_ascii=False, indent=2))
+    旧形式のログから取り込んだファイルは内容キーを持たないため、そのうち
+    dcim_path 以下で現存するものを先にインデックスへ登録する。
+
+    Args:
+        dcim_path: DCIM フォルダの Path（複数の SD カードの場合はそのリスト）
+        photo_files: 検出したファイル
+        file_stats: 走査時に取得した (サイズ, mtime_ns)。指定したファイルは stat し直さない
+
+    Returns:
+        tuple[List[str], Dict[str, str], Dict[str, List[str]]]: 残したファイル、その内容キー
+        （パス → キー）、実行中の重複（残したファイル → 同じ内容の除外したファイル）
+    """
+    ledger = get_ledger()
+    index = get_dedup_index()
+    legacy: List[str] = []
+    for path in _dcim_paths(dcim_path):
+        legacy.extend(ledger.unhashed(os.path.join(str(path), "")))
+    if legacy:
+        legacy_keys = {fp: k for fp, k in index.content_keys(legacy).items() if k}
+        if legacy_keys:
+            index.add(legacy_keys)
+            ledger.set_content_keys(legacy_keys)
+            logger.info(f"旧形式のログから {len(legacy_keys)} 件を重複判定インデックスへ移行しました")
+
+    uploaded = ledger.uploaded(photo_files)
+    candidates = [fp for fp in photo_files if fp not in uploaded]
+    keys = index.content_keys(candidates, stats=file_stats)
+    known = index.known_hashes(keys.values())
+
+    # 内容キーがアップロード済みのもの、または今回の候補同士で一致したものだけ全体のハッシュを求める
+    key_counts: Dict[str, int] = {}
+    for fp in candidates:
+        if keys[fp]:
+            key_counts[keys[fp]] = key_counts.get(keys[fp], 0) + 1
+    suspects = [fp for fp in candidates if keys[fp] and (keys[fp] in known or key_counts[keys[fp]] > 1)]
+    if not suspects:
+        return photo_files, keys, {}
+    hashes = index.full_hashes(suspects, stats=file_stats)
+
+    duplicates: List[str] = []
+    held: Dict[str, List[str]] = {}
+    first: Dict[tuple, str] = {}  # (内容キー, 全体のハッシュ) → 最初のファイル
+    for fp in suspects:
+        key, full_hash = keys[fp], hashes.get(fp)
+        if full_hash is None:
+            continue
+        if full_hash in known.get(key, ()):
+            duplicates.append(fp)
+            continue
+        original = first.setdefault((key, full_hash), fp)
+        if original != fp:
+            held.setdefault(original, []).append(fp)
+
+    if duplicates:
+        logger.info(f"内容が同じアップロード済みファイル {len(duplicates)} 件をスキップします")
+        ledger.record_uploaded(duplicates, content_keys=keys)
+    deferred = [fp for dups in held.values() for fp in dups]
+    if deferred:
+        logger.info(f"内容が同じファイル {len(deferred)} 件は、最初の 1 件の作成後に記録します")
+    if not duplicates and not deferred:
+        return photo_files, keys, held
+    recorded = set(duplicates)
+    skipped = recorded.union(deferred)
+    # 実行中の重複の内容キーは、記録する際に使うため残す
+    return [fp for fp in photo_files if fp not in skipped], {fp: k for fp, k in keys.items() if fp not in recorded}, held
+
+def _scan_uncached(dcim_path: Path) -> ScanResult:
+    """走査キャッシュを使わずに DCIM フォルダを走査（ScanCache.scan と同じ形で返す）"""
+    entries = scan_media_files(dcim_path)
+    return ScanResult(entries, set(), {}, "", str(dcim_path))
+
+def _file_stat(file_path: str) -> tuple[int, int]:
+    """ファイルサイズと mtime (ns) を取得（取得できない場合は (0, 0)）"""
+    try:
+        st = os.stat(file_path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return 0, 0
 
 # --------------------------------------------------
 # 進捗ファイル関連
@@ -305,7 +788,7 @@ def _initialize_progress(total: int, album_name: str, file_list: List[str] | Non
     except Exception as e:
         logger.debug(f"進捗ファイルの初期化に失敗: {e}")
 
-def _update_progress_partial(results: List[dict], completed: bool):
+def _update_progress_partial(results: List[dict], completed: bool, concurrency: int | None = None):
     """アップロード途中で進捗を更新"""
     try:
         with _progress_lock:
@@ -319,11 +802,26 @@ def _update_progress_partial(results: List[dict], completed: bool):
             data["success"] = success_cnt
             data["failed"] = failed_cnt
             data["completed"] = completed
+            if concurrency is not None:
+                data["concurrency"] = concurrency
 
             _PROGRESS_PATH.write_text(json.dumps(data, ensure_ascii=False))
     except Exception as e:
         logger.debug(f"途中進捗の更新に失敗: {e}")
 
+def _extend_progress(file_list: List[str]):
+    """監視モードで追加したファイルを進捗ファイルに加える（スライドショーが再生リストに取り込む）"""
+    try:
+        with _progress_lock:
+            if not _PROGRESS_PATH.exists():
+                return
+            data = json.loads(_PROGRESS_PATH.read_text(encoding="utf-8"))
+            data["files"] = data.get("files", []) + file_list
+            data["total"] = len(data["files"])
+            _PROGRESS_PATH.write_text(json.dumps(data, ensure_ascii=False))
+    except Exception as e:
+        logger.debug(f"進捗ファイルへのファイル追加に失敗: {e}")
+
 def _finalize_progress(success: int, failed: int, file_list: List[str] | None = None):
     """アップロード完了時に進捗を確定"""
     try:
@@ -1,8 +1,12 @@
+import concurrent.futures
 import logging
 import os
+import re
 import sys
 from pathlib import Path
-from typing import List, Optional, Set
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
 
 # ロギングの設定
 def setup_logging(level: int = logging.INFO) -> None:
@@ -78,6 +82,134 @@ def find_sd_card(volume_name: str = "PHOTO_UPLOAD_SD") -> Optional[Path]:
                 
     return None
 
+# マウント情報（Linux）
+MOUNTINFO_PATH = '/proc/self/mountinfo'
+# ボリュームの UUID / ラベルから実デバイスへのシンボリックリンク（Linux）
+DISK_BY_UUID = Path('/dev/disk/by-uuid')
+DISK_BY_LABEL = Path('/dev/disk/by-label')
+
+def _unescape_mount_field(field: str) -> str:
+    """mountinfo の 8 進エスケープ（空白の \\040 など）を戻す"""
+    if '\\' not in field:
+        return field
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), field)
+
+def read_mountinfo(path: str = MOUNTINFO_PATH) -> Dict[str, str]:
+    """マウントポイント → マウント元デバイス の対応を読み込む
+
+    Returns:
+        Dict[str, str]: 読み込めない場合（Linux 以外など）は空の辞書
+    """
+    mounts: Dict[str, str] = {}
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                fields = line.split()
+                if '-' not in fields:
+                    continue
+                sep = fields.index('-')
+                if len(fields) < 5 or len(fields) < sep + 3:
+                    continue
+                mounts[_unescape_mount_field(fields[4])] = _unescape_mount_field(fields[sep + 2])
+    except OSError:
+        pass
+    return mounts
+
+def find_mount_point(path: Path) -> Path:
+    """path を含むファイルシステムのマウントポイント"""
+    path = Path(os.path.abspath(path))
+    while not os.path.ismount(path) and path.parent != path:
+        path = path.parent
+    return path
+
+def _find_device_link(directory: Path, device: str) -> Optional[str]:
+    """/dev/disk/by-* の中から device を指すリンク名を探す"""
+    try:
+        target = os.path.realpath(device)
+        for link in directory.iterdir():
+            if os.path.realpath(link) == target:
+                return link.name
+    except OSError:
+        pass
+    return None
+
+def get_volume_id(path: Path, mountinfo: Optional[Dict[str, str]] = None) -> Tuple[str, Path]:
+    """path を含むボリュームの識別子とマウントポイントを取得
+
+    SD カードはマウント先（/media/$USER/PHOTO_UPLOAD_SD や /media/$USER/disk）が
+    変わることがあるため、ファイルシステムの UUID（無ければラベル、デバイス名）で識別する。
+    いずれも取得できない場合はマウントポイントのパスを使う。
+
+    Args:
+        path: ボリューム上のパス
+        mountinfo: read_mountinfo() の結果（複数回呼ぶ場合に再利用する）
+
+    Returns:
+        Tuple[str, Path]: ("uuid:XXXX" などの識別子, マウントポイント)
+    """
+    mount_point = find_mount_point(path)
+    if mountinfo is None:
+        mountinfo = read_mountinfo()
+    device = mountinfo.get(str(mount_point))
+    if device and device.startswith('/dev/'):
+        uuid = _find_device_link(DISK_BY_UUID, device)
+        if uuid:
+            return f'uuid:{uuid}', mount_point
+        label = _find_device_link(DISK_BY_LABEL, device)
+        if label:
+            return f'label:{label}', mount_point
+        return f'dev:{device}', mount_point
+    return f'mount:{mount_point}', mount_point
+
+# リムーバブルメディアがマウントされるディレクトリ（Linux）
+REMOVABLE_MOUNT_ROOTS = ('/media', '/run/media', '/mnt')
+
+def find_sd_cards(volume_name: str = "PHOTO_UPLOAD_SD", mountinfo: Optional[Dict[str, str]] = None) -> List[Path]:
+    """DCIM フォルダを持つマウント済みのボリュームをすべて探す
+
+    マルチスロットのカードリーダーで複数の SD カードを同時に挿した場合に、
+    すべてのカードを 1 回の実行で取り込むために使う。find_sd_card() が返すカードを
+    先頭にし、残りはマウントポイントの名前順に並べる。
+
+    Args:
+        volume_name: 優先する SD カードのボリューム名
+        mountinfo: read_mountinfo() の結果（テスト用）
+
+    Returns:
+        List[Path]: SD カードのパス。見つからない場合は空のリスト
+    """
+    candidates: List[Path] = []
+    if sys.platform == 'darwin':
+        try:
+            candidates = sorted(p for p in Path('/Volumes').iterdir() if p.is_dir())
+        except OSError:
+            pass
+    elif sys.platform.startswith('linux'):
+        if mountinfo is None:
+            mountinfo = read_mountinfo()
+        roots = tuple(root + os.sep for root in REMOVABLE_MOUNT_ROOTS)
+        candidates = sorted(Path(m) for m in mountinfo if m.startswith(roots))
+    elif sys.platform == 'win32':
+        import win32api
+        candidates = [Path(d) for d in win32api.GetLogicalDriveStrings().split('\000')[:-1]]
+
+    preferred = find_sd_card(volume_name)
+    if preferred is not None:
+        candidates.insert(0, preferred)
+
+    cards: List[Path] = []
+    seen: Set[str] = set()
+    for path in candidates:
+        try:
+            key = os.path.realpath(path)
+            if key in seen or not (path / "DCIM").is_dir():
+                continue
+        except OSError:
+            continue
+        seen.add(key)
+        cards.append(path)
+    return cards
+
 def get_dcim_path(sd_path: Path) -> Optional[Path]:
     """SDカード内のDCIMフォルダのパスを取得
 
@@ -92,6 +224,149 @@ def get_dcim_path(sd_path: Path) -> Optional[Path]:
         return dcim_path
     return None
 
+# メディアファイル検索で、フォルダの読み込みと stat を並行して行うスレッド数
+SCAN_WORKERS = 4
+# 1 つのフォルダのファイルを stat する際、1 スレッドにまとめて渡す件数
+# （スマートフォンの巨大なフォルダも複数スレッドで stat する）
+SCAN_STAT_CHUNK = 256
+
+class MediaEntry(NamedTuple):
+    """scan_media_files が返すファイル 1 件（走査時に取得したサイズと mtime を持つ）"""
+    path: str
+    size: int
+    mtime_ns: int
+
+class DirListing(NamedTuple):
+    """フォルダ 1 つの走査結果（scan_media_files の cache に記録する）"""
+    mtime_ns: int
+    subdirs: List[str]
+    files: List[MediaEntry]
+
+def _list_media_dir(
+    directory: str, extensions: Set[str], cache: Optional[Dict[str, DirListing]] = None
+) -> tuple:
+    """フォルダを読み、(フォルダ, mtime_ns, サブフォルダ, ファイル, キャッシュ使用) を返す
+
+    フォルダを 1 度だけ読み、対象拡張子のファイルを stat 前の DirEntry で返す。
+    cache に mtime が一致し、サブフォルダとファイルの名前も一致する記録があれば、
+    stat を省いて記録済みのサブフォルダと MediaEntry を返す。
+    """
+    mtime_ns = None
+    subdirs: List[str] = []
+    files: List[os.DirEntry] = []
+    try:
+        if cache is not None:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in extensions:
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.warning(f"フォルダを読み込めません: {directory} {e}")
+        return directory, None, subdirs, files, False
+    hit = cache.get(directory) if cache is not None else None
+    # FAT / exFAT ではファイルを追加・書き換えてもフォルダの mtime が変わらない場合が
+    # あるため、mtime だけでなく名前の一覧も一致した場合に限り記録を使う
+    if hit is not None and hit.mtime_ns == mtime_ns and _same_names(hit, subdirs, files):
+        return directory, mtime_ns, hit.subdirs, hit.files, True
+    return directory, mtime_ns, subdirs, files, False
+
+def _same_names(listing: DirListing, subdirs: List[str], files: List[os.DirEntry]) -> bool:
+    """記録したフォルダの中身と、読み直したサブフォルダ・ファイルの名前が一致するか"""
+    if len(listing.subdirs) != len(subdirs) or len(listing.files) != len(files):
+        return False
+    return {os.path.basename(d) for d in listing.subdirs} == {os.path.basename(d) for d in subdirs} and {
+        os.path.basename(e.path) for e in listing.files
+    } == {entry.name for entry in files}
+
+def _stat_media_entries(files: List[os.DirEntry]) -> List[MediaEntry]:
+    entries: List[MediaEntry] = []
+    for entry in files:
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        entries.append(MediaEntry(entry.path, st.st_size, st.st_mtime_ns))
+    return entries
+
+def scan_media_files(
+    directory: Path,
+    extensions: Optional[Set[str]] = None,
+    workers: int = SCAN_WORKERS,
+    cache: Optional[Dict[str, DirListing]] = None,
+) -> List[MediaEntry]:
+    """指定されたディレクトリ以下のメディアファイルを 1 回の走査で検索
+
+    os.scandir でディレクトリを 1 度ずつ読み、拡張子は大文字・小文字を区別せずに
+    照合する（.Jpg なども対象）。glob と同様に "." で始まるファイルとフォルダ
+    （macOS の ._IMG_0001.JPG など）は対象外で、フォルダへのシンボリックリンクはたどらない。
+
+    USB 接続の exFAT などでは読み込みの待ち時間が支配的なため、サブフォルダ
+    （DCIM/100CANON, 101CANON, ...）の読み込みとファイルの stat を workers 個の
+    スレッドで並行して行う。結果はパス順に並べるため、スレッド数によらず同じになる。
+
+    Args:
+        directory: 検索対象のディレクトリ
+        extensions: 検索対象の拡張子（小文字）のセット。Noneの場合はSUPPORTED_EXTENSIONSを使用
+        workers: 並行して読み込むスレッド数。1 以下の場合は呼び出したスレッドで順に読む
+        cache: フォルダのパス → DirListing。指定すると、mtime と名前の一覧が記録と一致する
+            フォルダはファイルを stat せずに記録を使い、それ以外のフォルダの結果を書き込む
+            （対象拡張子は毎回同じにすること）
+
+    Returns:
+        List[MediaEntry]: パス順のメディアファイル。サイズと mtime は走査時の stat の値
+    """
+    if extensions is None:
+        extensions = SUPPORTED_EXTENSIONS
+    entries: List[MediaEntry] = []
+    listed: Dict[str, tuple] = {}  # 読み直したフォルダ → (mtime_ns, サブフォルダ, ファイル)
+
+    def _collect(result: tuple, stat: Callable[[List[os.DirEntry]], list]) -> List[str]:
+        directory, mtime_ns, subdirs, files, cached = result
+        if cached:
+            entries.extend(files)
+        else:
+            listed[directory] = (mtime_ns, subdirs, stat(files))
+        return subdirs
+
+    if workers <= 1:
+        stack = [os.fspath(directory)]
+        while stack:
+            stack.extend(_collect(_list_media_dir(stack.pop(), extensions, cache), _stat_media_entries))
+        chunks = {d: [files] for d, (_, _, files) in listed.items()}
+    else:
+        def _stat_chunks(files: List[os.DirEntry]) -> list:
+            return [
+                pool.submit(_stat_media_entries, files[i : i + SCAN_STAT_CHUNK])
+                for i in range(0, len(files), SCAN_STAT_CHUNK)
+            ]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as pool:
+            pending = {pool.submit(_list_media_dir, os.fspath(directory), extensions, cache)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    pending.update(
+                        pool.submit(_list_media_dir, d, extensions, cache)
+                        for d in _collect(future.result(), _stat_chunks)
+                    )
+            chunks = {d: [f.result() for f in futures] for d, (_, _, futures) in listed.items()}
+
+    for d, (mtime_ns, subdirs, _) in listed.items():
+        files = [entry for chunk in chunks[d] for entry in chunk]
+        entries.extend(files)
+        if cache is not None and mtime_ns is not None:
+            cache[d] = DirListing(mtime_ns, subdirs, files)
+    entries.sort()
+    return entries
+
 def find_media_files(directory: Path, extensions: Optional[Set[str]] = None) -> List[Path]:
     """指定されたディレクトリ内のメディアファイルを検索
 
@@ -102,12 +377,4 @@ def find_media_files(directory: Path, extensions: Optional[Set[str]] = None) ->
     Returns:
         List[Path]: メディアファイルのパスのリスト
     """
-    if extensions is None:
-        extensions = SUPPORTED_EXTENSIONS
-    
-    media_files = []
-    for ext in extensions:
-        media_files.extend(directory.glob(f"**/*{ext}"))
-        media_files.extend(directory.glob(f"**/*{ext.upper()}"))
-    
-    return sorted(media_files)
+    return [Path(entry.path) for entry in scan_media_files(directory, extensions)]
@@ -0,0 +1,229 @@
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from .utils import SUPPORTED_EXTENSIONS
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog が無い環境では監視モードを使えない
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+# サイズと mtime がこの秒数変わらなければ書き込みが終わったとみなす
+WRITE_SETTLE_TIME = 2.0
+# 書き込み中のファイルのサイズを確認する間隔（秒）
+POLL_INTERVAL = 0.5
+# FAT / exFAT の mtime の分解能（秒）。mtime は切り捨てられるため、この分だけ古く見える
+MTIME_RESOLUTION = 2.0
+
+def is_available() -> bool:
+    """監視モードが利用可能か（watchdog がインストールされているか）"""
+    return Observer is not None
+
+class WriteDebouncer:
+    """書き込み中のファイルを、書き込みが終わるまで保留する
+
+    作成・変更のイベントを受けたファイルは、close-write（inotify の IN_CLOSE_WRITE）を
+    受けるか、サイズと mtime が settle_time 秒変わらなくなった時点で完了とみなす。
+    close-write の無い環境（macOS や一部の FUSE など）ではサイズの安定だけで判定する。
+    同じファイルは 1 度だけ完了として返す。
+
+    Args:
+        settle_time: 書き込みが終わったとみなすまでの、サイズと mtime が変わらない秒数
+        clock: 現在時刻（秒）を返す関数（テスト用）
+    """
+
+    def __init__(self, settle_time: float = WRITE_SETTLE_TIME, clock: Callable[[], float] = time.monotonic):
+        self.settle_time = settle_time
+        self._clock = clock
+        self._lock = threading.Lock()
+        # パス → (サイズ, mtime_ns, 最後に変化を見た時刻)
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self._closed: Set[str] = set()
+        self._done: Set[str] = set()
+
+    def touch(self, path: str) -> None:
+        """作成・変更イベントを受けたファイルを保留に加える"""
+        with self._lock:
+            if path in self._done:
+                return
+            self._pending[path] = (-1, -1, self._clock())
+
+    def closed(self, path: str) -> None:
+        """書き込みを閉じたファイル（次の poll で完了として返す）"""
+        with self._lock:
+            if path in self._done:
+                return
+            self._pending.setdefault(path, (-1, -1, self._clock()))
+            self._closed.add(path)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def poll(self) -> List[str]:
+        """書き込みが終わったファイルを返す（消えたファイルは保留から外す）"""
+        now = self._clock()
+        ready: List[str] = []
+        with self._lock:
+            for path, (size, mtime_ns, changed_at) in list(self._pending.items()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._pending[path]
+                    self._closed.discard(path)
+                    continue
+                if st.st_size == 0:
+                    # 作成直後でまだ中身が無い
+                    continue
+                current = (st.st_size, st.st_mtime_ns)
+                if current != (size, mtime_ns):
+                    # close-write を受けていても、次の確認でサイズが同じことを確かめる
+                    self._pending[path] = (*current, now)
+                    continue
+                if path not in self._closed and now - changed_at < self.settle_time:
+                    continue
+                del self._pending[path]
+                self._closed.discard(path)
+                self._done.add(path)
+                ready.append(path)
+        return sorted(ready)
+
+class _MediaEventHandler(FileSystemEventHandler):
+    def __init__(self, debouncer: WriteDebouncer, extensions: Set[str]):
+        super().__init__()
+        self._debouncer = debouncer
+        self._extensions = extensions
+
+    def _matches(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return not name.startswith('.') and os.path.splitext(name)[1].lower() in self._extensions
+
+    def on_created(self, event):
+        if not event.is_directory and self._matches(event.src_path):
+            self._debouncer.touch(event.src_path)
+
+    def on_modified(self, event):
+        self.on_created(event)
+
+    def on_moved(self, event):
+        # 一時ファイル名で書き込んでから名前を変えるカメラ・アプリ向け
+        if not event.is_directory and self._matches(event.dest_path):
+            self._debouncer.touch(event.dest_path)
+
+    def on_closed(self, event):
+        if not event.is_directory and self._matches(event.src_path):
+            self._debouncer.closed(event.src_path)
+
+class MediaWatcher:
+    """DCIM フォルダ以下に新しく書き込まれたメディアファイルを検出する
+
+    watchdog でファイルシステムのイベントを購読し、書き込みが終わったファイルを
+    on_ready に渡す（WriteDebouncer 参照）。テザー撮影や Wi-Fi 付き SD カードのように、
+    アップロードの開始後に追加されたファイルを同じ実行の中で取り込むために使う。
+    on_ready を省略した場合は、ファイルをためておき get_ready() で受け取る。
+
+    Args:
+        dcim_paths: 監視する DCIM フォルダ
+        on_ready: 書き込みが終わったファイルのパスを受け取る関数（監視スレッドから呼ばれる）
+        settle_time: 書き込みが終わったとみなすまでの秒数
+        extensions: 対象の拡張子（小文字）。None の場合は SUPPORTED_EXTENSIONS
+    """
+
+    def __init__(
+        self,
+        dcim_paths: Sequence[Union[str, Path]],
+        on_ready: Optional[Callable[[str], None]] = None,
+        settle_time: float = WRITE_SETTLE_TIME,
+        extensions: Optional[Set[str]] = None,
+    ):
+        if not is_available():
+            raise RuntimeError("watchdog がインストールされていないため監視モードを使えません")
+        self.dcim_paths = [str(p) for p in dcim_paths]
+        self.settle_time = settle_time
+        self._ready: "queue.Queue[str]" = queue.Queue()
+        self._on_ready = on_ready or self._ready.put
+        self._debouncer = WriteDebouncer(settle_time)
+        self._handler = _MediaEventHandler(self._debouncer, extensions or SUPPORTED_EXTENSIONS)
+        self._observer = Observer()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="media-watcher", daemon=True)
+
+    def start(self) -> "MediaWatcher":
+        for path in self.dcim_paths:
+            self._observer.schedule(self._handler, path, recursive=True)
+        self._observer.start()
+        self._thread.start()
+        logger.info(f"新しいファイルの監視を開始: {', '.join(self.dcim_paths)}")
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        try:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+        except Exception as e:
+            logger.debug(f"ファイル監視の停止に失敗: {e}")
+        if self._thread.is_alive():
+            self._thread.join(timeout=5)
+
+    def get_ready(self, timeout: float = POLL_INTERVAL) -> List[str]:
+        """書き込みが終わったファイルを受け取る（on_ready を省略した場合）
+
+        ファイルが無ければ timeout 秒まで待ち、無ければ空のリストを返す。
+        """
+        try:
+            ready = [self._ready.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                ready.append(self._ready.get_nowait())
+            except queue.Empty:
+                return ready
+
+    def hold_recent(self, stats: Dict[str, Tuple[int, int]]) -> List[str]:
+        """走査で見つけたファイルのうち、まだ書き込み中かもしれないものを保留する
+
+        mtime が settle_time（と mtime の分解能）より新しいファイルや空のファイルは、
+        途中のサイズで送らないよう書き込みが終わってから on_ready / get_ready() で返す。
+
+        Args:
+            stats: パス → 走査時の (サイズ, mtime_ns)
+
+        Returns:
+            List[str]: 保留したファイル（呼び出し元はこの時点では送らないこと）
+        """
+        recent_ns = time.time_ns() - int((self.settle_time + MTIME_RESOLUTION) * 1_000_000_000)
+        held = sorted(path for path, (size, mtime_ns) in stats.items() if size == 0 or mtime_ns > recent_ns)
+        for path in held:
+            self._debouncer.touch(path)
+        if held:
+            logger.info(f"書き込み中の可能性があるファイル {len(held)} 件は書き込みが終わってから追加します")
+        return held
+
+    def alive(self) -> bool:
+        """監視中の DCIM フォルダが 1 つでも残っているか（SD カードが抜かれると False）"""
+        return any(os.path.isdir(path) for path in self.dcim_paths)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            for path in self._debouncer.poll():
+                try:
+                    self._on_ready(path)
+                except Exception as e:
+                    logger.error(f"新しいファイルの処理に失敗: {path} {e}")
@@ -20,6 +20,7 @@ import threading
 import queue
 import pygame
 from google_photos_uploader.ui.base_slideshow import BaseSlideshowApp  # 追加
+from google_photos_uploader.ledger import get_ledger
 from collections import OrderedDict  # 追加
 
 # ロギングの設定
@@ -33,6 +34,9 @@ logger = logging.getLogger(__name__)
 # 動画ファイルの拡張子
 VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.wmv', '.mkv'}
 
+# 監視モードで進捗ファイルに追加されたファイルを確認する間隔（ミリ秒）
+FOLLOW_INTERVAL_MS = 2000
+
 # --------------------------------------------------
 # スライドショー本体
 # --------------------------------------------------
@@ -53,7 +57,8 @@ class SlideshowApp(BaseSlideshowApp):
     """
     アップロード済み写真と動画を使ってスライドショーを表示するアプリケーション
     """
-    def __init__(self, root, image_files, interval=5, random_order=False, fullscreen=False, bgm_files=None, random_bgm=False):
+    def __init__(self, root, image_files, interval=5, random_order=False, fullscreen=False, bgm_files=None, random_bgm=False,
+                 follow_progress=False):
         # Base クラス初期化
         super().__init__(root,
                          interval=interval,
@@ -86,9 +91,14 @@ class SlideshowApp(BaseSlideshowApp):
         # place を用いて下部に重ねる
         self.status_label.place(relx=0.01, rely=0.97, anchor="sw")
         
+        # 監視モードのアップロードが追加したファイルを再生リストに取り込む
+        self._progress_mtime = self._progress_file_mtime()
+        if follow_progress:
+            self.root.after(FOLLOW_INTERVAL_MS, self.follow_progress_files)
+
         # 表示するファイルがあるか確認
         if not self.image_files:
-            self.show_error("アップロードされたファイルが見つかりません")
+            self.show_error("新しい写真を待っています" if follow_progress else "アップロードされたファイルが見つかりません")
             return
         
         # 最初のファイルを表示
@@ -330,6 +340,45 @@ class SlideshowApp(BaseSlideshowApp):
         # ポーリングは廃止
         # self.root.after(2000, self.update_status)
 
+    @staticmethod
+    def _progress_file_mtime():
+        try:
+            return (Path.home() / '.google_photos_uploader' / 'upload_progress.json').stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def follow_progress_files(self):
+        """進捗ファイルに追加されたファイルを再生リストに加える（監視モードのアップロード用）"""
+        mtime = self._progress_file_mtime()
+        if mtime is not None and mtime != self._progress_mtime:
+            self._progress_mtime = mtime
+            progress_path = Path.home() / '.google_photos_uploader' / 'upload_progress.json'
+            try:
+                with open(progress_path, 'r', encoding='utf-8') as f:
+                    files = json.load(f).get('files', [])
+                known = set(self.image_files)
+                added = [p for p in files if p not in known and os.path.exists(p)]
+                if added:
+                    self.add_files(added)
+            except Exception as e:
+                logger.debug(f"進捗ファイルの読み込みに失敗しました: {e}")
+        self.root.after(FOLLOW_INTERVAL_MS, self.follow_progress_files)
+
+    def add_files(self, files):
+        """再生リストにファイルを加える（新しく撮影した写真をすぐに見られるよう、現在の次に入れる）"""
+        was_empty = not self.image_files
+        position = 0 if was_empty else self.current_index + 1
+        self.image_files[position:position] = files
+        logger.info(f"新しいファイル {len(files)} 件を再生リストに追加しました")
+        if was_empty:
+            # 待機中の表示から再生を始める
+            self.image_label.config(text="")
+            self.current_index = 0
+            self.show_file()
+            self.update_music()
+        else:
+            self.update_status()
+
     def update_music(self):
         """BGM の再生状況を監視し次曲を再生"""
         if self.music_player and self.music_player.enabled:
@@ -369,31 +418,27 @@ class SlideshowApp(BaseSlideshowApp):
             logger.debug(f"prefetch 失敗: {e}")
 
 def find_pending_upload_files():
-    """アップロード予定のファイルを探す"""
-    # 失敗したファイルの記録を保持するファイル
-    failed_log = Path.home() / '.google_photos_uploader' / 'failed_files.json'
-    
+    """アップロード予定のファイルを探す（台帳に失敗として記録されているもの）"""
     pending_files = []
-    
-    # 失敗ログが存在すれば読み込む
-    if failed_log.exists():
-        try:
-            import json
-            with open(failed_log, 'r', encoding='utf-8') as f:
-                failed_files = json.load(f)
-                
-            # 失敗ファイルのパスを取得
-            for file_path in failed_files.keys():
-                if os.path.exists(file_path):
-                    pending_files.append(file_path)
-                    
-            logger.info(f"アップロード予定/失敗ファイル: {len(pending_files)}件が見つかりました")
-            
-        except Exception as e:
-            logger.error(f"失敗ファイルの読み込み中にエラーが発生しました: {e}")
-    
+    try:
+        pending_files = [p for p in get_ledger().failed_paths() if os.path.exists(p)]
+        logger.info(f"アップロード予定/失敗ファイル: {len(pending_files)}件が見つかりました")
+    except Exception as e:
+        logger.error(f"失敗ファイルの読み込み中にエラーが発生しました: {e}")
     return pending_files
 
+def _existing_files(paths, limit=None):
+    """存在するファイルのみを返す（limit 件見つかった時点で打ち切る）"""
+    existing = []
+    for path in paths:
+        if os.path.exists(path):
+            existing.append(path)
+            if limit is not None and len(existing) >= limit:
+                break
+        else:
+            logger.debug(f"ファイルが見つかりません（スキップします）: {path}")
+    return existing
+
 def load_uploaded_files(only_recent=False, include_pending=True):
     """アップロード済みファイルの一覧を読み込む
     
@@ -401,8 +446,6 @@ def load_uploaded_files(only_recent=False, include_pending=True):
         only_recent (bool): 最近アップロードされたファイルのみ取得する場合はTrue
         include_pending (bool): アップロード予定/失敗ファイルも含める場合はTrue
     """
-    uploaded_log = Path.home() / '.google_photos_uploader' / 'uploaded_files.txt'
-    
     result_files = []
     pending_files = []  # type: list
     
@@ -411,67 +454,34 @@ def load_uploaded_files(only_recent=False, include_pending=True):
         pending_files = find_pending_upload_files()
         result_files.extend(pending_files)
     
-    if not uploaded_log.exists():
-        logger.warning(f"アップロード済みファイルのログが見つかりません: {uploaded_log}")
-        return result_files
-        
     try:
-        # ファイルの更新時間を取得
-        log_mtime = None
+        ledger = get_ledger()
+        # 台帳はアップロード日時のインデックスで新しい順に返すため、
+        # 必要な件数が見つかった時点で存在確認を打ち切れる
         if only_recent:
-            if uploaded_log.exists():
-                log_stat = uploaded_log.stat()
-                log_mtime = datetime.fromtimestamp(log_stat.st_mtime)
-                logger.info(f"最近のアップロードを表示します（ログ更新日時: {log_mtime}）")
-        
-        # ファイルの内容を読み込む
-        with open(uploaded_log, 'r', encoding='utf-8') as f:
-            file_paths = [line.strip() for line in f.readlines()]
-        
-        # 存在するファイルのみをフィルタリング
-        existing_files = []
-        
-        if only_recent and log_mtime:
             # 指定時間内 (デフォルト24時間) にアップロードされたファイルのみを対象
             RECENT_HOURS = 24
             recent_threshold = datetime.now() - timedelta(hours=RECENT_HOURS)
-            for path in reversed(file_paths):  # 新しい順に確認
-                if not os.path.exists(path):
-                    continue
-                try:
-                    mtime = datetime.fromtimestamp(os.path.getmtime(path))
-                    if mtime >= recent_threshold:
-                        existing_files.insert(0, path)
-                except Exception:
-                    # タイムスタンプ取得に失敗した場合はスキップせず追加
-                    existing_files.insert(0, path)
-        
+            logger.info(f"最近のアップロードを表示します（{recent_threshold} 以降）")
+            existing_files = _existing_files(ledger.recent_uploads(since=recent_threshold.timestamp()))
+
             # 24時間以内のファイルが見つからない場合は、直近の200件のみを表示
             if not existing_files:
-                temp_files = [p for p in file_paths if os.path.exists(p)]
-                existing_files = temp_files[-200:]
-        
+                existing_files = _existing_files(ledger.recent_uploads(), limit=200)
         else:
-            # すべてのファイルを返す場合
-            for path in file_paths:
-                if os.path.exists(path):
-                    existing_files.append(path)
-                else:
-                    logger.debug(f"ファイルが見つかりません（スキップします）: {path}")
-        
-        # 結果に追加
-        result_files.extend(existing_files)
+            # アップロードがない（pending_files が空）場合は最新 100 件のみに制限する
+            limit = None if pending_files else 100
+            existing_files = _existing_files(ledger.recent_uploads(), limit=limit)
+
+        if not existing_files and not pending_files:
+            logger.warning("アップロード済みのファイルがありません")
+
+        # 古い順に再生できるように並べ替えて結果に追加
+        result_files.extend(reversed(existing_files))
         
         # 重複を排除
         result_files = list(dict.fromkeys(result_files))
 
-        # アップロードがない（pending_files が空）場合は最新 100 件のみに制限し、
-        # その 100 件を古い順に再生できるように並び順は維持する
-        if not pending_files and not only_recent and len(result_files) > 100:
-            logger.info(f"アップロード中ファイルがないため、最新 100 件に絞り込みます (全 {len(result_files)} 件) → 100 件")
-            # result_files は古い順になっているため、末尾 100 件が最新 100 件
-            result_files = result_files[-100:]
-        
         mode_str = "最近の" if only_recent else "すべての"
         logger.info(f"{mode_str}ファイル: {len(result_files)}件が利用可能")
         return result_files
@@ -488,6 +498,7 @@ def main():
     parser.add_argument('--fullscreen', action='store_true', help='フルスクリーンモードで表示する')
     parser.add_argument('--verbose', action='store_true', help='詳細なログを出力する')
     parser.add_argument('--current', action='store_true', help='現在アップロード中の写真のみ表示する')
+    parser.add_argument('--follow', action='store_true', help='監視モードのアップロードが追加したファイルも表示する（--current と併用）')
     parser.add_argument('--no-pending', action='store_true', help='アップロード予定/失敗ファイルを含めない')
     parser.add_argument('--bgm', nargs='*', help='BGMとして再生する音楽ファイルまたはディレクトリ（複数指定可）')
     parser.add_argument('--random-bgm', action='store_true', help='BGMをランダムに再生する')
@@ -504,7 +515,7 @@ def main():
     else:
         image_files = load_uploaded_files(only_recent=False, include_pending=not args.no_pending)
     
-    if not image_files:
+    if not image_files and not args.follow:
         logger.error("表示できる画像がありません")
         print("アップロード済み写真が見つかりません。先に写真をアップロードしてください。")
         sys.exit(1)
@@ -544,7 +555,8 @@ def main():
         random_order=args.random,
         fullscreen=args.fullscreen,
         bgm_files=bgm_files,
-        random_bgm=args.random_bgm
+        random_bgm=args.random_bgm,
+        follow_progress=args.follow
     )
     
     # イベントループの開始
@@ -0,0 +1,327 @@
+"""テスト用の Google Photos API スタンドイン
+
+ローカルの HTTP サーバーとして ``/v1/uploads`` (raw / resumable)、
+``/v1/mediaItems:batchCreate`` と ``/v1/albums`` を実装する。
+応答遅延・接続ごとの帯域上限・エラー率を設定でき、ベンチマークからも利用する。
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakePhotosAPI:
+    """Google Photos API のアップロードエンドポイントを模したローカルサーバー
+
+    Args:
+        granularity: resumable セッション開始時に返すチャンク粒度
+        fail_chunk_at: 指定した回数目のチャンクを途中まで受信した時点で 503 を返す
+            (レジューム動作の確認用)。None の場合は失敗させない
+        throttle: 最初の N リクエストに ``429 Retry-After: 0`` を返す
+        albums: 既存アルバムのタイトル一覧
+        album_page_size: アルバム一覧の 1 ページあたりの最大件数
+        store_bodies: False の場合、アップロードされたバイトを保持せずに読み捨てる
+            (ベンチマークでサーバー側のメモリ使用量を抑える用)
+        latency: 各リクエストの応答前に加える遅延（秒）
+        bandwidth: アップロード本文の受信速度の上限（接続ごと、バイト/秒）。None の場合は無制限
+        error_rate: 各リクエストに 503 を返す確率 (0.0 - 1.0)
+        retry_after: error_rate による 503 に付ける Retry-After ヘッダーの値
+        seed: error_rate の乱数シード
+        expired_tokens: 失効したアクセストークン。``Authorization: Bearer <token>`` が
+            これらのいずれかの場合は 401 を返す
+    """
+
+    def __init__(
+        self,
+        granularity: int = 256 * 1024,
+        fail_chunk_at: int | None = None,
+        throttle: int = 0,
+        albums: list[str] | None = None,
+        album_page_size: int = 50,
+        store_bodies: bool = True,
+        latency: float = 0.0,
+        bandwidth: int | None = None,
+        error_rate: float = 0.0,
+        retry_after: str | None = None,
+        seed: int | None = None,
+        expired_tokens: set[str] | None = None,
+    ):
+        self.granularity = granularity
+        self.fail_chunk_at = fail_chunk_at
+        self.throttle = throttle
+        self.albums: list[dict] = [{"id": f"album-{i}", "title": t} for i, t in enumerate(albums or [])]
+        self.album_page_size = album_page_size
+        self.store_bodies = store_bodies
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.expired_tokens = set(expired_tokens or ())
+        self.errors = 0
+        self._random = random.Random(seed)
+        self.media_items: list[dict] = []
+        self.sessions: dict[str, dict] = {}
+        self.uploads: dict[str, bytes] = {}
+        self.requests: list[tuple[str, str]] = []
+        self.connections: set[tuple] = set()
+        self._chunk_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakePhotosAPI":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --------------------------------------------------
+    # リクエスト処理
+    # --------------------------------------------------
+
+    def _new_token(self, data: bytes) -> str:
+        token = f"token-{uuid.uuid4().hex}"
+        with self._lock:
+            self.uploads[token] = data
+        return token
+
+    def _read_body(self, handler, length: int, upload: bool) -> bytes:
+        if not upload or (self.store_bodies and not self.bandwidth):
+            return handler.rfile.read(length) if length else b""
+
+        # 帯域上限に合わせて少しずつ受信する
+        chunks = []
+        received = 0
+        started = time.monotonic()
+        while received < length:
+            chunk = handler.rfile.read(min(length - received, 64 * 1024))
+            if not chunk:
+                break
+            received += len(chunk)
+            if self.store_bodies:
+                chunks.append(chunk)
+            if self.bandwidth:
+                ahead = received / self.bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        return b"".join(chunks)
+
+    def _inject_error(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    def _handle_uploads(self, handler, body: bytes):
+        protocol = handler.headers.get("X-Goog-Upload-Protocol")
+        if protocol == "raw":
+            handler.send_text(200, self._new_token(body))
+            return
+
+        if protocol == "resumable" and handler.headers.get("X-Goog-Upload-Command") == "start":
+            session_id = uuid.uuid4().hex
+            with self._lock:
+                self.sessions[session_id] = {
+                    "size": int(handler.headers.get("X-Goog-Upload-Raw-Size", 0)),
+                    "data": bytearray(),
+                    "received": 0,
+                    "status": "active",
+                    "token": None,
+                }
+            host, port = self._server.server_address[:2]
+            handler.send_text(200, "", {
+                "X-Goog-Upload-URL": f"http://{host}:{port}/upload/{session_id}",
+                "X-Goog-Upload-Chunk-Granularity": str(self.granularity),
+                "X-Goog-Upload-Status": "active",
+            })
+            return
+
+        handler.send_text(400, "unsupported upload protocol")
+
+    def _handle_session(self, handler, session_id: str, body: bytes, length: int):
+        session = self.sessions.get(session_id)
+        if session is None:
+            handler.send_text(404, "no such session")
+            return
+
+        command = handler.headers.get("X-Goog-Upload-Command", "")
+        if command == "query":
+            handler.send_text(200, session["token"] or "", {
+                "X-Goog-Upload-Status": session["status"],
+                "X-Goog-Upload-Size-Received": str(session["received"]),
+            })
+            return
+
+        offset = int(handler.headers.get("X-Goog-Upload-Offset", -1))
+        if offset != session["received"]:
+            handler.send_text(400, f"offset mismatch: {offset} != {session['received']}")
+            return
+
+        with self._lock:
+            self._chunk_count += 1
+            fail = self._chunk_count == self.fail_chunk_at
+
+        if fail:
+            # 途中までのバイトだけを受信したことにして失敗させる
+            session["data"].extend(body[: len(body) // 2])
+            session["received"] += length // 2
+            handler.send_text(503, "transient failure")
+            return
+
+        session["data"].extend(body)
+        session["received"] += length
+        if "finalize" in command:
+            session["status"] = "final"
+            session["token"] = self._new_token(bytes(session["data"]))
+            handler.send_text(200, session["token"], {"X-Goog-Upload-Status": "final"})
+        else:
+            handler.send_text(200, "", {"X-Goog-Upload-Status": "active"})
+
+    def _handle_batch_create(self, handler, body: bytes):
+        request = json.loads(body or b"{}")
+        album_id = request.get("albumId")
+        if album_id and not any(a["id"] == album_id for a in self.albums):
+            handler.send_json(400, {"error": {"message": "invalid album"}})
+            return
+
+        results = []
+        for item in request.get("newMediaItems", []):
+            simple = item.get("simpleMediaItem", {})
+            token = simple.get("uploadToken")
+            if token in self.uploads:
+                media_item = {"id": f"media-{uuid.uuid4().hex}", "filename": simple.get("fileName")}
+                with self._lock:
+                    self.media_items.append(dict(media_item, albumId=album_id))
+                results.append({"uploadToken": token, "status": {"message": "Success"}, "mediaItem": media_item})
+            else:
+                results.append({"uploadToken": token, "status": {"code": 3, "message": "invalid token"}})
+        handler.send_json(200, {"newMediaItemResults": results})
+
+    def _handle_albums(self, handler, method: str, query: dict, body: bytes):
+        if method == "POST":
+            title = json.loads(body)["album"]["title"]
+            album = {"id": f"album-{uuid.uuid4().hex}", "title": title}
+            with self._lock:
+                self.albums.append(album)
+            handler.send_json(200, album)
+            return
+
+        size = min(int(query.get("pageSize", ["20"])[0]), self.album_page_size)
+        start = int(query.get("pageToken", ["0"])[0])
+        page = {"albums": self.albums[start : start + size]}
+        if start + size < len(self.albums):
+            page["nextPageToken"] = str(start + size)
+        handler.send_json(200, page)
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_text(self, status: int, text: str, headers: dict | None = None):
+                payload = text.encode()
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def send_json(self, status: int, data: dict):
+                self.send_text(status, json.dumps(data), {"Content-Type": "application/json"})
+
+            def do_GET(self):
+                self.do_POST(method="GET")
+
+            def do_POST(self, method: str = "POST"):
+                length = int(self.headers.get("Content-Length", 0))
+                url = urlsplit(self.path)
+                upload = url.path == "/v1/uploads" or url.path.startswith("/upload/")
+                body = api._read_body(self, length, upload)
+                api.requests.append((method, url.path))
+                api.connections.add(self.client_address)
+                with api._lock:
+                    throttled = api.throttle > 0
+                    api.throttle -= throttled
+                if throttled:
+                    self.send_text(429, "rate limited", {"Retry-After": "0"})
+                    return
+                if self.headers.get("Authorization", "").removeprefix("Bearer ") in api.expired_tokens:
+                    self.send_text(401, "token expired")
+                    return
+                if api.latency:
+                    time.sleep(api.latency)
+                if api._inject_error():
+                    self.send_text(503, "injected failure", {"Retry-After": api.retry_after} if api.retry_after else None)
+                    return
+                if url.path == "/v1/uploads":
+                    api._handle_uploads(self, body)
+                elif url.path.startswith("/upload/"):
+                    api._handle_session(self, url.path.rsplit("/", 1)[-1], body, length)
+                elif url.path == "/v1/mediaItems:batchCreate":
+                    api._handle_batch_create(self, body)
+                elif url.path == "/v1/albums":
+                    api._handle_albums(self, method, parse_qs(url.query), body)
+                else:
+                    self.send_text(404, "not found")
+
+        return Handler
+
+
+def main():
+    """別プロセスで起動するためのエントリーポイント（ベンチマーク用）
+
+    起動後に base_url を 1 行出力し、終了させられるまで待機する。
+    """
+    parser = argparse.ArgumentParser(description="Google Photos API のスタンドインを起動")
+    parser.add_argument("--store-bodies", action="store_true", help="アップロードされたバイトを保持する")
+    parser.add_argument("--latency", type=float, default=0.0, help="応答遅延（秒）")
+    parser.add_argument("--bandwidth", type=float, default=None, help="接続ごとの受信速度上限 (MB/s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 を返す確率")
+    parser.add_argument("--retry-after", default=None, help="503 に付ける Retry-After の値")
+    parser.add_argument("--seed", type=int, default=None, help="エラー注入の乱数シード")
+    args = parser.parse_args()
+
+    api = FakePhotosAPI(
+        store_bodies=args.store_bodies,
+        latency=args.latency,
+        bandwidth=int(args.bandwidth * 1024 * 1024) if args.bandwidth else None,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    ).start()
+    print(api.base_url, flush=True)
+    try:
+        api._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main()
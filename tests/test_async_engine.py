@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+pytest.importorskip("aiohttp")
+
+from google_photos_uploader import async_engine, service
+from google_photos_uploader.service import ratelimit
+from fake_photos_api import FakePhotosAPI
+
+
+def test_run_async_uploads(monkeypatch, tmp_path):
+    files = []
+    for i in range(20):
+        path = tmp_path / f"IMG_{i:04d}.JPG"
+        path.write_bytes(os.urandom(10_000 + i))
+        files.append(str(path))
+
+    creds = SimpleNamespace(token="test-token", valid=True, expired=False, refresh_token=None)
+    results = {}
+
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=None))
+    with FakePhotosAPI(throttle=3) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        monkeypatch.setattr(async_engine, "READ_CHUNK_SIZE", 4096)
+        async_engine.run_async_uploads(
+            files, lambda: creds, lambda fp, idx, token: results.__setitem__(fp, token), concurrency=8
+        )
+
+        assert set(results) == set(files)
+        for fp, token in results.items():
+            assert api.uploads[token] == open(fp, "rb").read()
+
+
+def test_large_uploads_do_not_starve_on_default_executor(monkeypatch, tmp_path):
+    # 大きなファイルの同期アップロードは送信中の間スレッドを占有する。
+    # concurrency 件が同時に進めること（既定の executor の上限に縛られないこと）を確かめる
+    concurrency = 16
+    files = []
+    for i in range(concurrency):
+        path = tmp_path / f"MVI_{i:04d}.MP4"
+        path.write_bytes(b"x" * 64)
+        files.append(str(path))
+    barrier = threading.Barrier(concurrency, timeout=5)
+
+    def _upload_media(path, creds, verbose=False):
+        barrier.wait()
+        return f"token-{path.name}"
+
+    monkeypatch.setattr(service, "RESUMABLE_THRESHOLD", 1)
+    monkeypatch.setattr(service, "upload_media", _upload_media)
+    creds = SimpleNamespace(token="test-token", valid=True, expired=False, refresh_token=None)
+    results = {}
+    threads = set()
+
+    def _on_complete(fp, idx, token):
+        # 完了時の記録（SQLite への書き込み）はイベントループのスレッドで行わない
+        threads.add(threading.current_thread().name)
+        results[fp] = token
+
+    async_engine.run_async_uploads(files, lambda: creds, _on_complete, concurrency=concurrency)
+    assert all(results[fp] == f"token-{os.path.basename(fp)}" for fp in files)
+    assert len(threads) == 1 and threads.pop().startswith("async-complete")
+
+
+def test_run_async_uploads_refreshes_expired_token_once(monkeypatch, tmp_path):
+    files = []
+    for i in range(8):
+        path = tmp_path / f"IMG_{i:04d}.JPG"
+        path.write_bytes(os.urandom(4096 + i))
+        files.append(str(path))
+
+    refreshes = []
+
+    def _refresh(request):
+        refreshes.append(request)
+        creds.token = "fresh-token"
+
+    creds = SimpleNamespace(token="expired-token", valid=True, expired=False, refresh_token="refresh", refresh=_refresh)
+    results = {}
+
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=None))
+    with FakePhotosAPI(expired_tokens={"expired-token"}) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        async_engine.run_async_uploads(
+            files, lambda: creds, lambda fp, idx, token: results.__setitem__(fp, token), concurrency=8
+        )
+
+    # 同時に 401 を受けたアップロードがあっても、リフレッシュは 1 度だけ行い、すべて再送する
+    assert len(refreshes) == 1
+    assert set(results) == set(files) and all(results.values())
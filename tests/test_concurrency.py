@@ -0,0 +1,80 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader import concurrency
+from google_photos_uploader.concurrency import AIMDController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def _run_window(controller, clock, nbytes, elapsed, duration):
+    for _ in range(max(concurrency.MIN_WINDOW, controller.limit)):
+        controller.record(nbytes, elapsed)
+    clock.now += duration
+
+
+def test_aimd_increases_while_throughput_improves(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(concurrency.time, "monotonic", clock.monotonic)
+    controller = AIMDController(initial=4, maximum=6)
+
+    # 1 秒毎に並列数と同じ件数が完了する（並列数に比例してスループットが伸びる）
+    for _ in range(5):
+        clock.now += 1.0
+        _run_window(controller, clock, 1_000_000, 0.5, 0.0)
+
+    assert controller.limit == 6
+
+
+def test_aimd_holds_limit_on_flat_throughput(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(concurrency.time, "monotonic", clock.monotonic)
+    controller = AIMDController(initial=4, maximum=16)
+
+    # 並列数によらず 4 MB/s で頭打ちの回線（レイテンシは悪化しない）
+    for _ in range(6):
+        clock.now += max(concurrency.MIN_WINDOW, controller.limit) * 0.25
+        _run_window(controller, clock, 1_000_000, 0.5, 0.0)
+
+    # 最初のウィンドウで 1 つ増やした後は、横ばいの間は増やさない
+    assert controller.limit == 5
+
+
+def test_aimd_halves_on_429_and_5xx(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(concurrency.time, "monotonic", clock.monotonic)
+    controller = AIMDController(initial=8)
+
+    controller.observe_response(SimpleNamespace(status_code=200))
+    assert controller.limit == 8
+    controller.observe_response(SimpleNamespace(status_code=429))
+    assert controller.limit == 4
+    # クールダウン中の連続した 429 では減らさない
+    controller.observe_response(SimpleNamespace(status_code=429))
+    assert controller.limit == 4
+    clock.now += concurrency.DECREASE_COOLDOWN
+    controller.observe_response(SimpleNamespace(status_code=503))
+    assert controller.limit == 2
+
+
+def test_aimd_decreases_when_latency_rises_without_gain(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(concurrency.time, "monotonic", clock.monotonic)
+    controller = AIMDController(initial=4)
+
+    clock.now += 1.0
+    _run_window(controller, clock, 1_000_000, 0.5, 0.0)
+    assert controller.limit == 5
+    # 同じスループットのままレイテンシが 3 倍
+    clock.now += 1.0
+    _run_window(controller, clock, 800_000, 1.5, 0.0)
+    assert controller.limit == 2
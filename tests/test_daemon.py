@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader import daemon, uploader
+
+
+@pytest.fixture
+def socket_path():
+    # Unix ソケットのパス長制限があるため短い一時ディレクトリを使う
+    with tempfile.TemporaryDirectory(dir="/tmp") as tmp:
+        yield Path(tmp) / "uploader.sock"
+
+
+@pytest.fixture
+def fake_upload(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def _upload_photos(
+        dcim_path,
+        album_name=None,
+        verbose=False,
+        engine="thread",
+        on_progress=None,
+        cancel=None,
+        watch=False,
+        scan_cache=True,
+    ):
+        calls.append(str(dcim_path) + (" (watch)" if watch else "") + ("" if scan_cache else " (no-cache)"))
+        on_progress({"event": "started", "total": 2})
+        for i in range(2):
+            release.wait(5)
+            if cancel.is_set():
+                break
+            on_progress({"event": "file", "file": f"{dcim_path}/{i}.jpg", "success": True, "completed": i + 1, "total": 2})
+        return True
+
+    monkeypatch.setattr(uploader, "upload_photos", _upload_photos)
+    monkeypatch.setattr(uploader, "recover_pending_tokens", lambda: 0)
+    return calls, release
+
+
+@pytest.fixture
+def running_daemon(socket_path, fake_upload):
+    d = daemon.UploadDaemon(socket_path).start()
+    thread = threading.Thread(target=d.serve_forever, daemon=True)
+    thread.start()
+    yield d
+    d.shutdown()
+
+
+def test_submit_follow_streams_progress(running_daemon, socket_path, fake_upload):
+    _, release = fake_upload
+    release.set()
+    events = []
+    done = daemon.submit_job("/card/DCIM", "Album", follow=True, on_event=events.append, socket_path=socket_path)
+    assert done["event"] == "done" and done["status"] == "done" and done["success"] is True
+    assert [e["event"] for e in events] == ["started", "file", "file", "done"]
+    assert daemon.is_running(socket_path)
+
+
+def test_jobs_run_by_priority_and_can_be_cancelled(running_daemon, socket_path, fake_upload):
+    calls, release = fake_upload
+    first = daemon.submit_job("/a", socket_path=socket_path)
+    low = daemon.submit_job("/low", priority=0, socket_path=socket_path)
+    high = daemon.submit_job("/high", priority=5, socket_path=socket_path)
+    # 同じディレクトリの再投入は既存ジョブを返す
+    assert daemon.submit_job("/low", socket_path=socket_path)["job_id"] == low["job_id"]
+    assert daemon.has_active_jobs(socket_path)
+
+    assert daemon.cancel_jobs(low["job_id"], socket_path=socket_path)
+    release.set()
+    for event in daemon.stream({"cmd": "watch", "job_id": high["job_id"]}, socket_path):
+        pass
+
+    statuses = {job["job_id"]: job["status"] for job in daemon.get_status(socket_path)}
+    assert statuses == {first["job_id"]: "done", low["job_id"]: "cancelled", high["job_id"]: "done"}
+    assert calls == ["/a", "/high"]
+    assert not daemon.has_active_jobs(socket_path)
+
+
+def test_submit_watch_job_passes_watch_to_uploader(running_daemon, socket_path, fake_upload):
+    calls, release = fake_upload
+    release.set()
+    job = daemon.submit_job("/card/DCIM", watch=True, socket_path=socket_path)
+    assert job["watch"] is True
+    for event in daemon.stream({"cmd": "watch", "job_id": job["job_id"]}, socket_path):
+        pass
+    assert calls == ["/card/DCIM (watch)"]
+
+
+def test_submit_job_can_disable_scan_cache(running_daemon, socket_path, fake_upload):
+    calls, release = fake_upload
+    release.set()
+    done = daemon.submit_job("/card/DCIM", scan_cache=False, follow=True, socket_path=socket_path)
+    assert done["status"] == "done"
+    assert calls == ["/card/DCIM (no-cache)"]
+
+
+def test_client_reports_missing_daemon(socket_path):
+    assert not daemon.is_running(socket_path)
+    assert daemon.get_status(socket_path) is None
+    assert daemon.submit_job("/card/DCIM", socket_path=socket_path) is None
+
+
+def test_job_keeps_only_recent_events(monkeypatch):
+    monkeypatch.setattr(daemon, "MAX_JOB_EVENTS", 5)
+    job = daemon.DaemonJob("/card/DCIM", None, 0, "sync", False, watch=True)
+    for i in range(20):
+        job.emit({"event": "file", "completed": i + 1, "total": 20})
+    job.finish("done", True)
+    assert len(job._events) == 5
+    # 遅れて購読しても残っているイベントから続き、完了イベントで終わる
+    events = list(job.events())
+    assert [e.get("completed") for e in events] == [17, 18, 19, 20, None]
+    assert events[-1]["event"] == "done"
@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader import dedup
+from google_photos_uploader.dedup import DedupIndex, content_key, full_content_hash
+
+
+def test_content_key_ignores_path_and_samples_large_files(tmp_path):
+    data = os.urandom(dedup.SAMPLE_SIZE * 5)
+    a = tmp_path / "a.jpg"
+    b = tmp_path / "b" / "IMG_0001.JPG"
+    b.parent.mkdir()
+    a.write_bytes(data)
+    b.write_bytes(data)
+    assert content_key(a) == content_key(b)
+    assert content_key(a).startswith(f"{len(data)}-")
+
+    # 先頭・中央・末尾のいずれかが変われば別のキーになる
+    for offset in (0, len(data) // 2, len(data) - 1):
+        changed = bytearray(data)
+        changed[offset] ^= 0xFF
+        b.write_bytes(bytes(changed))
+        assert content_key(b) != content_key(a)
+
+    assert content_key(tmp_path / "missing.jpg") is None
+
+
+def test_content_keys_reuse_fingerprint_across_mount_points(monkeypatch, tmp_path):
+    index = DedupIndex(tmp_path / "uploader.db")
+    for mount in ("PHOTO_UPLOAD_SD", "disk"):
+        (tmp_path / mount).mkdir()
+    photo = tmp_path / "PHOTO_UPLOAD_SD" / "DCIM" / "IMG_0001.JPG"
+    photo.parent.mkdir()
+    photo.write_bytes(b"photo")
+    # どちらのマウント先でも同じボリューム（UUID）として扱う
+    monkeypatch.setattr(dedup, "get_volume_id", lambda path, mountinfo=None: ("uuid:CARD", path.parent))
+
+    hashed = []
+    real_content_key = dedup.content_key
+    monkeypatch.setattr(dedup, "content_key", lambda p: hashed.append(p) or real_content_key(p))
+
+    first = index.content_keys([str(photo)])
+    remounted = tmp_path / "disk" / "DCIM" / "IMG_0001.JPG"
+    photo.parent.rename(remounted.parent)
+    assert index.content_keys([str(remounted)]) == {str(remounted): first[str(photo)]}
+    assert hashed == [str(photo)]
+
+    # 内容が変われば（サイズ・mtime が変われば）計算し直す
+    remounted.write_bytes(b"edited photo")
+    assert index.content_keys([str(remounted)])[str(remounted)] != first[str(photo)]
+    assert hashed == [str(photo), str(remounted)]
+    index.close()
+
+
+def test_known_hashes_separate_files_with_the_same_sampled_key(tmp_path):
+    index = DedupIndex(tmp_path / "uploader.db")
+    data = os.urandom(dedup.SAMPLE_SIZE * 5)
+    original = tmp_path / "IMG_0001.JPG"
+    original.write_bytes(data)
+    edited = bytearray(data)
+    edited[dedup.SAMPLE_SIZE + 10] ^= 0xFF
+    other = tmp_path / "IMG_0001_edit.JPG"
+    other.write_bytes(bytes(edited))
+
+    keys = index.content_keys([str(original), str(other)])
+    assert keys[str(original)] == keys[str(other)]
+    index.add({str(original): keys[str(original)]})
+    # 内容キーは一致しても、全体のハッシュで別のファイルと分かる
+    assert index.known_hashes([keys[str(other)]]) == {keys[str(original)]: {full_content_hash(original)}}
+    assert index.full_hashes([str(other)])[str(other)] != full_content_hash(original)
+    index.close()
@@ -0,0 +1,47 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader import jobstore
+from google_photos_uploader.jobstore import JobStore
+
+
+def test_job_store_tracks_states_across_reopen(tmp_path):
+    path = tmp_path / "uploader.db"
+    store = JobStore(path)
+    store.discover({"/a.jpg": (10, 1), "/b.jpg": (20, 2), "/c.jpg": (30, 3)})
+    store.mark_uploaded("/a.jpg", "token-a")
+    store.mark_uploaded("/b.jpg", "token-b")
+    store.mark_created(["/b.jpg"])
+    store.mark_failed("/c.jpg", "TOKEN_FAILED")
+    store.close()
+
+    # 再起動後も最後にコミットした状態が残っている
+    store = JobStore(path)
+    assert store.states(["/a.jpg", "/b.jpg", "/c.jpg", "/d.jpg"]) == {
+        "/a.jpg": jobstore.STATE_UPLOADED,
+        "/b.jpg": jobstore.STATE_CREATED,
+        "/c.jpg": jobstore.STATE_FAILED,
+    }
+    assert store.valid_tokens() == {"/a.jpg": "token-a"}
+    assert store.created(["/a.jpg", "/b.jpg"]) == {"/b.jpg"}
+
+
+def test_job_store_resets_changed_files_and_expires_tokens(tmp_path, monkeypatch):
+    store = JobStore(tmp_path / "uploader.db")
+    store.discover({"/a.jpg": (10, 1), "/b.jpg": (20, 2)})
+    store.mark_uploaded("/a.jpg", "token-a")
+    store.mark_uploaded("/b.jpg", "token-b")
+
+    # 同じパスでも内容が変わったファイルは最初からやり直す
+    store.discover({"/a.jpg": (11, 1), "/b.jpg": (20, 2)})
+    assert store.states(["/a.jpg"]) == {"/a.jpg": jobstore.STATE_DISCOVERED}
+    assert store.valid_tokens(["/a.jpg", "/b.jpg"]) == {"/b.jpg": "token-b"}
+
+    # 同じトークンを記録し直しても取得時刻は変わらず、期限切れで使われなくなる
+    now = time.time()
+    monkeypatch.setattr(jobstore.time, "time", lambda: now + jobstore.TOKEN_TTL + 1)
+    store.mark_uploaded("/b.jpg", "token-b")
+    assert store.valid_tokens() == {}
@@ -0,0 +1,81 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader import ledger
+from google_photos_uploader.ledger import UploadLedger
+
+
+def test_record_and_query(tmp_path):
+    book = UploadLedger(tmp_path / "uploader.db")
+    book.record_uploaded(["/a.jpg", "/b.jpg"], "Trip", {"/a.jpg": "1-aa"}, {"/b.jpg": "media-b"})
+    assert book.record_failed("/c.jpg", "BATCH_FAILED") == 1
+    assert book.record_failed("/c.jpg", "TOKEN_FAILED") == 2
+
+    entries = book.lookup(["/a.jpg", "/b.jpg", "/c.jpg", "/d.jpg"])
+    assert set(entries) == {"/a.jpg", "/b.jpg"}
+    assert entries["/a.jpg"]["content_key"] == "1-aa" and entries["/b.jpg"]["media_item_id"] == "media-b"
+    state = book.retry_state(["/a.jpg", "/c.jpg"])
+    assert state == {"/c.jpg": {"retry_count": 2, "last_error": "TOKEN_FAILED", "last_attempt": state["/c.jpg"]["last_attempt"]}}
+    assert book.failed_paths() == ["/c.jpg"]
+
+    # 失敗していたファイルの成功で失敗の記録が消える
+    book.record_uploaded(["/c.jpg"])
+    assert book.uploaded(["/a.jpg", "/c.jpg", "/d.jpg"]) == {"/a.jpg", "/c.jpg"}
+    assert book.failed_paths() == []
+    assert book.recent_uploads()[0] == "/c.jpg"
+    assert sorted(book.unhashed("/")) == ["/b.jpg", "/c.jpg"]
+    book.close()
+
+
+def test_retry_journal_is_append_only_and_compacts(tmp_path):
+    book = UploadLedger(tmp_path / "uploader.db")
+
+    def _events():
+        return book._conn.execute("SELECT COUNT(*) FROM retry_events").fetchone()[0]
+
+    for i in range(3):
+        book.record_failed("/x.jpg", f"E{i}")
+        book.record_failed("/y.jpg", "BATCH_FAILED")
+    book.record_uploaded(["/y.jpg"])
+    assert _events() == 7
+    before = book.retry_state()
+
+    assert book.maybe_compact() == 0
+    assert book.maybe_compact(min_events=0) == 6
+    assert _events() == 1
+    assert book.retry_state() == before == {
+        "/x.jpg": {"retry_count": 3, "last_error": "E2", "last_attempt": before["/x.jpg"]["last_attempt"]}
+    }
+    # 圧縮後も追記と畳み込みが続けられる
+    assert book.record_failed("/x.jpg", "E3") == 4
+    book.close()
+
+
+def test_import_legacy_logs_once(tmp_path):
+    base = tmp_path / "home"
+    base.mkdir()
+    (base / ledger.LEGACY_UPLOADED_LOG).write_text("/card/DCIM/1.jpg\n/card/DCIM/2.jpg\n\n/card/DCIM/1.jpg\n")
+    (base / ledger.LEGACY_FAILED_LOG).write_text(
+        json.dumps(
+            {
+                "/card/DCIM/3.jpg": {"retry_count": 2, "last_error": "BATCH_FAILED", "last_attempt": "2024-05-01 10:00:00"},
+                "/card/DCIM/2.jpg": {"retry_count": 1, "last_error": "BATCH_FAILED"},
+            }
+        )
+    )
+    book = UploadLedger(tmp_path / "uploader.db")
+    assert book.import_legacy(base) == 3
+    assert book.import_legacy(base) == 0
+    assert not (base / ledger.LEGACY_UPLOADED_LOG).exists()
+    assert (base / (ledger.LEGACY_UPLOADED_LOG + ledger.IMPORTED_SUFFIX)).exists()
+
+    # ログの記録順（新しい順）を保ち、アップロード済みのファイルは失敗として取り込まない
+    assert book.recent_uploads() == ["/card/DCIM/2.jpg", "/card/DCIM/1.jpg"]
+    assert book.uploaded(["/card/DCIM/2.jpg", "/card/DCIM/3.jpg"]) == {"/card/DCIM/2.jpg"}
+    assert book.failed_paths() == ["/card/DCIM/3.jpg"]
+    assert book.retry_state()["/card/DCIM/3.jpg"]["retry_count"] == 2
+    assert sorted(book.unhashed("/card/DCIM/")) == ["/card/DCIM/1.jpg", "/card/DCIM/2.jpg"]
+    book.close()
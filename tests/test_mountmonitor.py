@@ -0,0 +1,92 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader.mountmonitor import MountMonitor
+
+
+def _write_mountinfo(path, mounts):
+    # 実際の mountinfo と同じ形式で、読み込み途中の状態が見えないよう置き換える
+    lines = ["22 1 179:2 / / rw,noatime shared:1 - ext4 /dev/root rw"]
+    for i, (mount_point, device) in enumerate(mounts.items()):
+        escaped = str(mount_point).replace(" ", "\\040")
+        lines.append(f"{100 + i} 22 179:{i + 10} / {escaped} rw,nosuid shared:{i + 2} - vfat {device} rw")
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+
+def _card(media, name):
+    (media / name / "DCIM").mkdir(parents=True)
+    return media / name
+
+
+class _Events:
+    def __init__(self):
+        self.items = []
+        self.cond = threading.Condition()
+
+    def add(self, kind, path):
+        with self.cond:
+            self.items.append((kind, path))
+            self.cond.notify_all()
+
+    def wait(self, count, timeout=5.0):
+        with self.cond:
+            assert self.cond.wait_for(lambda: len(self.items) >= count, timeout)
+            return list(self.items)
+
+
+def test_monitor_reports_mounted_and_removed_cards(tmp_path):
+    media = tmp_path / "media"
+    first = _card(media, "CARD_A")
+    second = _card(media, "PHOTO UPLOAD")
+    mountinfo = tmp_path / "mountinfo"
+    _write_mountinfo(mountinfo, {first: "/dev/sda1"})
+    events = _Events()
+
+    monitor = MountMonitor(str(mountinfo), roots=[str(media)], interval=0.02)
+    monitor.register(lambda p: events.add("mount", p), lambda p: events.add("unmount", p))
+    with monitor:
+        # 開始時点でマウント済みのカードは通知しない
+        assert monitor.cards() == [first]
+        _write_mountinfo(mountinfo, {first: "/dev/sda1", second: "/dev/sdb1"})
+        assert events.wait(1) == [("mount", second)]
+        _write_mountinfo(mountinfo, {second: "/dev/sdb1"})
+        assert events.wait(2)[1] == ("unmount", first)
+        assert monitor.cards() == [second]
+
+
+def test_monitor_ignores_mounts_without_dcim_or_outside_roots(tmp_path):
+    media = tmp_path / "media"
+    card = _card(media, "CARD_A")
+    (media / "USB").mkdir()
+    other = _card(tmp_path / "srv", "CARD_B")
+    mountinfo = tmp_path / "mountinfo"
+    _write_mountinfo(mountinfo, {})
+    monitor = MountMonitor(str(mountinfo), roots=[str(media)])
+    mounted = []
+    monitor.register(mounted.append)
+    monitor.start()
+    monitor.stop()
+
+    _write_mountinfo(mountinfo, {media / "USB": "/dev/sdc1", other: "/dev/sdd1", card: "/dev/sda1"})
+    monitor.check()
+    assert mounted == [card]
+    # 同じマウント先に別のカードが挿し直された場合も新しいカードとして通知する
+    _write_mountinfo(mountinfo, {card: "/dev/sde1"})
+    monitor.check()
+    assert mounted == [card, card]
+
+
+def test_monitor_on_proc_mountinfo_stops_promptly():
+    if not os.path.exists("/proc/self/mountinfo"):
+        return
+    monitor = MountMonitor().start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    monitor.stop()
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader.pipeline import BatchCreateStage
+
+
+def _result(i):
+    return {"file": f"/card/DCIM/IMG_{i:04d}.JPG", "token": f"tok-{i}", "success": True}
+
+
+def test_batch_create_stage_flushes_full_batches_while_uploading():
+    sent = []
+    flushed = threading.Event()
+
+    def create_batch(pairs):
+        sent.append([t for t, _ in pairs])
+        flushed.set()
+        return {"success": [t for t, _ in pairs], "failed": []}
+
+    stage = BatchCreateStage(create_batch, lambda batch, result: None, batch_size=3, flush_interval=60)
+    with stage:
+        for i in range(3):
+            stage.put(_result(i))
+        # close() を待たずに満杯のバッチが送信される
+        assert flushed.wait(2)
+        stage.put(_result(3))
+
+    assert sent == [["tok-0", "tok-1", "tok-2"], ["tok-3"]]
+
+
+def test_batch_create_stage_flushes_on_timer():
+    batches = []
+    stage = BatchCreateStage(
+        lambda pairs: {"success": [t for t, _ in pairs], "failed": []},
+        lambda batch, result: batches.append((batch, result)),
+        batch_size=50,
+        flush_interval=0.05,
+    ).start()
+    stage.put(_result(0))
+    time.sleep(0.5)
+    assert len(batches) == 1
+    assert batches[0][1]["success"] == ["tok-0"]
+    stage.close()
+    assert len(batches) == 1
+
+
+def test_batch_create_stage_creates_higher_priority_results_first():
+    sent = []
+    stage = BatchCreateStage(
+        lambda pairs: sent.append([t for t, _ in pairs]) or {"success": [t for t, _ in pairs], "failed": []},
+        lambda batch, result: None,
+        batch_size=3,
+        flush_interval=60,
+        priority=lambda r: r["file"].endswith(".MP4"),
+    )
+    clip = {"file": "/card/DCIM/MVI_0001.MP4", "token": "tok-clip", "success": True}
+    with stage:
+        stage.put(clip)
+        stage.put(_result(0))
+        stage.put(_result(1))
+        stage.put(_result(2))
+
+    # 先に届いた動画より写真を先にバッチ作成する
+    assert sent == [["tok-0", "tok-1", "tok-clip"], ["tok-2"]]
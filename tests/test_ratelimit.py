@@ -0,0 +1,56 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader.service import ratelimit
+from google_photos_uploader.service.ratelimit import DailyQuota, QuotaExceededError, TokenBucket
+
+
+def test_retry_delay_honors_retry_after_seconds():
+    response = SimpleNamespace(headers={"Retry-After": "7"})
+    assert ratelimit.retry_delay(response, attempt=0) == 7.0
+
+
+def test_retry_delay_uses_jittered_exponential_backoff():
+    response = SimpleNamespace(headers={})
+    for attempt in range(10):
+        delay = ratelimit.retry_delay(response, attempt)
+        assert 0 <= delay <= min(ratelimit.BACKOFF_MAX, ratelimit.BACKOFF_BASE * 2 ** attempt)
+
+
+def test_token_bucket_waits_when_empty_and_after_pause(monkeypatch):
+    slept = []
+    clock = {"now": 0.0}
+
+    def fake_sleep(seconds):
+        slept.append(seconds)
+        clock["now"] += seconds
+
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(ratelimit.time, "sleep", fake_sleep)
+
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.5)
+
+    bucket.pause(3.0)
+    assert bucket.acquire() >= 3.0
+
+
+def test_daily_quota_persists_and_raises_when_exhausted(tmp_path):
+    path = tmp_path / "quota.json"
+    quota = DailyQuota({"api": 3}, path=path)
+    quota.consume("api")
+    quota.consume("api")
+    quota.save()
+
+    reloaded = DailyQuota({"api": 3}, path=path)
+    assert reloaded.used("api") == 2
+    reloaded.consume("api")
+    with pytest.raises(QuotaExceededError):
+        reloaded.consume("api")
@@ -0,0 +1,96 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader import utils
+from google_photos_uploader.scancache import ScanCache
+
+
+def _card(tmp_path):
+    dcim = tmp_path / "card" / "DCIM"
+    for d in ("100CANON", "101CANON"):
+        (dcim / d).mkdir(parents=True)
+        for i in range(3):
+            (dcim / d / f"IMG_{i:04d}.JPG").write_bytes(b"x" * (i + 1))
+    return dcim
+
+
+def _age(*paths, seconds=60):
+    # FAT の mtime 分解能より古いフォルダにする（新しいフォルダは記録しない）
+    for path in paths:
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 1_000_000_000))
+
+
+def _count_stats(monkeypatch):
+    # stat したファイルのフォルダ名を記録する
+    statted = []
+    stat_entries = utils._stat_media_entries
+
+    def _stat(files):
+        statted.extend(os.path.basename(os.path.dirname(f.path)) for f in files)
+        return stat_entries(files)
+
+    monkeypatch.setattr(utils, "_stat_media_entries", _stat)
+    return statted
+
+
+def test_scan_serves_unchanged_folders_from_cache(monkeypatch, tmp_path):
+    dcim = _card(tmp_path)
+    _age(dcim, *dcim.iterdir())
+    cache = ScanCache(tmp_path / "uploader.db")
+    first = cache.scan(dcim)
+    assert len(first.entries) == 6
+
+    # 別のインスタンス（再起動後）でも、変更の無いフォルダのファイルは stat しない
+    statted = _count_stats(monkeypatch)
+    again = ScanCache(tmp_path / "uploader.db").scan(dcim)
+    assert again.entries == first.entries
+    assert statted == []
+
+    # 追加したフォルダだけを stat し直す
+    (dcim / "101CANON" / "IMG_0100.JPG").write_bytes(b"new")
+    _age(dcim / "101CANON")
+    rescanned = cache.scan(dcim)
+    assert set(statted) == {"101CANON"} and len(statted) == 4
+    assert len(rescanned.entries) == 7
+
+
+def test_scan_skips_racy_folders_and_drops_removed_ones(monkeypatch, tmp_path):
+    dcim = _card(tmp_path)
+    cache = ScanCache(tmp_path / "uploader.db")
+    cache.scan(dcim)
+    # mtime が新しすぎるフォルダは記録しないため、次回も stat し直す
+    statted = _count_stats(monkeypatch)
+    cache.scan(dcim)
+    assert sorted(set(statted)) == ["100CANON", "101CANON"]
+
+    _age(dcim, *dcim.iterdir())
+    cache.scan(dcim)
+    for name in os.listdir(dcim / "100CANON"):
+        os.remove(dcim / "100CANON" / name)
+    os.rmdir(dcim / "100CANON")
+    _age(dcim)
+    result = cache.scan(dcim)
+    assert [os.path.basename(os.path.dirname(e.path)) for e in result.entries] == ["101CANON"] * 3
+    assert set(result.listings) == {str(dcim), str(dcim / "101CANON")}
+
+
+def test_scan_rereads_folders_whose_names_changed_without_mtime_change(tmp_path):
+    dcim = _card(tmp_path)
+    _age(dcim, *dcim.iterdir())
+    cache = ScanCache(tmp_path / "uploader.db")
+    first = cache.scan(dcim)
+    assert first.cached == set()
+    assert cache.scan(dcim).cached == {e.path for e in first.entries}
+
+    # FAT / exFAT ではファイルを追加してもフォルダの mtime が変わらない場合がある
+    folder = dcim / "100CANON"
+    before = folder.stat()
+    (folder / "IMG_0100.JPG").write_bytes(b"new")
+    os.utime(folder, ns=(before.st_atime_ns, before.st_mtime_ns))
+    result = cache.scan(dcim)
+    assert len(result.entries) == 7
+    assert str(folder / "IMG_0100.JPG") not in result.cached
+    assert result.cached == {e.path for e in first.entries if "101CANON" in e.path}
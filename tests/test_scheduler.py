@@ -0,0 +1,123 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader.scheduler import UploadScheduler, media_lanes, size_lanes
+
+MB = 1024 * 1024
+
+
+def _scheduler(files):
+    lanes, classify = size_lanes(threshold=10 * MB, large_concurrency=2)
+    scheduler = UploadScheduler(lanes, classify)
+    for i, (path, size) in enumerate(files, start=1):
+        scheduler.submit(path, i, size=size)
+    scheduler.close()
+    return scheduler
+
+
+def test_scheduler_keeps_one_large_file_flowing_and_small_files_shortest_first():
+    scheduler = _scheduler([
+        ("big1.mov", 900 * MB),
+        ("b.jpg", 3 * MB),
+        ("big2.mov", 200 * MB),
+        ("a.jpg", 1 * MB),
+        ("c.jpg", 5 * MB),
+    ])
+
+    first = scheduler.get()
+    assert first.path == "big2.mov"  # large レーンの最小ファイル
+    assert [scheduler.get().path for _ in range(3)] == ["a.jpg", "b.jpg", "c.jpg"]
+    # small が空になれば large レーンの上限まで払い出す
+    assert scheduler.get().path == "big1.mov"
+
+
+def test_scheduler_enforces_lane_cap():
+    scheduler = _scheduler([(f"clip{i}.mp4", (100 + i) * MB) for i in range(3)])
+    jobs = [scheduler.get(), scheduler.get()]
+
+    got = []
+    t = threading.Thread(target=lambda: got.append(scheduler.get()))
+    t.start()
+    t.join(0.2)
+    assert t.is_alive()  # 上限 2 のため 3 件目は待たされる
+
+    scheduler.done(jobs[0])
+    t.join(2)
+    assert got[0].path == "clip2.mp4"
+    scheduler.done(jobs[1])
+    scheduler.done(got[0])
+    assert scheduler.get() is None
+
+
+def test_scheduler_limits_reads_per_device():
+    lanes, classify = size_lanes(threshold=10 * MB, large_concurrency=2)
+    scheduler = UploadScheduler(lanes, classify, device_of=lambda path: path.split("/")[0], device_limit=2)
+    for i in range(4):
+        scheduler.submit(f"slow/IMG_{i}.JPG", i, size=(i + 1) * MB)
+        scheduler.submit(f"fast/IMG_{i}.JPG", i + 4, size=(i + 5) * MB)
+    scheduler.close()
+
+    # 小さいファイルが遅いカードに偏っていても、カード毎の上限までしか払い出さない
+    jobs = [scheduler.get() for _ in range(4)]
+    assert sorted(job.device for job in jobs) == ["fast", "fast", "slow", "slow"]
+
+    got = []
+    t = threading.Thread(target=lambda: got.append(scheduler.get()))
+    t.start()
+    t.join(0.1)
+    assert not got  # 両方のカードが上限に達している
+
+    scheduler.done(next(job for job in jobs if job.device == "fast"))
+    t.join(1)
+    assert got[0].device == "fast"
+
+
+def _pause_in_thread(scheduler, job):
+    resumed = threading.Event()
+    t = threading.Thread(target=lambda: (scheduler.pause(job), resumed.set()), daemon=True)
+    t.start()
+    return t, resumed
+
+
+def test_media_lanes_keep_one_video_flowing_and_preempt_extra_videos_for_new_photos():
+    lanes, classify = media_lanes(threshold=10 * MB, video_concurrency=2)
+    scheduler = UploadScheduler(lanes, classify)
+    scheduler.submit("clip1.MOV", 1, size=500 * MB)
+    scheduler.submit("clip2.mp4", 2, size=100 * MB)
+    scheduler.submit("a.jpg", 3, size=8 * MB)
+    scheduler.submit("raw.dng", 4, size=30 * MB)
+
+    # 動画は写真の待ちがあっても 1 本だけバックグラウンドで流れる
+    got = [scheduler.get() for _ in range(3)]
+    assert {job.path for job in got} == {"clip2.mp4", "a.jpg", "raw.dng"}
+    video = next(job for job in got if job.lane == "video")
+    assert next(job for job in got if job.path == "raw.dng").lane == "large"
+    # 写真の待ちが無くなると動画レーンの上限まで広がる
+    extra = scheduler.get()
+    assert extra.path == "clip1.MOV"
+    assert not scheduler.preempt_requested(extra)
+
+    # 写真が追加されると、1 本を超えて送信中の動画は写真が払い出されるまで一時停止する
+    scheduler.submit("b.jpg", 5, size=6 * MB)
+    assert scheduler.preempt_requested(extra)
+    t, resumed = _pause_in_thread(scheduler, extra)
+    assert not resumed.wait(0.1)
+    assert not scheduler.preempt_requested(video)  # 残りの 1 本は止めない
+    assert scheduler.get().path == "b.jpg"
+    assert resumed.wait(1)
+    t.join(1)
+
+    # 写真が待っていても、動画レーンの送信が 1 本を下回れば再開する
+    scheduler.submit("c.jpg", 6, size=6 * MB)
+    t, resumed = _pause_in_thread(scheduler, extra)
+    assert not resumed.wait(0.1)
+    scheduler.done(video)
+    assert resumed.wait(1)
+    t.join(1)
+
+    scheduler.close()
+    assert scheduler.get().path == "c.jpg"
+    assert scheduler.get() is None
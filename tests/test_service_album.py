@@ -0,0 +1,60 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from google_photos_uploader import service
+from google_photos_uploader.service import ratelimit
+from fake_photos_api import FakePhotosAPI
+
+
+@pytest.fixture
+def creds():
+    return SimpleNamespace(token="test-token", valid=True, expired=False, refresh_token=None)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=None))
+    monkeypatch.setattr(service, "ALBUM_CACHE_FILE", tmp_path / "album_cache.json")
+    monkeypatch.setattr(service, "_album_cache", None)
+
+
+def test_get_or_create_album_follows_pagination(monkeypatch, creds):
+    titles = [f"Album {i}" for i in range(120)]
+    with FakePhotosAPI(albums=titles) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert service.get_or_create_album("Album 110", creds) == "album-110"
+        assert len(api.albums) == 120
+        assert api.requests.count(("GET", "/v1/albums")) == 3
+
+
+def test_get_or_create_album_uses_persistent_cache(monkeypatch, creds):
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        album_id = service.get_or_create_album("Photo Uploader", creds)
+        assert album_id
+        count = len(api.requests)
+
+        for _ in range(3):
+            assert service.get_or_create_album("Photo Uploader", creds) == album_id
+        # 別プロセスを想定してメモリ上のキャッシュを捨てても、ファイルから復元される
+        monkeypatch.setattr(service, "_album_cache", None)
+        assert service.get_or_create_album("Photo Uploader", creds) == album_id
+        assert len(api.requests) == count
+
+
+def test_batch_create_refreshes_stale_album(monkeypatch, creds, tmp_path):
+    media = tmp_path / "IMG_0001.JPG"
+    media.write_bytes(b"jpeg")
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        service._get_album_cache()["Photo Uploader"] = "deleted-album"
+        token = service.upload_media(media, creds, token_only=True)
+        result = service.batch_create_media_items([(token, media.name)], "Photo Uploader", creds)
+        assert result["success"] == [token]
+        assert api.media_items[0]["albumId"] == service._get_album_cache()["Photo Uploader"]
@@ -0,0 +1,79 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from google_photos_uploader import service
+from google_photos_uploader.service import ratelimit
+from fake_photos_api import FakePhotosAPI
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter(monkeypatch):
+    # テストでは日次クォータをファイルに保存しない
+    limiter = ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=None)
+    monkeypatch.setattr(ratelimit, "_limiter", limiter)
+    return limiter
+
+
+@pytest.fixture
+def creds():
+    return SimpleNamespace(token="test-token", valid=True, expired=False, refresh_token=None)
+
+
+@pytest.fixture
+def media_file(tmp_path):
+    path = tmp_path / "movie.mp4"
+    path.write_bytes(os.urandom(1024 * 1024 + 123))
+    return path
+
+
+def test_upload_media_raw(monkeypatch, creds, media_file):
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        token = service.upload_media(media_file, creds, token_only=True)
+        assert api.uploads[token] == media_file.read_bytes()
+        assert len(api.requests) == 1
+
+
+def test_upload_media_resumable_chunks(monkeypatch, creds, media_file):
+    with FakePhotosAPI(granularity=64 * 1024) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        monkeypatch.setattr(service, "RESUMABLE_CHUNK_SIZE", 256 * 1024)
+        chunks = []
+        token = service.upload_media(
+            media_file, creds, token_only=True, resumable_threshold=0, on_chunk=lambda: chunks.append(len(api.requests))
+        )
+        assert api.uploads[token] == media_file.read_bytes()
+        # start + 5 チャンク。最後以外のチャンクの後で on_chunk が呼ばれる
+        assert len(api.requests) == 6
+        assert chunks == [2, 3, 4, 5]
+
+
+def test_upload_media_resumable_resumes_from_server_offset(monkeypatch, creds, media_file):
+    with FakePhotosAPI(granularity=64 * 1024, fail_chunk_at=2) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        monkeypatch.setattr(service, "RESUMABLE_CHUNK_SIZE", 256 * 1024)
+        token = service.upload_media(media_file, creds, token_only=True, resumable_threshold=0)
+        assert api.uploads[token] == media_file.read_bytes()
+
+
+def test_upload_media_reuses_pooled_connection(monkeypatch, creds, media_file):
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        for _ in range(3):
+            assert service.upload_media(media_file, creds, token_only=True)
+        assert len(api.requests) == 3
+        assert len(api.connections) == 1
+
+
+def test_upload_media_retries_after_429(monkeypatch, creds, media_file):
+    with FakePhotosAPI(throttle=2) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        token = service.upload_media(media_file, creds, token_only=True)
+        assert api.uploads[token] == media_file.read_bytes()
+        assert len(api.requests) == 3
@@ -0,0 +1,339 @@
+import json
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from google_photos_uploader import dedup, jobstore, ledger, scancache, service, uploader
+from google_photos_uploader.service import ratelimit
+from fake_photos_api import FakePhotosAPI
+
+
+@pytest.fixture(autouse=True)
+def isolated_home(monkeypatch, tmp_path):
+    home = tmp_path / "home"
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setattr(uploader, "_PROGRESS_PATH", home / ".google_photos_uploader" / "upload_progress.json")
+    monkeypatch.setattr(service, "ALBUM_CACHE_FILE", home / ".google_photos_uploader" / "album_cache.json")
+    monkeypatch.setattr(service, "_album_cache", None)
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=None))
+    monkeypatch.setattr(jobstore, "_store", jobstore.JobStore(tmp_path / "uploader.db"))
+    monkeypatch.setattr(dedup, "_index", dedup.DedupIndex(tmp_path / "uploader.db"))
+    monkeypatch.setattr(ledger, "_ledger", ledger.UploadLedger(tmp_path / "uploader.db"))
+    monkeypatch.setattr(scancache, "_cache", scancache.ScanCache(tmp_path / "uploader.db"))
+    monkeypatch.setattr(
+        uploader, "_cached_creds", SimpleNamespace(token="test-token", valid=True, expired=False, refresh_token=None)
+    )
+    return home
+
+
+@pytest.fixture
+def dcim(tmp_path):
+    folder = tmp_path / "card" / "DCIM" / "100CANON"
+    folder.mkdir(parents=True)
+    for i in range(12):
+        (folder / f"IMG_{i:04d}.JPG").write_bytes(os.urandom(4096 + i))
+    return tmp_path / "card" / "DCIM"
+
+
+def test_upload_photos_end_to_end_with_injected_errors(monkeypatch, isolated_home, dcim):
+    with FakePhotosAPI(latency=0.01, error_rate=0.2, retry_after="0", seed=3) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos(dcim, album_name="Test")
+        assert api.errors > 0
+        assert len(api.media_items) == 12
+
+    files = sorted(str(p) for p in dcim.rglob("*.JPG"))
+    entries = ledger.get_ledger().lookup(files)
+    assert {e["status"] for e in entries.values()} == {ledger.STATUS_UPLOADED} and len(entries) == 12
+    assert all(e["album"] == "Test" and e["media_item_id"] and e["content_key"] for e in entries.values())
+
+
+def test_upload_photos_resumes_from_job_store(monkeypatch, isolated_home, dcim):
+    files = sorted(str(p) for p in dcim.rglob("*.JPG"))
+    store = jobstore.get_job_store()
+    store.discover({f: uploader._file_stat(f) for f in files})
+    # 前回の実行: 1 件目は作成済み（ログ追記前に停止）、2 件目はトークン取得済み
+    store.mark_uploaded(files[0], "token-old-0")
+    store.mark_created([files[0]])
+    store.mark_uploaded(files[1], "token-resumed")
+
+    with FakePhotosAPI() as api:
+        api.uploads["token-resumed"] = b"bytes"
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos(dcim, album_name="Test")
+        # 作成済みとトークン取得済みの 2 件はバイトを送り直さない
+        assert api.requests.count(("POST", "/v1/uploads")) == len(files) - 2
+        assert len(api.media_items) == len(files) - 1
+
+    assert ledger.get_ledger().uploaded(files) == set(files)
+    assert store.states(files) == {f: jobstore.STATE_CREATED for f in files}
+
+
+def test_upload_photos_stops_on_quota_without_recording_failures(monkeypatch, isolated_home, tmp_path, dcim):
+    files = sorted(str(p) for p in dcim.rglob("*.JPG"))
+    # バイトの送信は 5 件まで、メディアアイテムの作成は 1 件もできない
+    quota = ratelimit.DailyQuota({"uploads": 5, "api": 0}, path=tmp_path / "quota.json")
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=quota))
+    store = jobstore.get_job_store()
+
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert not uploader.upload_photos(dcim, album_name="Test")
+        assert api.requests.count(("POST", "/v1/uploads")) == 5
+        assert not api.media_items
+
+    # 失敗として記録せず、取得済みのトークンは次回のために残す
+    assert ledger.get_ledger().retry_state(files) == {}
+    assert jobstore.STATE_FAILED not in store.states(files).values()
+    assert len(store.valid_tokens(files)) == 5
+
+    monkeypatch.setattr(ratelimit, "_limiter", ratelimit.RateLimiter(ratelimit.RATE_LIMITS, quota=None))
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        for token in store.valid_tokens(files).values():
+            api.uploads[token] = b"bytes"
+        assert uploader.upload_photos(dcim, album_name="Test")
+        assert api.requests.count(("POST", "/v1/uploads")) == len(files) - 5
+        assert len(api.media_items) == len(files)
+
+    assert ledger.get_ledger().uploaded(files) == set(files)
+
+
+def test_recover_pending_tokens_creates_valid_and_expires_old(monkeypatch, isolated_home, dcim):
+    files = sorted(str(p) for p in dcim.rglob("*.JPG"))
+    store = jobstore.get_job_store()
+    store.discover({f: uploader._file_stat(f) for f in files[:3]})
+    store.mark_uploaded(files[0], "token-0", "Trip")
+    store.mark_uploaded(files[1], "token-1", "Trip")
+    # 期限切れのトークン
+    now = jobstore.time.time()
+    with monkeypatch.context() as m:
+        m.setattr(jobstore.time, "time", lambda: now - jobstore.TOKEN_TTL - 1)
+        store.mark_uploaded(files[2], "token-2", "Trip")
+
+    with FakePhotosAPI() as api:
+        api.uploads.update({"token-0": b"0", "token-1": b"1"})
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.recover_pending_tokens() == 2
+        assert [m["filename"] for m in api.media_items] == [os.path.basename(files[0]), os.path.basename(files[1])]
+        assert ("POST", "/v1/uploads") not in api.requests
+
+    assert store.states(files[:3]) == {
+        files[0]: jobstore.STATE_CREATED,
+        files[1]: jobstore.STATE_CREATED,
+        files[2]: jobstore.STATE_DISCOVERED,
+    }
+    assert ledger.get_ledger().uploaded(files) == set(files[:2])
+
+
+def test_upload_photos_skips_same_card_at_new_mount(monkeypatch, isolated_home, tmp_path, dcim):
+    files = sorted(str(p) for p in dcim.rglob("*.JPG"))
+    # 旧い形式のログ: 絶対パスのみ記録されている
+    base = isolated_home / ".google_photos_uploader"
+    base.mkdir(parents=True)
+    (base / "uploaded_files.txt").write_text("".join(f"{f}\n" for f in files[:10]))
+    assert ledger.get_ledger().import_legacy(base) == 10
+
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos(dcim, album_name="Test")
+        assert len(api.media_items) == 2
+
+        # 同じカードが別のマウント先に現れた
+        remounted = tmp_path / "disk"
+        (tmp_path / "card").rename(remounted)
+        assert not uploader.upload_photos(remounted / "DCIM", album_name="Test")
+        assert len(api.media_items) == 2
+
+    remounted_files = [str(p) for p in (remounted / "DCIM").rglob("*.JPG")]
+    assert ledger.get_ledger().uploaded(remounted_files) == set(remounted_files)
+
+
+def test_upload_photos_ingests_multiple_cards(monkeypatch, isolated_home, tmp_path, dcim):
+    second = tmp_path / "card2" / "DCIM" / "100NIKON"
+    second.mkdir(parents=True)
+    for i in range(5):
+        (second / f"DSC_{i:04d}.JPG").write_bytes(os.urandom(8192 + i))
+    # 1 枚目のカードと同じ内容のファイルは 1 回だけ送る
+    (second / "COPY.JPG").write_bytes(next(dcim.rglob("*.JPG")).read_bytes())
+
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos([dcim, second.parent], album_name="Test")
+        assert len(api.media_items) == 12 + 5
+
+    files = [str(p) for p in (tmp_path / "card").rglob("*.JPG")] + [str(p) for p in second.rglob("*.JPG")]
+    assert ledger.get_ledger().uploaded(files) == set(files)
+
+
+def test_upload_photos_confirms_duplicates_with_full_content(monkeypatch, isolated_home, tmp_path, dcim):
+    original = next(dcim.rglob("*.JPG"))
+    data = os.urandom(dedup.SAMPLE_SIZE * 5)
+    original.write_bytes(data)
+    second = tmp_path / "card2" / "DCIM" / "100NIKON"
+    second.mkdir(parents=True)
+    # 標本を読まない位置だけが異なるファイル（編集した RAW や動画など）と、同じ内容のコピー
+    edited = bytearray(data)
+    edited[dedup.SAMPLE_SIZE + 10] ^= 0xFF
+    (second / "EDITED.JPG").write_bytes(bytes(edited))
+    (second / "COPY.JPG").write_bytes(data)
+    assert dedup.content_key(second / "EDITED.JPG") == dedup.content_key(original)
+
+    # 最初の 1 件の作成に失敗した場合、同じ内容のコピーもアップロード済みにしない
+    real_batch_create = uploader.batch_create_media_items
+
+    def _fail_original(pairs, album, verbose=False):
+        kept = [(t, name) for t, name in pairs if name != original.name]
+        result = real_batch_create(kept, album, verbose=verbose) if kept else {"success": [], "failed": []}
+        return dict(result, failed=result["failed"] + [t for t, name in pairs if name == original.name])
+
+    files = [str(p) for p in dcim.rglob("*.JPG")] + [str(second / "EDITED.JPG"), str(second / "COPY.JPG")]
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        monkeypatch.setattr(uploader, "batch_create_media_items", _fail_original)
+        assert uploader.upload_photos([dcim, second.parent], album_name="Test")
+        assert len(api.media_items) == 12
+    assert ledger.get_ledger().uploaded(files) == set(files) - {str(original), str(second / "COPY.JPG")}
+
+    # 次の実行で最初の 1 件が作成されたら、コピーも記録する
+    monkeypatch.setattr(uploader, "batch_create_media_items", real_batch_create)
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos([dcim, second.parent], album_name="Test")
+        assert len(api.media_items) == 1
+    assert ledger.get_ledger().uploaded(files) == set(files)
+
+
+def test_upload_photos_sends_videos_alongside_photos_and_creates_photos_first(monkeypatch, isolated_home, dcim):
+    clips = dcim / "101CANON"
+    clips.mkdir()
+    for i in range(3):
+        (clips / f"MVI_{i:04d}.MP4").write_bytes(os.urandom(2048 + i))
+    started = []
+    upload_single_file = uploader.upload_single_file
+
+    def _upload(file_path, *args, **kwargs):
+        started.append(os.path.basename(file_path))
+        return upload_single_file(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(uploader, "upload_single_file", _upload)
+    with FakePhotosAPI(latency=0.01) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos(dcim, album_name="Test")
+        created = [m["filename"] for m in api.media_items]
+
+    # 動画は写真が終わるのを待たずにバックグラウンドレーンで送り始める
+    photos = [name for name in started if name.endswith(".JPG")]
+    assert started.index("MVI_0000.MP4") < started.index(photos[-1])
+    # 作成は写真が先
+    assert len(created) == 15
+    assert all(name.endswith(".JPG") for name in created[:12])
+
+
+def test_upload_photos_finds_files_added_without_folder_mtime_change(monkeypatch, isolated_home, dcim):
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos(dcim, album_name="Test")
+    # FAT の mtime 分解能より古いフォルダにして走査キャッシュに記録させる
+    folder = dcim / "100CANON"
+    for path in (dcim, folder):
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - 60 * 1_000_000_000))
+    assert not uploader.upload_photos(dcim, album_name="Test")
+
+    # フォルダの mtime を更新しないカメラ（FAT / exFAT）が追加したファイル
+    before = folder.stat()
+    shot = folder / "IMG_0100.JPG"
+    shot.write_bytes(os.urandom(8192))
+    os.utime(folder, ns=(before.st_atime_ns, before.st_mtime_ns))
+    with FakePhotosAPI() as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        assert uploader.upload_photos(dcim, album_name="Test")
+        assert len(api.media_items) == 1
+    assert ledger.get_ledger().uploaded([str(shot)]) == {str(shot)}
+
+    # 走査キャッシュを使わない場合も同じ結果になる
+    assert not uploader.upload_photos(dcim, album_name="Test", scan_cache=False)
+
+
+def _age_files(dcim, seconds=60):
+    # 書き込みが終わって時間の経ったファイルにする（新しいファイルは監視モードで保留される）
+    for path in dcim.rglob("*.JPG"):
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 1_000_000_000))
+
+
+def test_upload_photos_watch_mode_adds_files_written_during_run(monkeypatch, isolated_home, dcim):
+    _age_files(dcim)
+    events = []
+    cancel = threading.Event()
+    result = []
+    with FakePhotosAPI(latency=0.01) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        thread = threading.Thread(
+            target=lambda: result.append(
+                uploader.upload_photos(dcim, album_name="Test", on_progress=events.append, cancel=cancel, watch=True)
+            ),
+            daemon=True,
+        )
+        thread.start()
+        _wait_for(lambda: any(e["event"] == "started" for e in events))
+        # 走査の後にカメラが書き込んだファイル
+        shot = dcim / "100CANON" / "IMG_0100.JPG"
+        shot.write_bytes(os.urandom(8192))
+        _wait_for(lambda: ledger.get_ledger().uploaded([str(shot)]))
+        cancel.set()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+        assert len(api.media_items) == 13
+
+    assert result == [True]
+    added = [e for e in events if e["event"] == "added"]
+    assert added and added[0]["files"] == [str(shot)] and added[0]["total"] == 13
+    progress = json.loads(uploader._PROGRESS_PATH.read_text(encoding="utf-8"))
+    assert str(shot) in progress["files"]
+
+
+def test_upload_photos_watch_mode_holds_files_still_being_written_at_scan(monkeypatch, isolated_home, dcim):
+    _age_files(dcim)
+    # 走査の時点でカメラが書き込み途中だったファイル
+    data = os.urandom(16384)
+    partial = dcim / "100CANON" / "IMG_0100.JPG"
+    partial.write_bytes(data[:4096])
+    events = []
+    cancel = threading.Event()
+    with FakePhotosAPI(latency=0.01) as api:
+        monkeypatch.setattr(service, "API_BASE_URL", api.base_url)
+        thread = threading.Thread(
+            target=uploader.upload_photos,
+            args=(dcim,),
+            kwargs=dict(album_name="Test", on_progress=events.append, cancel=cancel, watch=True),
+            daemon=True,
+        )
+        thread.start()
+        _wait_for(lambda: any(e["event"] == "started" for e in events))
+        # 書き込み中のファイルは走査の対象に含めない
+        assert [e["total"] for e in events if e["event"] == "started"] == [12]
+        with partial.open("ab") as f:
+            f.write(data[4096:])
+        _wait_for(lambda: ledger.get_ledger().uploaded([str(partial)]))
+        cancel.set()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+        # 途中のサイズではなく、書き込みが終わった内容を 1 度だけ送る
+        assert data in api.uploads.values() and data[:4096] not in api.uploads.values()
+        assert len(api.uploads) == 13
+
+
+def _wait_for(condition, timeout=15.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "タイムアウト"
+        time.sleep(0.05)
@@ -4,7 +4,15 @@ from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
 
-from google_photos_uploader.utils import find_media_files, get_dcim_path
+from google_photos_uploader import utils
+from google_photos_uploader.utils import (
+    find_media_files,
+    find_sd_cards,
+    get_dcim_path,
+    get_volume_id,
+    read_mountinfo,
+    scan_media_files,
+)
 
 
 def test_get_dcim_path(tmp_path):
@@ -32,3 +40,58 @@ def test_find_media_files(tmp_path):
     assert img in files
     assert video in files
     assert other not in files
+
+
+def test_scan_media_files_matches_extensions_case_insensitively_in_one_pass(tmp_path):
+    folder = tmp_path / "DCIM" / "100CANON"
+    folder.mkdir(parents=True)
+    for name in ("IMG_0001.JPG", "IMG_0002.Jpg", "IMG_0003.jpeg", "MVI_0004.Mp4", "notes.txt", "._IMG_0001.JPG"):
+        (folder / name).write_bytes(b"x" * len(name))
+    (tmp_path / "DCIM" / ".thumbnails").mkdir()
+    (tmp_path / "DCIM" / ".thumbnails" / "IMG_0001.JPG").write_bytes(b"x")
+
+    entries = scan_media_files(tmp_path / "DCIM")
+    assert [os.path.basename(e.path) for e in entries] == ["IMG_0001.JPG", "IMG_0002.Jpg", "IMG_0003.jpeg", "MVI_0004.Mp4"]
+    st = (folder / "IMG_0002.Jpg").stat()
+    assert entries[1].size == st.st_size and entries[1].mtime_ns == st.st_mtime_ns
+
+
+def test_scan_media_files_in_parallel_matches_sequential_scan(monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, "SCAN_STAT_CHUNK", 7)
+    for d in range(5):
+        folder = tmp_path / "DCIM" / f"{100 + d}CANON" / ("SUB" if d % 2 else "")
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(20):
+            (folder / f"IMG_{d}{i:03d}.JPG").write_bytes(b"x" * i)
+
+    sequential = scan_media_files(tmp_path / "DCIM", workers=1)
+    assert len(sequential) == 100
+    assert scan_media_files(tmp_path / "DCIM", workers=4) == sequential
+
+
+def test_read_mountinfo_and_volume_id(tmp_path):
+    mountinfo = tmp_path / "mountinfo"
+    mountinfo.write_text(
+        "22 1 179:2 / / rw,relatime shared:1 - ext4 /dev/root rw\n"
+        "98 22 179:33 / /media/pi/PHOTO\\040SD rw,nosuid shared:50 - vfat /dev/sda1 rw,uid=1000\n"
+    )
+    mounts = read_mountinfo(str(mountinfo))
+    assert mounts == {"/": "/dev/root", "/media/pi/PHOTO SD": "/dev/sda1"}
+
+    volume, mount_point = get_volume_id(tmp_path, {})
+    assert volume.startswith("mount:") and tmp_path.is_relative_to(mount_point)
+
+
+def test_find_sd_cards_returns_every_mounted_dcim_volume(monkeypatch, tmp_path):
+    media = tmp_path / "media"
+    for name in ("CARD_B", "CARD_A", "USB_DRIVE"):
+        (media / "pi" / name).mkdir(parents=True)
+    (media / "pi" / "CARD_A" / "DCIM").mkdir()
+    (media / "pi" / "CARD_B" / "DCIM").mkdir()
+    monkeypatch.setattr(sys, "platform", "linux")
+    monkeypatch.setattr(utils, "REMOVABLE_MOUNT_ROOTS", (str(media),))
+    monkeypatch.setattr(utils, "find_sd_card", lambda volume_name="PHOTO_UPLOAD_SD": media / "pi" / "CARD_B")
+    mountinfo = {"/": "/dev/root", **{str(p): f"/dev/sd{i}1" for i, p in enumerate((media / "pi").iterdir())}}
+
+    # 優先するカードが先頭、残りは名前順。DCIM の無いボリュームと重複は除く
+    assert find_sd_cards(mountinfo=mountinfo) == [media / "pi" / "CARD_B", media / "pi" / "CARD_A"]
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from google_photos_uploader import watcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_debouncer_waits_until_size_is_stable(tmp_path):
+    clock = FakeClock()
+    debouncer = watcher.WriteDebouncer(settle_time=2.0, clock=clock)
+    path = tmp_path / "IMG_0001.JPG"
+    path.write_bytes(b"")
+    debouncer.touch(str(path))
+    # 作成直後の空ファイルは待つ
+    assert debouncer.poll() == []
+
+    path.write_bytes(b"x" * 100)
+    assert debouncer.poll() == []
+    clock.now = 1.0
+    with path.open("ab") as f:
+        f.write(b"x" * 100)
+    # 書き込みが続いている間は待つ
+    assert debouncer.poll() == []
+    clock.now = 2.5
+    assert debouncer.poll() == []
+    clock.now = 3.5
+    assert debouncer.poll() == [str(path)]
+    # 同じファイルは 1 度だけ返す
+    debouncer.touch(str(path))
+    clock.now = 10.0
+    assert debouncer.poll() == [] and debouncer.pending() == 0
+
+
+def test_debouncer_releases_closed_file_without_settle_time(tmp_path):
+    clock = FakeClock()
+    debouncer = watcher.WriteDebouncer(settle_time=60.0, clock=clock)
+    path = tmp_path / "MVI_0001.MP4"
+    path.write_bytes(b"x" * 100)
+    debouncer.closed(str(path))
+    # サイズを記録した次の確認で、変わっていなければ返す
+    assert debouncer.poll() == []
+    assert debouncer.poll() == [str(path)]
+
+
+def test_debouncer_drops_deleted_file(tmp_path):
+    debouncer = watcher.WriteDebouncer(settle_time=0.0)
+    path = tmp_path / "IMG_0001.JPG"
+    path.write_bytes(b"x")
+    debouncer.touch(str(path))
+    path.unlink()
+    assert debouncer.poll() == [] and debouncer.pending() == 0
+
+
+@pytest.mark.skipif(not watcher.is_available(), reason="watchdog が必要")
+def test_media_watcher_reports_new_media_files_only(tmp_path):
+    dcim = tmp_path / "DCIM"
+    (dcim / "100CANON").mkdir(parents=True)
+    with watcher.MediaWatcher([dcim], settle_time=0.5) as live:
+        (dcim / "100CANON" / "IMG_0001.JPG").write_bytes(b"x" * 10)
+        (dcim / "100CANON" / "IMG_0001.XMP").write_bytes(b"x" * 10)
+        (dcim / "100CANON" / ".IMG_0002.JPG").write_bytes(b"x" * 10)
+        (dcim / "101CANON").mkdir()
+        (dcim / "101CANON" / "MVI_0002.MOV").write_bytes(b"x" * 10)
+        ready = []
+        deadline = time.monotonic() + 10
+        while len(ready) < 2 and time.monotonic() < deadline:
+            ready.extend(live.get_ready(timeout=0.1))
+        assert live.alive()
+    assert sorted(ready) == [
+        str(dcim / "100CANON" / "IMG_0001.JPG"),
+        str(dcim / "101CANON" / "MVI_0002.MOV"),
+    ]